@@ -0,0 +1,26 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from . import hashing
+
+
+class PooledHashingBackend(ModelBackend):
+    """
+    ModelBackend that checks passwords in the hashing process pool
+    (accounts/hashing.py) instead of on the request thread.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Hash anyway so unknown usernames take as long as wrong passwords.
+            hashing.make_password(password)
+            return None
+        if hashing.check_password(password, user) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,126 @@
+"""
+In-process execution of batched API sub-requests (POST /api/batch/).
+
+The batch request is authenticated once by the normal DRF machinery; each
+sub-request is then built as a plain WSGIRequest carrying that user through
+DRF's forced-authentication hook (`_force_auth_user`), resolved against the
+URLconf and handed straight to the view. Middleware, JWT decoding and the
+user lookup are therefore paid once per batch. Per-view permission classes
+and throttles still run for every item, since they differ between views and
+only read the already loaded user.
+"""
+import json
+import logging
+from io import BytesIO
+from urllib.parse import urlencode, urlsplit
+from django.conf import settings
+from django.db import transaction
+from django.core.handlers.wsgi import WSGIRequest
+from django.urls import Resolver404, resolve
+
+logger = logging.getLogger('request_logger')
+
+METHODS = {'GET', 'POST', 'PUT', 'PATCH', 'DELETE'}
+
+# Sub-requests that must never be nested inside a batch.
+EXCLUDED_PREFIXES = ('/api/batch/', '/api/auth/', '/api/events/')
+
+# Reported for items not run because an earlier item failed an atomic batch.
+NOT_EXECUTED = 424
+
+# Client headers not passed on to sub-requests: the batch response is what
+# gets compressed, and sub-request bodies are embedded as JSON.
+DROPPED_META = ('HTTP_ACCEPT_ENCODING',)
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _build_request(request, method, path, body, idempotency_key=None):
+    """
+    Build a sub-request that inherits the client's metadata and identity.
+    The batch's own Idempotency-Key is not inherited: every @idempotent item
+    would share it. An item may give its own as `idempotency_key`.
+    """
+    url = urlsplit(path)
+    payload = b'' if body is None else json.dumps(body).encode()
+    idempotency_header = settings.IDEMPOTENCY['HEADER']
+    environ = {key: value for key, value in request.META.items()
+               if isinstance(value, str) and key not in DROPPED_META and key != idempotency_header}
+    if idempotency_key is not None:
+        environ[idempotency_header] = str(idempotency_key)
+    environ.update({
+        'REQUEST_METHOD': method,
+        'PATH_INFO': url.path,
+        'SCRIPT_NAME': '',
+        'QUERY_STRING': url.query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(payload)),
+        'wsgi.input': BytesIO(payload),
+        'wsgi.url_scheme': request.scheme,
+    })
+    sub_request = WSGIRequest(environ)
+    sub_request._force_auth_user = request.user
+    sub_request._force_auth_token = request.auth
+    return sub_request
+
+
+def _response_body(response):
+    # List endpoints stream their body (utils.renderers.StreamingListMixin).
+    content = b''.join(response.streaming_content) if response.streaming else response.content
+    if not content:
+        return None
+    if response.get('Content-Type', '').startswith('application/json'):
+        return json.loads(content)
+    return content.decode(errors='replace')
+
+
+def run_item(request, item):
+    """
+    Run one sub-request and return {'status': ..., 'body': ...}.
+    """
+    method = str(item.get('method', 'GET')).upper()
+    path = item.get('path') or ''
+    if item.get('query'):
+        path = f"{path}{'&' if '?' in path else '?'}{urlencode(item['query'], doseq=True)}"
+    if method not in METHODS or not path.startswith('/') or path.startswith(EXCLUDED_PREFIXES):
+        return {'status': 400, 'body': {'success': False, 'error': f"Unsupported sub-request {method} {path}"}}
+    try:
+        match = resolve(urlsplit(path).path)
+    except Resolver404:
+        return {'status': 404, 'body': {'success': False, 'error': f"No route for {path}"}}
+    sub_request = _build_request(request, method, path, item.get('body'), item.get('idempotency_key'))
+    try:
+        response = match.func(sub_request, *match.args, **match.kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        body = _response_body(response)
+    except Exception as e:
+        logger.exception(f"Batch sub-request {method} {path} failed")
+        return {'status': 500, 'body': {'success': False, 'error': str(e)}}
+    return {'status': response.status_code, 'body': body}
+
+
+def run_batch(request, items, atomic=False):
+    """
+    Run the items in order. With atomic=True they share one transaction: the
+    first item answering 4xx/5xx rolls everything back and the rest are
+    reported as not executed. Returns (results, committed).
+    """
+    results = []
+    if not atomic:
+        for item in items:
+            results.append(run_item(request, item))
+        return results, True
+    try:
+        with transaction.atomic():
+            for item in items:
+                result = run_item(request, item)
+                results.append(result)
+                if result['status'] >= 400:
+                    raise _Rollback()
+    except _Rollback:
+        results.extend({'status': NOT_EXECUTED, 'body': None} for _ in items[len(results):])
+        return results, False
+    return results, True
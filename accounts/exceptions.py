@@ -2,7 +2,8 @@ from rest_framework.exceptions import APIException
 from rest_framework import status
 from rest_framework.views import exception_handler
 from rest_framework.response import Response
-from utils.constants import AlreadyExistsMessage, UserMessage, GeneralMessage
+from utils.constants import (AlreadyExistsMessage, UserMessage, GeneralMessage, IdempotencyMessage,
+                             PasswordHashingMessage)
 
 
 def custom_exception_handler(exc, context):
@@ -68,3 +69,25 @@ class QueryParameterMissing(APIException):
 class NotFound(APIException):
     status_code = status.HTTP_404_NOT_FOUND
     default_detail = 'not_found'
+
+
+class IdempotencyKeyInvalid(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = IdempotencyMessage.KEY_INVALID
+    default_code = 'idempotency_key_invalid'
+
+class IdempotencyKeyInProgress(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = IdempotencyMessage.KEY_IN_PROGRESS
+    default_code = 'idempotency_key_in_progress'
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = IdempotencyMessage.KEY_REUSED
+    default_code = 'idempotency_key_reused'
+
+class HashingPoolSaturated(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = PasswordHashingMessage.POOL_SATURATED
+    default_code = 'hashing_pool_saturated'
+    wait = 1  # sent as Retry-After
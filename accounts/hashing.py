@@ -0,0 +1,170 @@
+"""
+Password hashing across a process pool.
+
+PBKDF2 (and the other slow hashers) cost ~100ms of CPU per call, so they
+are kept off the request worker. Workers only need the hasher class: the
+parent resolves the configured hasher and ships its dotted path, so workers
+never import Django settings and work under any start method.
+
+Two entry points:
+- ``hash_passwords`` hashes a batch with a throwaway pool (bulk onboarding).
+- ``make_password`` / ``check_password`` run single hashes for login and
+  registration on a long-lived pool per process, sized by
+  PASSWORD_HASHING['WORKERS']. At most MAX_PENDING hashes may be queued or
+  running; beyond that HashingPoolSaturated (503 + Retry-After) is raised
+  instead of letting requests pile up behind the pool.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.utils.module_loading import import_string
+
+# Passwords per task: large enough to amortise pickling, small enough to balance.
+CHUNK_SIZE = 64
+
+_hashers = {}
+
+
+def _get(hasher_path):
+    hasher = _hashers.get(hasher_path)
+    if hasher is None:
+        hasher = _hashers[hasher_path] = import_string(hasher_path)()
+    return hasher
+
+
+def _hash_chunk(hasher_path, passwords):
+    hasher = _get(hasher_path)
+    return [hasher.encode(password, hasher.salt()) for password in passwords]
+
+
+def _verify(hasher_path, password, encoded):
+    return _get(hasher_path).verify(password, encoded)
+
+
+def _path(hasher):
+    return f"{type(hasher).__module__}.{type(hasher).__qualname__}"
+
+
+def default_hasher_path():
+    return _path(hashers.get_hasher('default'))
+
+
+def _mp_context():
+    # forkserver where available, so children do not inherit the request
+    # threads' state (locks, connections) from a forked web worker.
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def hash_passwords(passwords, workers=None):
+    """
+    Hash passwords with the default hasher, equivalent to calling
+    make_password on each, spread over `workers` processes (default: one per
+    CPU). Returns the encoded hashes in input order.
+    """
+    passwords = list(passwords)
+    hasher_path = default_hasher_path()
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(passwords) <= CHUNK_SIZE:
+        return _hash_chunk(hasher_path, passwords)
+    chunks = [passwords[i:i + CHUNK_SIZE] for i in range(0, len(passwords), CHUNK_SIZE)]
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), mp_context=_mp_context()) as pool:
+        hashed = pool.map(_hash_chunk, [hasher_path] * len(chunks), chunks)
+        return [encoded for chunk in hashed for encoded in chunk]
+
+
+class HashingPool:
+    """
+    Lazily started process pool with a cap on outstanding work. The pool is
+    created on first use, i.e. after the server has forked its workers, and
+    uses forkserver where available (see _mp_context).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pending = 0
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def _get_executor(self):
+        if self._executor is None:
+            workers = settings.PASSWORD_HASHING['WORKERS'] or os.cpu_count() or 1
+            self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=_mp_context())
+        return self._executor
+
+    def _done(self, future):
+        with self._lock:
+            self._pending -= 1
+
+    def run(self, fn, *args):
+        """
+        Run fn(*args) in the pool and wait for the result.
+        """
+        # Imported here: pool workers import this module and must not pull in DRF.
+        from .exceptions import HashingPoolSaturated
+        options = settings.PASSWORD_HASHING
+        with self._lock:
+            if self._pending >= options['MAX_PENDING']:
+                raise HashingPoolSaturated()
+            executor = self._get_executor()
+            try:
+                future = executor.submit(fn, *args)
+            except BrokenProcessPool:
+                # A worker died; start a fresh pool for the next request.
+                self._executor = None
+                raise HashingPoolSaturated()
+            self._pending += 1
+        future.add_done_callback(self._done)
+        try:
+            return future.result(timeout=options['TIMEOUT_SECONDS'])
+        except (TimeoutError, BrokenProcessPool):
+            raise HashingPoolSaturated()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+pool = HashingPool()
+
+
+def make_password(password):
+    """
+    django.contrib.auth.hashers.make_password, hashed in the pool.
+    """
+    if password is None or not settings.PASSWORD_HASHING['ENABLED']:
+        return hashers.make_password(password)
+    return pool.run(_hash_chunk, default_hasher_path(), [password])[0]
+
+
+def check_password(password, user):
+    """
+    Check `password` against user.password in the pool, upgrading the stored
+    hash (as User.check_password does) when the hasher or its work factor
+    changed.
+    """
+    encoded = user.password
+    if not settings.PASSWORD_HASHING['ENABLED']:
+        return user.check_password(password)
+    if password is None or not hashers.is_password_usable(encoded):
+        return False
+    try:
+        hasher = hashers.identify_hasher(encoded)
+    except ValueError:
+        return False
+    if not pool.run(_verify, _path(hasher), password, encoded):
+        return False
+    preferred = hashers.get_hasher('default')
+    if hasher.algorithm != preferred.algorithm or preferred.must_update(encoded):
+        user.password = make_password(password)
+        user.save(update_fields=['password'])
+    return True
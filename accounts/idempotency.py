@@ -0,0 +1,108 @@
+"""
+``Idempotency-Key`` support for mutating API endpoints.
+
+Decorate a view handler with ``@idempotent``. When the client sends an
+``Idempotency-Key`` header, the first response (including error responses
+raised as APIException) is stored in the cache under (caller, key) together
+with a fingerprint of the request, for ``IDEMPOTENCY['TTL']`` seconds.
+Retries with the same key and body get the stored response back, marked
+``Idempotent-Replayed: true``, without running the handler. Reusing a key
+for a different request is rejected.
+
+While the first request is running it holds a lock key; duplicates arriving
+meanwhile poll for its stored response for up to ``WAIT_SECONDS`` instead of
+racing it. 5xx responses are not stored, so a retry after a server error
+runs again. Requests without the header are untouched.
+"""
+import functools
+import hashlib
+import json
+import time
+import uuid
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+from . import metrics
+from .exceptions import IdempotencyKeyInProgress, IdempotencyKeyInvalid, IdempotencyKeyReused
+
+POLL_INTERVAL = 0.05
+
+
+def _caller(request):
+    if request.user and request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+    return f"ip:{request.META.get('REMOTE_ADDR', '')}"
+
+
+def _fingerprint(request):
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = dict(data.lists())
+    body = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(f"{request.method} {request.get_full_path()} {body}".encode()).hexdigest()
+
+
+def _replay(stored):
+    response = Response(stored['data'], status=stored['status'])
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(handler):
+    """
+    Make an APIView / ViewSet handler idempotent under an Idempotency-Key header.
+    """
+    @functools.wraps(handler)
+    def wrapper(view, request, *args, **kwargs):
+        options = settings.IDEMPOTENCY
+        key = request.META.get(options['HEADER'])
+        if key is None:
+            return handler(view, request, *args, **kwargs)
+        if not 0 < len(key) <= 255 or not key.isprintable():
+            raise IdempotencyKeyInvalid()
+
+        cache = caches[options['CACHE_ALIAS']]
+        digest = hashlib.sha256(f"{_caller(request)}:{key}".encode()).hexdigest()
+        response_key, lock_key = f"idempotency:response:{digest}", f"idempotency:lock:{digest}"
+        fingerprint = _fingerprint(request)
+
+        def stored_response():
+            stored = cache.get(response_key)
+            if stored is None:
+                return None
+            if stored['fingerprint'] != fingerprint:
+                raise IdempotencyKeyReused()
+            return _replay(stored)
+
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + options['WAIT_SECONDS']
+        while True:
+            replay = stored_response()
+            if replay is not None:
+                metrics.record_cache('idempotency', True)
+                return replay
+            if cache.add(lock_key, token, timeout=options['LOCK_TIMEOUT']):
+                break
+            if time.monotonic() >= deadline:
+                raise IdempotencyKeyInProgress()
+            time.sleep(POLL_INTERVAL)
+
+        try:
+            # The first request may have finished between our read and add().
+            replay = stored_response()
+            metrics.record_cache('idempotency', replay is not None)
+            if replay is not None:
+                return replay
+            try:
+                response = handler(view, request, *args, **kwargs)
+            except APIException as exc:
+                response = view.handle_exception(exc)
+            if response.status_code < 500 and hasattr(response, 'data'):
+                cache.set(response_key, {'fingerprint': fingerprint, 'status': response.status_code,
+                                         'data': response.data}, timeout=options['TTL'])
+            return response
+        finally:
+            if cache.get(lock_key) == token:
+                cache.delete(lock_key)
+    return wrapper
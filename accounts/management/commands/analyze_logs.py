@@ -0,0 +1,219 @@
+import csv
+import glob
+import gzip
+import json
+import re
+from collections import deque
+from datetime import datetime
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import Resolver404, resolve
+from accounts.metrics import Histogram
+
+# Written by accounts.middleware.LoggingMiddleware. An optional "[<request id>]"
+# right after the colon is used for pairing when present.
+REQUEST_RE = re.compile(
+    r'request_logger - Request: (?:\[(?P<rid>[^\]]+)\] )?(?P<method>[A-Z]+) (?P<path>\S+) at (?P<ts>.+)$')
+RESPONSE_RE = re.compile(
+    r'request_logger - Response: (?:\[(?P<rid>[^\]]+)\] )?(?P<status>\d{3}) at (?P<ts>.+)$')
+NUMERIC_SEGMENT_RE = re.compile(r'^\d+$')
+
+# 1ms .. ~65s in roughly 1.5x steps: bounded memory per endpoint, ~20% worst-case
+# interpolation error on percentiles.
+LATENCY_BOUNDS = tuple(round(0.001 * 1.5 ** i, 6) for i in range(28))
+
+
+class Command(BaseCommand):
+    """
+    Stream-parse request/response pairs from logs/app.log (and rotated or
+    gzipped siblings) into per-endpoint latency percentiles or throughput.
+
+    Memory is bounded by the number of distinct path templates, the pending
+    request window (--max-pending) and the number of throughput buckets,
+    never by log size.
+
+    Usage:
+        python manage.py analyze_logs --rotated --format csv
+        python manage.py analyze_logs --report throughput --bucket 300 --format json
+    """
+    help = 'Report per-endpoint latency percentiles or throughput from request logs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', help='Log files (.log or .gz). Defaults to logs/app.log.')
+        parser.add_argument('--rotated', action='store_true',
+                            help='Also read rotated siblings (app.log.1, app.log.2.gz, ...), oldest first.')
+        parser.add_argument('--report', choices=['endpoints', 'throughput'], default='endpoints')
+        parser.add_argument('--format', choices=['text', 'csv', 'json'], default='text')
+        parser.add_argument('--bucket', type=int, default=60, help='Throughput bucket width in seconds.')
+        parser.add_argument('--max-pending', type=int, default=10000,
+                            help='Unanswered requests kept for pairing before the oldest is dropped.')
+
+    def handle(self, *args, **options):
+        files = self._resolve_files(options['paths'] or [str(settings.BASE_DIR / 'logs/app.log')],
+                                    options['rotated'])
+        if not files:
+            raise CommandError('No log files found.')
+        self.max_pending = options['max_pending']
+        self.bucket_width = options['bucket']
+        self.endpoints = {}
+        self.throughput = {}
+        self.pending = deque()
+        self.pending_by_id = {}
+        self.unmatched = 0
+        self._templates = {}
+
+        for path in files:
+            self._parse_file(path)
+
+        self.unmatched += len(self.pending) + len(self.pending_by_id)
+        if options['report'] == 'endpoints':
+            rows = self._endpoint_rows()
+            columns = ['method', 'endpoint', 'count', 'errors', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms']
+        else:
+            rows = self._throughput_rows()
+            columns = ['bucket_start', 'requests', 'errors']
+        self._emit(rows, columns, options['format'])
+        if self.unmatched:
+            self.stderr.write(f"{self.unmatched} request/response lines could not be paired.")
+
+    def _resolve_files(self, paths, rotated):
+        files = []
+        for pattern in paths:
+            for path in sorted(glob.glob(pattern)):
+                if rotated:
+                    siblings = [p for p in glob.glob(f"{path}.*") if re.search(r'\.\d+(\.gz)?$', p)]
+                    siblings.sort(key=lambda p: int(re.search(r'\.(\d+)(\.gz)?$', p).group(1)), reverse=True)
+                    files.extend(siblings)
+                files.append(path)
+        return files
+
+    def _open(self, path):
+        if path.endswith('.gz'):
+            return gzip.open(path, 'rt', encoding='utf-8', errors='replace')
+        return open(path, encoding='utf-8', errors='replace')
+
+    def _parse_file(self, path):
+        with self._open(path) as handle:
+            for line in handle:
+                if 'request_logger - Re' not in line:
+                    continue
+                line = line.rstrip('\n')
+                match = REQUEST_RE.search(line)
+                if match:
+                    self._on_request(match)
+                    continue
+                match = RESPONSE_RE.search(line)
+                if match:
+                    self._on_response(match)
+
+    def _on_request(self, match):
+        entry = (match['method'], match['path'], _parse_ts(match['ts']))
+        if entry[2] is None:
+            return
+        if match['rid']:
+            self.pending_by_id[match['rid']] = entry
+            if len(self.pending_by_id) > self.max_pending:
+                self.pending_by_id.pop(next(iter(self.pending_by_id)))
+                self.unmatched += 1
+            return
+        self.pending.append(entry)
+        if len(self.pending) > self.max_pending:
+            self.pending.popleft()
+            self.unmatched += 1
+
+    def _on_response(self, match):
+        if match['rid']:
+            entry = self.pending_by_id.pop(match['rid'], None)
+        else:
+            entry = self.pending.popleft() if self.pending else None
+        finished = _parse_ts(match['ts'])
+        if entry is None or finished is None:
+            self.unmatched += 1
+            return
+        method, path, started = entry
+        status = int(match['status'])
+        key = (method, self._template(path))
+        stats = self.endpoints.get(key)
+        if stats is None:
+            stats = self.endpoints[key] = {'histogram': Histogram(LATENCY_BOUNDS), 'errors': 0, 'max': 0.0}
+        latency = max((finished - started).total_seconds(), 0.0)
+        stats['histogram'].observe(latency)
+        stats['max'] = max(stats['max'], latency)
+        bucket = int(started.timestamp()) // self.bucket_width * self.bucket_width
+        counts = self.throughput.setdefault(bucket, [0, 0])
+        counts[0] += 1
+        if status >= 400:
+            stats['errors'] += 1
+            counts[1] += 1
+
+    def _template(self, path):
+        """
+        Collapse ids out of a path: numeric segments become '<n>' and other
+        named URL kwargs (e.g. station_code) become '<kwarg name>'. 'pk' is
+        left alone so typos like '/train-stations/create-route/' stay visible.
+        """
+        path = path.split('?', 1)[0]
+        if path in self._templates:
+            return self._templates[path]
+        try:
+            kwargs = resolve(path).kwargs
+        except Resolver404:
+            kwargs = {}
+        placeholders = {str(value): name for name, value in kwargs.items()
+                        if name not in ('pk', 'format')}
+        segments = []
+        for segment in path.split('/'):
+            if NUMERIC_SEGMENT_RE.match(segment):
+                segments.append('<n>')
+            elif segment in placeholders:
+                segments.append(f"<{placeholders[segment]}>")
+            else:
+                segments.append(segment)
+        template = '/'.join(segments)
+        if len(self._templates) < 10000:
+            self._templates[path] = template
+        return template
+
+    def _endpoint_rows(self):
+        rows = []
+        for (method, endpoint), stats in sorted(self.endpoints.items(), key=lambda item: item[0][1]):
+            histogram = stats['histogram']
+            # Bucket interpolation can overshoot the largest sample; clamp to it.
+            p50, p95, p99 = (min(histogram.quantile(q), stats['max']) for q in (0.50, 0.95, 0.99))
+            rows.append({
+                'method': method,
+                'endpoint': endpoint,
+                'count': histogram.count,
+                'errors': stats['errors'],
+                'p50_ms': round(p50 * 1000, 1),
+                'p95_ms': round(p95 * 1000, 1),
+                'p99_ms': round(p99 * 1000, 1),
+                'max_ms': round(stats['max'] * 1000, 1),
+            })
+        return rows
+
+    def _throughput_rows(self):
+        return [{'bucket_start': datetime.fromtimestamp(bucket).isoformat(sep=' '),
+                 'requests': counts[0],
+                 'errors': counts[1]}
+                for bucket, counts in sorted(self.throughput.items())]
+
+    def _emit(self, rows, columns, output_format):
+        if output_format == 'json':
+            self.stdout.write(json.dumps(rows, indent=2))
+        elif output_format == 'csv':
+            writer = csv.DictWriter(self.stdout, fieldnames=columns, lineterminator='\n')
+            writer.writeheader()
+            writer.writerows(rows)
+        else:
+            widths = {c: max([len(c)] + [len(str(r[c])) for r in rows]) for c in columns}
+            self.stdout.write('  '.join(c.ljust(widths[c]) for c in columns))
+            for row in rows:
+                self.stdout.write('  '.join(str(row[c]).ljust(widths[c]) for c in columns))
+
+
+def _parse_ts(value):
+    try:
+        return datetime.fromisoformat(value.strip())
+    except ValueError:
+        return None
@@ -0,0 +1,69 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth import authenticate, hashers
+from django.core.management.base import BaseCommand
+from django.db import connection
+from accounts.hashing import pool
+from accounts.models import User
+
+USERNAME = 'bench_login'
+PASSWORD = 'Bench#Pass123'
+
+
+class Command(BaseCommand):
+    """
+    Measure login throughput (authenticate() calls per second) at increasing
+    concurrency, hashing inline on the request threads versus in the
+    PASSWORD_HASHING process pool. With the pool, throughput should grow
+    with concurrency up to the number of cores.
+
+    A temporary user is created for the run and deleted afterwards.
+
+    Usage:
+        python manage.py benchmark_login --logins 200 --concurrency 1 2 4 8
+    """
+    help = 'Benchmark login throughput with inline versus pooled password hashing.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=100, help='Logins per measurement.')
+        parser.add_argument('--concurrency', type=int, nargs='+',
+                            default=sorted({1, 2, os.cpu_count() or 1, 2 * (os.cpu_count() or 1)}))
+
+    def handle(self, *args, **options):
+        User.objects.filter(username=USERNAME).delete()
+        user = User.objects.create(username=USERNAME, email=f"{USERNAME}@example.com",
+                                   mobile_number='0000000000', first_name='Bench',
+                                   password=hashers.make_password(PASSWORD))
+        original = settings.PASSWORD_HASHING
+        self.stdout.write(f"{os.cpu_count()} CPUs, {options['logins']} logins per run")
+        self.stdout.write(f"{'mode':<8} {'threads':>7} {'logins/s':>9}")
+        try:
+            for enabled in (False, True):
+                settings.PASSWORD_HASHING = {**original, 'ENABLED': enabled,
+                                             'MAX_PENDING': max(options['concurrency']) * 2}
+                if enabled:
+                    authenticate(username=USERNAME, password=PASSWORD)  # start the pool
+                for threads in options['concurrency']:
+                    rate = self._measure(options['logins'], threads)
+                    self.stdout.write(f"{'pool' if enabled else 'inline':<8} {threads:>7} {rate:>9.1f}")
+        finally:
+            settings.PASSWORD_HASHING = original
+            pool.shutdown()
+            user.delete()
+
+    def _measure(self, logins, threads):
+        def login(_):
+            try:
+                return authenticate(username=USERNAME, password=PASSWORD) is not None
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            results = list(executor.map(login, range(logins)))
+        elapsed = time.perf_counter() - started
+        if not all(results):
+            self.stderr.write(f"{results.count(False)} logins failed")
+        return logins / elapsed
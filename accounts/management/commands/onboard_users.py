@@ -0,0 +1,54 @@
+import csv
+import json
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from accounts.models import Role
+from accounts.onboarding import onboard_users
+
+
+class Command(BaseCommand):
+    """
+    Create many users at once from a CSV (header row with username, email,
+    mobile_number, first_name, last_name, password) or a JSON list of objects.
+    Rejected rows are listed with their reasons; valid rows are created.
+
+    Usage:
+        python manage.py onboard_users employees.csv --workers 8
+        python manage.py onboard_users group.json --dry-run
+    """
+    help = 'Bulk-create users from a CSV or JSON file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSON file of users.')
+        parser.add_argument('--role', choices=[Role.PASSENGER, Role.ADMIN], default=Role.PASSENGER)
+        parser.add_argument('--workers', type=int, default=settings.ONBOARDING['HASH_WORKERS'] or None,
+                            help='Password hashing processes (default: one per CPU).')
+        parser.add_argument('--chunk-size', type=int, default=settings.ONBOARDING['CHUNK_SIZE'])
+        parser.add_argument('--dry-run', action='store_true', help='Validate only; create nothing.')
+
+    def handle(self, *args, **options):
+        rows = self._read(options['path'])
+        started = time.perf_counter()
+        result = onboard_users(rows, role_name=options['role'], chunk_size=options['chunk_size'],
+                               workers=options['workers'], dry_run=options['dry_run'])
+        for failure in result['failed']:
+            reasons = '; '.join(f"{field}: {message}" for field, message in failure['errors'].items())
+            self.stderr.write(f"  row {failure['row'] + 1}: {reasons}")
+        verb = 'Would create' if options['dry_run'] else 'Created'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {result['created']} users, rejected {len(result['failed'])} rows "
+            f"in {time.perf_counter() - started:.1f}s"))
+
+    def _read(self, path):
+        try:
+            with open(path, newline='', encoding='utf-8') as handle:
+                if path.lower().endswith('.json'):
+                    rows = json.load(handle)
+                else:
+                    rows = list(csv.DictReader(handle))
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot read {path}: {e}")
+        if not isinstance(rows, list):
+            raise CommandError('Expected a list of user objects.')
+        return rows
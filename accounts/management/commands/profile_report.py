@@ -0,0 +1,82 @@
+import glob
+import os
+import pstats
+from collections import Counter
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    """
+    Aggregate request profiles written by ProfilingMiddleware into a top-N
+    hotspot report.
+
+    Usage:
+        python manage.py profile_report --top 20 --route trainstation-delete-stop
+    """
+    help = 'Aggregate logs/profiles/*.prof and *.stacks files into a hotspot report.'
+
+    def add_arguments(self, parser):
+        default_dir = str(getattr(settings, 'PROFILING', {}).get(
+            'OUTPUT_DIR', settings.BASE_DIR / 'logs/profiles'))
+        parser.add_argument('--dir', default=default_dir, help='Profile directory.')
+        parser.add_argument('--top', type=int, default=20, help='Number of hotspots to show.')
+        parser.add_argument('--route', default='', help='Only include profiles whose filename starts with this route.')
+        parser.add_argument('--sort', choices=['tottime', 'cumtime'], default='tottime',
+                            help='Ranking for cProfile hotspots.')
+
+    def handle(self, *args, **options):
+        if not os.path.isdir(options['dir']):
+            raise CommandError(f"Profile directory not found: {options['dir']}")
+        prof_files = self._collect(options, 'prof')
+        stack_files = self._collect(options, 'stacks')
+        if not prof_files and not stack_files:
+            raise CommandError('No profiles matched.')
+        if prof_files:
+            self._report_cprofile(prof_files, options['top'], options['sort'])
+        if stack_files:
+            self._report_stacks(stack_files, options['top'])
+
+    def _collect(self, options, extension):
+        pattern = os.path.join(options['dir'], f"{options['route']}*.{extension}")
+        return sorted(glob.glob(pattern))
+
+    def _report_cprofile(self, files, top, sort):
+        """
+        Merge pstats files and print functions ranked by self or cumulative time.
+        """
+        stats = pstats.Stats(files[0])
+        for path in files[1:]:
+            stats.add(path)
+        rows = []
+        for (filename, line, func), (_, calls, tottime, cumtime, _) in stats.stats.items():
+            rows.append((tottime, cumtime, calls, f"{func} ({os.path.basename(filename)}:{line})"))
+        key = 0 if sort == 'tottime' else 1
+        rows.sort(key=lambda row: row[key], reverse=True)
+        self.stdout.write(f"cProfile hotspots across {len(files)} profiles (sorted by {sort}):")
+        self.stdout.write(f"{'tottime(s)':>11} {'cumtime(s)':>11} {'calls':>9}  function")
+        for tottime, cumtime, calls, name in rows[:top]:
+            self.stdout.write(f"{tottime:>11.4f} {cumtime:>11.4f} {calls:>9}  {name}")
+
+    def _report_stacks(self, files, top):
+        """
+        Sum folded stack samples; report self (leaf) and inclusive sample counts.
+        """
+        self_samples, inclusive = Counter(), Counter()
+        total = 0
+        for path in files:
+            with open(path, encoding='utf-8') as handle:
+                for line in handle:
+                    stack, _, count = line.rstrip('\n').rpartition(' ')
+                    if not stack:
+                        continue
+                    count = int(count)
+                    frames = stack.split(';')
+                    total += count
+                    self_samples[frames[-1]] += count
+                    for frame in set(frames):
+                        inclusive[frame] += count
+        self.stdout.write(f"Sampled hotspots across {len(files)} profiles ({total} samples):")
+        self.stdout.write(f"{'self%':>7} {'total%':>7}  frame")
+        for frame, count in self_samples.most_common(top):
+            self.stdout.write(f"{100.0 * count / total:>7.2f} {100.0 * inclusive[frame] / total:>7.2f}  {frame}")
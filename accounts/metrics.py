@@ -0,0 +1,284 @@
+"""
+In-process metrics registry with Prometheus text exposition.
+
+Counters and fixed-bucket histograms are kept per (name, labels) in plain
+dicts guarded by one lock, so recording is a dict lookup plus a bisect.
+
+Multi-worker deployments set ``METRICS['MULTIPROC_DIR']``: every process
+periodically writes its snapshot to ``<dir>/metrics-<pid>.json`` (atomic
+rename) and a scrape merges its own live metrics with the other processes'
+snapshot files, so any worker can answer for the whole host. Snapshots of
+processes that have exited are removed on scrape.
+"""
+import bisect
+import glob
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from django.conf import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250, 1000)
+
+HELP = {
+    'http_request_duration_seconds': 'Request latency by resolved route, method and status.',
+    'db_queries_per_request': 'Number of DB queries executed per request.',
+    'db_query_duration_seconds': 'Time spent in DB queries per request.',
+    'cache_requests_total': 'Cache lookups by cache name and result (hit/miss).',
+    'auth_failures_total': 'Failed login attempts by reason.',
+    'throttle_requests_total': 'Token-bucket throttle decisions by scope, kind and result.',
+}
+
+
+class Histogram:
+    """
+    Cumulative-on-export histogram with fixed upper bounds (+Inf implied).
+    """
+    __slots__ = ('bounds', 'counts', 'sum')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def quantile(self, q):
+        """
+        Estimate the q-quantile by linear interpolation inside the bucket.
+        """
+        total = self.count
+        if not total:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.bounds[-1]
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.bounds[-1]
+
+    def to_dict(self):
+        return {'bounds': list(self.bounds), 'counts': self.counts, 'sum': self.sum}
+
+    def merge(self, data):
+        for i, value in enumerate(data['counts']):
+            self.counts[i] += value
+        self.sum += data['sum']
+
+
+class MetricsRegistry:
+    """
+    Process-local store of counters and histograms.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self._last_flush = time.monotonic()
+
+    def inc(self, name, labels=(), amount=1):
+        key = (name, tuple(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+        self._maybe_flush()
+
+    def observe(self, name, labels, value, bounds=LATENCY_BUCKETS):
+        key = (name, tuple(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(bounds)
+            histogram.observe(value)
+        self._maybe_flush()
+
+    def snapshot(self):
+        """
+        Return a JSON-serialisable copy of every metric.
+        """
+        with self._lock:
+            return self._snapshot()
+
+    def _snapshot(self):
+        return {
+            'counters': [[name, list(labels), value]
+                         for (name, labels), value in self.counters.items()],
+            'histograms': [[name, list(labels), histogram.to_dict()]
+                           for (name, labels), histogram in self.histograms.items()],
+        }
+
+    def _maybe_flush(self):
+        directory = _multiproc_dir()
+        if not directory:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_flush < _config().get('FLUSH_INTERVAL', 5):
+                return
+            self._last_flush = now
+        self.flush(directory)
+
+    def flush(self, directory):
+        """
+        Atomically write this process's snapshot into the shared directory.
+        Flushes are serialised, so a slower, older snapshot never replaces
+        a newer one.
+        """
+        os.makedirs(directory, exist_ok=True)
+        pid = os.getpid()
+        with self._lock:
+            fd, tmp_path = tempfile.mkstemp(prefix=f"metrics-{pid}-", suffix='.tmp', dir=directory)
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as handle:
+                    json.dump(self._snapshot(), handle)
+                os.replace(tmp_path, os.path.join(directory, f"metrics-{pid}.json"))
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+
+
+def _config():
+    return getattr(settings, 'METRICS', {})
+
+
+def _multiproc_dir():
+    return _config().get('MULTIPROC_DIR') or ''
+
+
+registry = MetricsRegistry()
+
+
+def inc(name, *labels, amount=1):
+    registry.inc(name, labels, amount)
+
+
+def observe(name, labels, value, bounds=LATENCY_BUCKETS):
+    registry.observe(name, labels, value, bounds)
+
+
+def record_cache(cache_name, hit):
+    registry.inc('cache_requests_total', (cache_name, 'hit' if hit else 'miss'))
+
+
+LABEL_NAMES = {
+    'http_request_duration_seconds': ('route', 'method', 'status'),
+    'db_queries_per_request': ('route',),
+    'db_query_duration_seconds': ('route',),
+    'cache_requests_total': ('cache', 'result'),
+    'auth_failures_total': ('reason',),
+    'throttle_requests_total': ('scope', 'kind', 'result'),
+}
+
+
+SNAPSHOT_NAME = re.compile(r'metrics-(\d+)(?:-\w+\.tmp|\.json)$')
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _other_snapshots(directory):
+    """
+    Load the snapshot files of the other live processes, deleting the files
+    (and abandoned temporary files) of processes that have exited.
+    """
+    snapshots, own_pid = [], os.getpid()
+    for path in glob.glob(os.path.join(directory, 'metrics-*')):
+        match = SNAPSHOT_NAME.search(path)
+        if match is None:
+            continue
+        pid = int(match.group(1))
+        if pid == own_pid:
+            continue
+        if not _alive(pid):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            continue
+        if not path.endswith('.json'):
+            continue
+        try:
+            with open(path, encoding='utf-8') as handle:
+                snapshots.append(json.load(handle))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+
+def collect():
+    """
+    Merge this process's metrics with the snapshots of the other processes
+    in the shared directory. Returns (counters, histograms) dicts keyed by
+    (name, labels).
+    """
+    snapshots = [registry.snapshot()]
+    directory = _multiproc_dir()
+    if directory:
+        snapshots += _other_snapshots(directory)
+    counters, histograms = {}, {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, data in snapshot['histograms']:
+            key = (name, tuple(labels))
+            if key not in histograms:
+                histograms[key] = Histogram(tuple(data['bounds']))
+            histograms[key].merge(data)
+    return counters, histograms
+
+
+def _format_labels(name, labels, extra=()):
+    names = LABEL_NAMES.get(name, tuple(f"label{i}" for i in range(len(labels))))
+    pairs = list(zip(names, labels)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for _, value in pairs)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + '}'
+
+
+def render_text(prefix='ticketbooking_'):
+    """
+    Render all metrics in the Prometheus text exposition format (0.0.4).
+    """
+    counters, histograms = collect()
+    lines = []
+    for metric_type, items in (('counter', counters), ('histogram', histograms)):
+        for name in sorted({name for name, _ in items}):
+            full_name = prefix + name
+            if name in HELP:
+                lines.append(f"# HELP {full_name} {HELP[name]}")
+            lines.append(f"# TYPE {full_name} {metric_type}")
+            for (metric_name, labels), value in sorted(items.items()):
+                if metric_name != name:
+                    continue
+                if metric_type == 'counter':
+                    lines.append(f"{full_name}{_format_labels(name, labels)} {value}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(list(value.bounds) + ['+Inf'], value.counts):
+                    cumulative += count
+                    le = bound if bound == '+Inf' else repr(float(bound))
+                    lines.append(f"{full_name}_bucket{_format_labels(name, labels, [('le', le)])} {cumulative}")
+                lines.append(f"{full_name}_sum{_format_labels(name, labels)} {value.sum}")
+                lines.append(f"{full_name}_count{_format_labels(name, labels)} {cumulative}")
+    return '\n'.join(lines) + '\n'
@@ -1,5 +1,17 @@
 import logging
 import datetime
+import hmac
+import os
+import random
+import re
+import time
+from contextlib import ExitStack
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.urls import Resolver404, resolve
+from . import metrics
+from .profiling import ENGINES, profile_filename
 
 logger = logging.getLogger('request_logger')
 
@@ -19,4 +31,112 @@ class LoggingMiddleware:
         # Log response details
         logger.info(f"Response: {response.status_code} at {datetime.datetime.now()}")
         
-        return response
\ No newline at end of file
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Opt-in middleware that profiles a sample of requests.
+
+    A request is profiled when any of these hold (see settings.PROFILING):
+        - the configured header (default `X-Profile`) carries HEADER_SECRET,
+          or is sent by a staff user logged in through the session (JWT
+          users are only known to the views); otherwise it is ignored,
+        - its resolved url name matches one of the ROUTES regexes,
+        - a random draw falls under SAMPLE_RATE.
+    Profiles are written to OUTPUT_DIR as
+    '<route>_<latency>ms_<timestamp>_<pid>.<prof|stacks>'.
+    Disabled entirely (not even installed) unless ENABLED is true.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        config = getattr(settings, 'PROFILING', {})
+        if not config.get('ENABLED'):
+            raise MiddlewareNotUsed()
+        self.sample_rate = float(config.get('SAMPLE_RATE', 0.0))
+        self.header = config.get('HEADER', 'HTTP_X_PROFILE')
+        self.header_secret = config.get('HEADER_SECRET', '')
+        self.routes = [re.compile(pattern) for pattern in config.get('ROUTES', [])]
+        self.engine = ENGINES[config.get('ENGINE', 'cprofile')]
+        self.engine_options = {'interval': config.get('SAMPLER_INTERVAL', 0.005)}
+        self.output_dir = str(config.get('OUTPUT_DIR', settings.BASE_DIR / 'logs/profiles'))
+        os.makedirs(self.output_dir, exist_ok=True)
+
+    def __call__(self, request):
+        if not self._should_profile(request):
+            return self.get_response(request)
+        profiler = self.engine(**self.engine_options)
+        if not profiler.start():
+            return self.get_response(request)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.stop()
+        latency_ms = (time.perf_counter() - started) * 1000
+        match = getattr(request, 'resolver_match', None)
+        route = match.view_name if match else None
+        path = os.path.join(self.output_dir, profile_filename(route, latency_ms, profiler.extension))
+        try:
+            profiler.dump(path)
+            logger.info(f"Profile written: {path}")
+        except OSError as e:
+            logger.error(f"Failed to write profile {path}: {str(e)}")
+        return response
+
+    def _header_allowed(self, request):
+        if self.header_secret and hmac.compare_digest(request.META[self.header].encode(),
+                                                      self.header_secret.encode()):
+            return True
+        user = getattr(request, 'user', None)
+        return bool(user is not None and user.is_authenticated and user.is_staff)
+
+    def _should_profile(self, request):
+        if self.header in request.META and self._header_allowed(request):
+            return True
+        if self.routes:
+            try:
+                view_name = resolve(request.path_info).view_name
+            except Resolver404:
+                view_name = ''
+            if any(pattern.search(view_name) for pattern in self.routes):
+                return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+
+class MetricsMiddleware:
+    """
+    Records request latency by resolved route name, method and status, plus
+    the number of DB queries and time spent in them, into accounts.metrics.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if not getattr(settings, 'METRICS', {}).get('ENABLED', True):
+            raise MiddlewareNotUsed()
+
+    def __call__(self, request):
+        db_stats = [0, 0.0]
+
+        def timed_execute(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                db_stats[0] += 1
+                db_stats[1] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(timed_execute))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        route = match.view_name if match and match.view_name else 'unresolved'
+        metrics.observe('http_request_duration_seconds',
+                        (route, request.method, str(response.status_code)), elapsed)
+        metrics.observe('db_queries_per_request', (route,), db_stats[0],
+                        bounds=metrics.QUERY_COUNT_BUCKETS)
+        metrics.observe('db_query_duration_seconds', (route,), db_stats[1])
+        return response
@@ -0,0 +1,127 @@
+"""
+Bulk user onboarding for corporate and group accounts.
+
+Rows are validated in memory with the same rules as registration, checked
+for duplicates within the batch and against the database with one query per
+unique field, hashed across a process pool (accounts/hashing.py) and inserted
+with bulk_create in chunks. Every rejected row is reported with its index and
+reasons; valid rows are created regardless.
+"""
+import logging
+import re
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from utils.constants import AlreadyExistsMessage, FieldValidationMessage, OnboardingMessage
+from .hashing import hash_passwords
+from .models import Role, User
+
+logger = logging.getLogger('request_logger')
+
+MOBILE_PATTERN = re.compile(r"^[6-9][0-9]{9}$")
+UNIQUE_FIELDS = {
+    'username': AlreadyExistsMessage.USERNAME_ALREADY_EXISTS,
+    'email': AlreadyExistsMessage.EMAIL_ALREADY_EXISTS,
+    'mobile_number': AlreadyExistsMessage.MOBILE_ALREADY_EXISTS,
+}
+
+
+def _clean(row):
+    """
+    Normalise one input row and return (values, errors).
+    """
+    values = {field: str(row.get(field) or '').strip()
+              for field in ('username', 'email', 'mobile_number', 'first_name', 'last_name')}
+    values['password'] = str(row.get('password') or '')
+    errors = {}
+    if len(values['username']) < 3:
+        errors['username'] = FieldValidationMessage.USERNAME_TOO_SHORT
+    elif len(values['username']) > User._meta.get_field('username').max_length:
+        errors['username'] = OnboardingMessage.USERNAME_TOO_LONG
+    try:
+        validate_email(values['email'])
+    except ValidationError:
+        errors['email'] = FieldValidationMessage.EMAIL_INVALID
+    if not MOBILE_PATTERN.match(values['mobile_number']):
+        errors['mobile_number'] = FieldValidationMessage.MOBILE_INVALID
+    if not values['first_name']:
+        errors['first_name'] = OnboardingMessage.FIRST_NAME_REQUIRED
+    if not 8 <= len(values['password']) <= 16:
+        errors['password'] = FieldValidationMessage.PASSWORD_LONG_OR_SHORT
+    return values, errors
+
+
+def _find_duplicates(candidates):
+    """
+    Flag rows repeating a unique value earlier in the batch or already
+    stored. One query per unique field. Returns {index: {field: message}}.
+    """
+    duplicates = {}
+    for field, message in UNIQUE_FIELDS.items():
+        seen = set()
+        for index, values in candidates:
+            if values[field] in seen:
+                duplicates.setdefault(index, {})[field] = message
+            seen.add(values[field])
+        existing = set(User.objects.filter(**{f"{field}__in": seen}).values_list(field, flat=True))
+        for index, values in candidates:
+            if values[field] in existing:
+                duplicates.setdefault(index, {})[field] = message
+    return duplicates
+
+
+def _insert(users, indexes, failures):
+    """
+    bulk_create one chunk; if a concurrent signup took one of its values,
+    retry row by row so only the conflicting rows fail.
+    """
+    try:
+        with transaction.atomic():
+            User.objects.bulk_create(users)
+        return len(users)
+    except IntegrityError:
+        created = 0
+        for index, user in zip(indexes, users):
+            try:
+                with transaction.atomic():
+                    user.save()
+                created += 1
+            except IntegrityError:
+                failures.append({'row': index, 'errors': {'user': OnboardingMessage.ROW_CONFLICT}})
+        return created
+
+
+def onboard_users(rows, role_name=Role.PASSENGER, chunk_size=1000, workers=None, dry_run=False):
+    """
+    Create users from dicts with username, email, mobile_number, first_name,
+    last_name and password. Returns {'created': n, 'failed': [{'row', 'errors'}]}
+    (for dry runs 'created' is the number that would be created).
+    """
+    failures = []
+    candidates = []
+    for index, row in enumerate(rows):
+        values, errors = _clean(row)
+        if errors:
+            failures.append({'row': index, 'errors': errors})
+        else:
+            candidates.append((index, values))
+    duplicates = _find_duplicates(candidates)
+    failures.extend({'row': index, 'errors': errors} for index, errors in duplicates.items())
+    candidates = [(index, values) for index, values in candidates if index not in duplicates]
+
+    created = len(candidates)
+    if candidates and not dry_run:
+        role, _ = Role.objects.get_or_create(name=role_name)
+        hashes = hash_passwords([values['password'] for _, values in candidates], workers=workers)
+        created = 0
+        for start in range(0, len(candidates), chunk_size):
+            chunk = candidates[start:start + chunk_size]
+            users = [User(username=values['username'], email=values['email'],
+                          mobile_number=values['mobile_number'], first_name=values['first_name'],
+                          last_name=values['last_name'], role=role, password=encoded)
+                     for (_, values), encoded in zip(chunk, hashes[start:start + chunk_size])]
+            created += _insert(users, [index for index, _ in chunk], failures)
+
+    failures.sort(key=lambda failure: failure['row'])
+    logger.info(f"Onboarded {created} users ({len(failures)} rows rejected, dry_run={dry_run})")
+    return {'created': created, 'failed': failures}
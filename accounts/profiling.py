@@ -0,0 +1,102 @@
+"""
+Per-request profilers used by `accounts.middleware.ProfilingMiddleware`.
+
+Two engines are available:
+    - ``cprofile``: deterministic profile written as a pstats ``.prof`` file.
+    - ``sampler``: a background thread that samples the request thread's stack
+      every ``SAMPLER_INTERVAL`` seconds and writes folded stacks
+      (``frame;frame;frame count``) to a ``.stacks`` file. Much cheaper than
+      cProfile on call-heavy code paths.
+"""
+import cProfile
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+_cprofile_lock = threading.Lock()
+
+
+def profile_filename(route, latency_ms, extension):
+    """
+    Build '<route>_<latency>ms_<epoch-ms>_<pid>.<ext>' with the route made filesystem safe.
+    """
+    safe_route = re.sub(r'[^A-Za-z0-9_.-]+', '-', route or 'unresolved').strip('-')
+    return f"{safe_route}_{int(latency_ms)}ms_{int(time.time() * 1000)}_{os.getpid()}.{extension}"
+
+
+class CProfileEngine:
+    """
+    Wraps cProfile.Profile. Only one request per process can be profiled at a
+    time; concurrent candidates are skipped rather than queued.
+    """
+    extension = 'prof'
+
+    def __init__(self, **options):
+        self.profile = None
+
+    def start(self):
+        if not _cprofile_lock.acquire(blocking=False):
+            return False
+        self.profile = cProfile.Profile()
+        try:
+            self.profile.enable()
+        except ValueError:  # another profiler is active in this interpreter
+            _cprofile_lock.release()
+            self.profile = None
+            return False
+        return True
+
+    def stop(self):
+        self.profile.disable()
+        _cprofile_lock.release()
+
+    def dump(self, path):
+        self.profile.dump_stats(path)
+
+
+class StackSampler:
+    """
+    Samples the calling thread's stack from a daemon thread.
+    """
+    extension = 'stacks'
+
+    def __init__(self, interval=0.005, **options):
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        target = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, args=(target,), daemon=True)
+        self._thread.start()
+        return True
+
+    def _run(self, target):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path):
+        with open(path, 'w', encoding='utf-8') as handle:
+            for stack, count in self.samples.most_common():
+                handle.write(f"{stack} {count}\n")
+
+
+ENGINES = {
+    'cprofile': CProfileEngine,
+    'sampler': StackSampler,
+}
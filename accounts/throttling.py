@@ -0,0 +1,244 @@
+"""
+Token-bucket throttling for the expensive authentication and search endpoints.
+
+Each throttle class keys a bucket by a single identity (client IP or submitted
+username) and reads its limit from ``REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']``
+using ``'<throttle_scope>.<kind>'`` keys, e.g. ``'login.ip': '20/min'``. The
+number is the bucket capacity and the period is the time it takes to refill a
+full bucket, so ``20/min`` allows a burst of 20 and then one request every 3s.
+
+Bucket state lives in a pluggable store selected by ``THROTTLE_BUCKET_BACKEND``:
+    - ``shared`` (default): a fixed-size mmap'ed slot table shared by every
+      worker process on the host (``THROTTLE_SHARED_MEMORY_PATH``). Updates
+      are atomic under a file lock; limits apply per host.
+    - ``cache``: the Django cache named by ``THROTTLE_CACHE_ALIAS``. Limits
+      apply across hosts, but the read-modify-write is not atomic, so
+      concurrent requests can overspend a bucket by a few tokens.
+"""
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+from . import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+RATE_PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+_counters = defaultdict(lambda: {'allowed': 0, 'rejected': 0})
+_counters_lock = threading.Lock()
+_store = None
+_store_lock = threading.Lock()
+
+
+def parse_rate(rate):
+    """
+    Parse a DRF style rate string ('20/min') into (capacity, tokens per second).
+    """
+    num, period = rate.split('/')
+    capacity = int(num)
+    duration = RATE_PERIODS[period.strip()[0]]
+    return capacity, capacity / duration
+
+
+def throttle_counters():
+    """
+    Return a snapshot of allowed/rejected counts keyed by (scope, kind).
+    """
+    with _counters_lock:
+        return {key: dict(value) for key, value in _counters.items()}
+
+
+def _record(scope, kind, allowed):
+    result = 'allowed' if allowed else 'rejected'
+    with _counters_lock:
+        _counters[(scope, kind)][result] += 1
+    metrics.inc('throttle_requests_total', scope, kind, result)
+
+
+class CacheBucketStore:
+    """
+    Keeps (tokens, last_refill) tuples in a Django cache. Not atomic:
+    concurrent consumers of one bucket can each see the same token count.
+    """
+    def __init__(self, alias='default'):
+        self.cache = caches[alias]
+
+    def consume(self, key, capacity, refill_rate):
+        """
+        Take one token from the bucket. Returns (allowed, wait_seconds).
+        """
+        now = time.time()
+        bucket = self.cache.get(key)
+        metrics.record_cache('throttle', bucket is not None)
+        tokens, last = bucket or (capacity, now)
+        tokens = min(capacity, tokens + (now - last) * refill_rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self.cache.set(key, (tokens, now), timeout=int(capacity / refill_rate) + 1)
+        return allowed, 0 if allowed else (1 - tokens) / refill_rate
+
+
+class SharedMemoryBucketStore:
+    """
+    Fixed-size open-addressed table of buckets in a memory-mapped file.
+
+    Every worker on the host maps the same file, so limits hold across
+    processes without a network round trip. Each slot packs the 64-bit key
+    hash, token count and last refill time; when a probe window is full the
+    least recently refilled slot is recycled.
+    """
+    SLOT = struct.Struct('<Qdd')
+    PROBE = 8
+
+    def __init__(self, path, slots=65536):
+        self.slots = slots
+        size = self.SLOT.size * slots
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+        self._lock = threading.Lock()
+
+    def _hash(self, key):
+        data = key.encode()
+        return (zlib.crc32(data) << 32 | zlib.adler32(data)) or 1
+
+    def consume(self, key, capacity, refill_rate):
+        """
+        Take one token from the bucket. Returns (allowed, wait_seconds).
+        """
+        key_hash = self._hash(key)
+        now = time.time()
+        with self._lock:
+            if fcntl:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                offset, tokens, last = self._find(key_hash, capacity, now)
+                tokens = min(capacity, tokens + (now - last) * refill_rate)
+                allowed = tokens >= 1
+                if allowed:
+                    tokens -= 1
+                self.SLOT.pack_into(self._map, offset, key_hash, tokens, now)
+            finally:
+                if fcntl:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return allowed, 0 if allowed else (1 - tokens) / refill_rate
+
+    def _find(self, key_hash, capacity, now):
+        """
+        Locate the slot for key_hash, claiming an empty or stale one if needed.
+        """
+        start = key_hash % self.slots
+        victim, victim_last = None, None
+        for i in range(self.PROBE):
+            offset = ((start + i) % self.slots) * self.SLOT.size
+            slot_hash, tokens, last = self.SLOT.unpack_from(self._map, offset)
+            if slot_hash == key_hash:
+                return offset, tokens, last
+            if slot_hash == 0:
+                return offset, capacity, now
+            if victim is None or last < victim_last:
+                victim, victim_last = offset, last
+        return victim, capacity, now
+
+
+def get_bucket_store():
+    """
+    Return the process-wide bucket store configured in settings.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                backend = getattr(settings, 'THROTTLE_BUCKET_BACKEND', 'shared')
+                if backend == 'cache':
+                    _store = CacheBucketStore(getattr(settings, 'THROTTLE_CACHE_ALIAS', 'default'))
+                else:
+                    _store = SharedMemoryBucketStore(settings.THROTTLE_SHARED_MEMORY_PATH)
+    return _store
+
+
+def take_token(scope, kind, identity):
+    """
+    Consume one token from the `<scope>.<kind>` bucket of `identity`.
+    Returns (allowed, wait_seconds); always allowed when no rate is set.
+    Also used outside DRF, e.g. by the raw ASGI push endpoints.
+    """
+    rate = api_settings.DEFAULT_THROTTLE_RATES.get(f'{scope}.{kind}')
+    if not rate or not identity:
+        return True, None
+    capacity, refill_rate = parse_rate(rate)
+    allowed, wait_seconds = get_bucket_store().consume(
+        f'throttle:{scope}:{kind}:{identity}', capacity, refill_rate)
+    _record(scope, kind, allowed)
+    return allowed, wait_seconds
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Base token-bucket throttle. Subclasses define `kind` and `get_identity`.
+    Views opt in by setting `throttle_scope` and listing the throttle class.
+    """
+    kind = None
+
+    def get_identity(self, request, view):
+        raise NotImplementedError('.get_identity() must be overridden')
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        self.wait_seconds = None
+        if not api_settings.DEFAULT_THROTTLE_RATES.get(f'{scope}.{self.kind}'):
+            return True
+        allowed, self.wait_seconds = take_token(scope, self.kind, self.get_identity(request, view))
+        if not allowed:
+            request.token_bucket_rejected = True
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    """
+    Bucket per client IP (honours REST_FRAMEWORK['NUM_PROXIES']).
+    """
+    kind = 'ip'
+
+    def get_identity(self, request, view):
+        return self.get_ident(request)
+
+
+class UsernameTokenBucketThrottle(TokenBucketThrottle):
+    """
+    Bucket per submitted username, so one account cannot be brute forced
+    from many addresses.
+    """
+    kind = 'username'
+
+    def allow_request(self, request, view):
+        # A request the IP bucket already refused must not drain the account's bucket,
+        # or one address could lock the account out for everyone.
+        if getattr(request, 'token_bucket_rejected', False):
+            self.wait_seconds = None
+            return True
+        return super().allow_request(request, view)
+
+    def get_identity(self, request, view):
+        username = request.data.get('username') if hasattr(request.data, 'get') else None
+        if not isinstance(username, str):
+            return None
+        return username.strip().lower()
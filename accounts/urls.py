@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import RegisterView, LoginView
+from .views import RegisterView, LoginView, MetricsView, BatchView, BulkOnboardView
 from rest_framework_simplejwt.views import (
     TokenRefreshView,
 )
@@ -8,4 +8,7 @@ urlpatterns = [
     path('auth/register/', RegisterView.as_view(), name='register'),
     path('auth/login/', LoginView.as_view(), name='login'),
     path('auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+    path('batch/', BatchView.as_view(), name='batch'),
+    path('admin/users/bulk/', BulkOnboardView.as_view(), name='bulk-onboard'),
 ] 
\ No newline at end of file
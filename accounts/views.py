@@ -3,12 +3,22 @@ from rest_framework.response import Response
 from rest_framework import status
 from .serializers import UserRegistrationSerializer, UserLoginSerializer
 from .models import User, Role
-from django.contrib.auth.hashers import make_password
-from utils.constants import UserMessage
+from utils.constants import UserMessage, BatchMessage, OnboardingMessage
 import logging
 from django.contrib.auth import authenticate
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.utils import timezone
+from .throttling import IPTokenBucketThrottle, UsernameTokenBucketThrottle
+from . import metrics
+from .batch import run_batch
+from .onboarding import onboard_users
+from .idempotency import idempotent
+from .hashing import make_password
+from .exceptions import InvalidInput, HashingPoolSaturated
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework.permissions import IsAuthenticated
+from trains.permissions import IsAdminUser
 
 logger = logging.getLogger('request_logger')
 
@@ -21,6 +31,10 @@ class RegisterView(APIView):
     Validates input data, handles duplicate users, and returns user 
     details on success.
     """
+    throttle_classes = [IPTokenBucketThrottle]
+    throttle_scope = 'register'
+
+    @idempotent
     def post(self, request):
         """
         Handle user registration.
@@ -54,6 +68,9 @@ class LoginView(APIView):
     Authenticates a user with username and password, returns JWT tokens and 
     user info, and updates last_login.
     """
+    throttle_classes = [IPTokenBucketThrottle, UsernameTokenBucketThrottle]
+    throttle_scope = 'login'
+
     def post(self, request):
         """
         Handle user login.
@@ -74,6 +91,8 @@ class LoginView(APIView):
             logger.info(f"User logged in successfully: {user.username}")
             return Response(response_data, status=status.HTTP_200_OK)
 
+        except HashingPoolSaturated:
+            raise
         except Exception as e:
             logger.error(f"Login failed: {str(e)}")
             return Response({
@@ -89,8 +108,10 @@ class LoginView(APIView):
         """
         user = authenticate(username=username, password=password)
         if not user:
+            metrics.inc('auth_failures_total', 'invalid_credentials')
             raise Exception(UserMessage.INVALID_CREDENTIALS)
         if not user.is_active:
+            metrics.inc('auth_failures_total', 'inactive')
             raise Exception(UserMessage.USER_INACTIVE)
         return user
 
@@ -119,4 +140,83 @@ class LoginView(APIView):
             'access_token': access_token,
             'refresh_token': refresh_token,
             'user': user.username
-        }           
+        }
+
+
+class MetricsView(APIView):
+    """
+    API endpoint exposing the metrics registry in Prometheus text format.
+
+    GET:
+    Admin only. Aggregates every worker's snapshot when METRICS_MULTIPROC_DIR
+    is configured.
+    """
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def get(self, request):
+        """
+        Render all counters and histograms as text/plain.
+        """
+        return HttpResponse(metrics.render_text(),
+                            content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class BatchView(APIView):
+    """
+    API endpoint running an ordered list of API calls in one round trip.
+
+    POST:
+    {"atomic": false, "requests": [{"method": "POST", "path": "/api/admin/...",
+    "body": {...}, "query": {...}, "idempotency_key": "..."}, ...]}. The
+    caller is authenticated once; each item still passes its own view's
+    permission checks. With "atomic": true all items share one transaction
+    and the first failure rolls back the batch. Returns one
+    {"status", "body"} per item, in order.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        items = request.data.get('requests') if isinstance(request.data, dict) else None
+        if not isinstance(items, list) or not items or not all(isinstance(item, dict) for item in items):
+            raise InvalidInput(BatchMessage.REQUESTS_REQUIRED)
+        max_requests = settings.BATCH_MAX_REQUESTS
+        if len(items) > max_requests:
+            raise InvalidInput(BatchMessage.TOO_MANY_REQUESTS.format(max_requests=max_requests))
+        atomic = bool(request.data.get('atomic', False))
+        logger.info(f"Batch of {len(items)} requests (atomic={atomic}) by {request.user.username}")
+        results, committed = run_batch(request, items, atomic=atomic)
+        return Response({'success': all(result['status'] < 400 for result in results),
+                         'committed': committed,
+                         'results': results},
+                        status=status.HTTP_200_OK)
+
+
+class BulkOnboardView(APIView):
+    """
+    API endpoint for creating many users in one call.
+
+    POST:
+    Admin only. {"users": [{"username", "email", "mobile_number", "first_name",
+    "last_name", "password"}, ...], "role": "passenger", "dry_run": false}.
+    Valid rows are created; rejected rows come back with their index and
+    reasons.
+    """
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    @idempotent
+    def post(self, request):
+        rows = request.data.get('users') if isinstance(request.data, dict) else None
+        if not isinstance(rows, list) or not rows or not all(isinstance(row, dict) for row in rows):
+            raise InvalidInput(OnboardingMessage.USERS_REQUIRED)
+        max_rows = settings.ONBOARDING['MAX_ROWS']
+        if len(rows) > max_rows:
+            raise InvalidInput(OnboardingMessage.TOO_MANY_USERS.format(max_rows=max_rows))
+        role_name = request.data.get('role', Role.PASSENGER)
+        if role_name not in (Role.PASSENGER, Role.ADMIN):
+            raise InvalidInput(OnboardingMessage.ROLE_INVALID)
+        result = onboard_users(rows, role_name=role_name,
+                               chunk_size=settings.ONBOARDING['CHUNK_SIZE'],
+                               workers=settings.ONBOARDING['HASH_WORKERS'] or None,
+                               dry_run=bool(request.data.get('dry_run', False)))
+        return Response({'success': not result['failed'], **result},
+                        status=status.HTTP_201_CREATED if result['created'] else status.HTTP_200_OK)
@@ -0,0 +1,8 @@
+from django.contrib import admin
+from .models import CancellationJob, Inventory, Notification, Refund, Ticket
+
+admin.site.register(Inventory)
+admin.site.register(Ticket)
+admin.site.register(CancellationJob)
+admin.site.register(Refund)
+admin.site.register(Notification)
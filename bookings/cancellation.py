@@ -0,0 +1,136 @@
+"""
+Cancellation of a whole train run (weather, engineering works), in chunks.
+
+start_job() cancels the run and records a CancellationJob, then returns
+straight away. It also adds a REMOVED exception to each of the train's
+calendars so that materialize_runs does not bring the run back. The
+tickets are handled by process_job(), run from
+`python manage.py process_cancellations`:
+
+1. Each Inventory row of the run is locked once and its queues cleared.
+   book() re-checks the run status under that lock, so no booking can land
+   after this point.
+2. The run's remaining tickets are walked in id order, CHUNK_SIZE at a
+   time. Each chunk is one transaction. It cancels the tickets with one
+   UPDATE, bulk-creates their refunds (the full fare) and notifications,
+   and advances the job's checkpoint. A crash loses at most the chunk in
+   flight, and the next run resumes after the checkpoint.
+
+The cached PNR statuses dropped along the way are read by the web workers,
+which is one reason the default cache must be shared (settings.CACHES).
+"""
+import logging
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from trains.exceptions import AlreadyExists
+from trains.models import ServiceCalendar, ServiceException, TrainRun
+from utils.constants import CancellationMessage
+from .models import CancellationJob, Inventory, Notification, Refund, Ticket
+from .notifications import queue
+from .pnr import invalidate, queue_changed
+
+logger = logging.getLogger('request_logger')
+
+ACTIVE_STATUSES = [Ticket.CONFIRMED, Ticket.RAC, Ticket.WAITLISTED]
+
+
+def start_job(run, reason, user=None):
+    """
+    Cancel `run` and queue the cancellation of its tickets.
+    """
+    with transaction.atomic():
+        run = TrainRun.objects.select_for_update().get(pk=run.pk)
+        if CancellationJob.objects.filter(run=run).exists():
+            raise AlreadyExists(CancellationMessage.JOB_EXISTS)
+        run.status = TrainRun.CANCELLED
+        run.save(update_fields=['status', 'updated_at'])
+        for calendar in ServiceCalendar.objects.filter(train_id=run.train_id):
+            ServiceException.objects.update_or_create(calendar=calendar, date=run.run_date,
+                                                      defaults={'exception_type': ServiceException.REMOVED})
+        job = CancellationJob.objects.create(
+            run=run, reason=reason, created_by=user,
+            total_tickets=Ticket.objects.filter(run=run, status__in=ACTIVE_STATUSES).count())
+        # PNR statuses show the run status, so they are stale from here on,
+        # not only once the job reaches their tickets.
+        invalidate(Ticket.objects.filter(run=run, status__in=ACTIVE_STATUSES)
+                   .values_list('pnr', flat=True).distinct())
+    logger.info(f"Cancellation job {job.pk} queued for run {run.pk} ({job.total_tickets} tickets)")
+    return job
+
+
+def _release_inventory(job):
+    """
+    Lock every Inventory row of the run and clear its queue counters.
+    """
+    with transaction.atomic():
+        inventories = list(Inventory.objects.select_for_update().filter(run_id=job.run_id))
+        for inventory in inventories:
+            inventory.rac_count = inventory.waitlist_count = 0
+            inventory.version += 1
+            inventory.positions_version += 1
+        Inventory.objects.bulk_update(inventories, ['rac_count', 'waitlist_count', 'version',
+                                                    'positions_version'])
+        for inventory in inventories:
+            queue_changed(inventory)
+
+
+def process_chunk(job, chunk_size):
+    """
+    Cancel, refund and notify the next chunk of the job's tickets.
+    Returns the number of tickets processed (0 when done).
+    """
+    with transaction.atomic():
+        job = CancellationJob.objects.select_for_update().get(pk=job.pk)
+        tickets = list(Ticket.objects.filter(run_id=job.run_id, pk__gt=job.checkpoint,
+                                             status__in=ACTIVE_STATUSES)
+                       .order_by('pk').values_list('pk', 'user_id', 'fare', 'pnr')[:chunk_size])
+        if not tickets:
+            return 0
+        ids = [pk for pk, _, _, _ in tickets]
+        Ticket.objects.filter(pk__in=ids).update(status=Ticket.CANCELLED, seat=None, queue_position=None,
+                                                 updated_at=timezone.now())
+        invalidate(pnr for _, _, _, pnr in tickets)
+        Refund.objects.bulk_create([Refund(ticket_id=pk, job=job, amount=fare) for pk, _, fare, _ in tickets])
+        message = CancellationMessage.NOTIFICATION.format(train_number=job.run.train.number,
+                                                          run_date=job.run.run_date, reason=job.reason)
+        queue(Notification.RUN_CANCELLED, [(user_id, pk, message) for pk, user_id, _, _ in tickets])
+        job.checkpoint = ids[-1]
+        job.processed += len(ids)
+        job.refunded_amount += sum(fare for _, _, fare, _ in tickets)
+        job.save(update_fields=['checkpoint', 'processed', 'refunded_amount', 'updated_at'])
+    return len(ids)
+
+
+def process_job(job, chunk_size=None):
+    """
+    Run (or resume) a cancellation job to completion. A failure marks the
+    job failed with its error; it resumes from the checkpoint when run again.
+    """
+    chunk_size = chunk_size or settings.CANCELLATION['CHUNK_SIZE']
+    job = CancellationJob.objects.select_related('run__train').get(pk=job.pk)
+    if job.status == CancellationJob.COMPLETED:
+        return job
+    CancellationJob.objects.filter(pk=job.pk).update(status=CancellationJob.RUNNING, error='',
+                                                     started_at=job.started_at or timezone.now())
+    try:
+        _release_inventory(job)
+        while process_chunk(job, chunk_size):
+            pass
+    except Exception as error:
+        CancellationJob.objects.filter(pk=job.pk).update(status=CancellationJob.FAILED, error=str(error))
+        logger.exception(f"Cancellation job {job.pk} failed at ticket {job.checkpoint}")
+        return job
+    CancellationJob.objects.filter(pk=job.pk).update(status=CancellationJob.COMPLETED,
+                                                     finished_at=timezone.now())
+    job.refresh_from_db()
+    logger.info(f"Cancellation job {job.pk} completed: {job.processed} tickets, "
+                f"{job.refunded_amount} refunded")
+    return job
+
+
+def pending_jobs(include_failed=False):
+    statuses = [CancellationJob.PENDING, CancellationJob.RUNNING]
+    if include_failed:
+        statuses.append(CancellationJob.FAILED)
+    return CancellationJob.objects.filter(status__in=statuses).order_by('pk')
@@ -0,0 +1,307 @@
+"""
+Seat allocation for bookings, with RAC and waitlist promotion.
+
+A ticket holds a seat for the legs it travels (Ticket.legs, one bit per
+leg), so one seat can be sold to several passengers whose journeys don't
+overlap. Sleeper classes keep their side-lower berths ('S' in the layout)
+for RAC, each shared by two passengers. Every other seat of the class can
+be confirmed. A booking is confirmed when a seat is free over its legs.
+Otherwise it goes to RAC when a side-lower berth has room, and otherwise
+to the waitlist.
+
+All changes to one class on one run happen with its Inventory row locked.
+Occupancy is rebuilt from the run's CNF and RAC tickets, which are bounded
+by the number of seats. The waitlist is never scanned: candidates come from
+the queue mirrors in bookings.waitlist.
+"""
+import logging
+from collections import defaultdict
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from trains.exceptions import InvalidInput
+from trains.models import TrainRun
+from trains.seatmap import empty_bitmap, get_seat_map, set_bit
+from utils.constants import BookingMessage
+from .models import Inventory, Notification, Ticket
+from .notifications import queue
+from .pnr import encode, invalidate
+from .waitlist import QueueEntry, bump_version, close_gaps, get_queue, renumber
+
+logger = logging.getLogger('request_logger')
+
+RAC_BERTH = 'S'
+RAC_SHARE = 2
+
+
+class Occupancy:
+    """
+    Legs held on each seat of one class of a run.
+    """
+
+    def __init__(self, seat_map, travel_class, tickets):
+        seats = list(seat_map.class_range(travel_class))
+        self.rac_berths = [seat for seat in seats if seat_map.berths[seat] == RAC_BERTH]
+        rac = set(self.rac_berths)
+        self.seats = [seat for seat in seats if seat not in rac]
+        self.taken = dict.fromkeys(self.seats, 0)
+        self.shared = {seat: [] for seat in self.rac_berths}
+        for status, seat, legs in tickets:
+            if status == Ticket.CONFIRMED and seat in self.taken:
+                self.taken[seat] |= legs
+            elif status == Ticket.RAC and seat in self.shared:
+                self.shared[seat].append(legs)
+
+    def hold_seat(self, legs):
+        """
+        Hold the first seat free over `legs`; returns it, or None.
+        """
+        for seat in self.seats:
+            if not self.taken[seat] & legs:
+                self.taken[seat] |= legs
+                return seat
+        return None
+
+    def rac_full(self, seat):
+        """
+        Legs on which side-lower berth `seat` has no share left.
+        """
+        held = self.shared[seat]
+        # A leg is full where two held journeys overlap (RAC_SHARE == 2).
+        full = 0
+        for index, other in enumerate(held):
+            for another in held[index + 1:]:
+                full |= other & another
+        return full
+
+    def hold_rac(self, legs):
+        """
+        Hold a share of the first side-lower berth with room over `legs`.
+        """
+        for seat in self.rac_berths:
+            if not self.rac_full(seat) & legs:
+                self.shared[seat].append(legs)
+                return seat
+        return None
+
+    def is_taken(self, seat, legs):
+        """
+        Whether `seat` can no longer be sold over `legs`: held by a confirmed
+        ticket on any of them, or, for an RAC berth, fully shared on one.
+        """
+        if seat in self.taken:
+            return bool(self.taken[seat] & legs)
+        return bool(self.rac_full(seat) & legs)
+
+    def release_rac(self, seat, legs):
+        self.shared[seat].remove(legs)
+
+
+def _occupancy(inventory, seat_map):
+    tickets = (Ticket.objects.filter(run_id=inventory.run_id, travel_class=inventory.travel_class,
+                                     status__in=[Ticket.CONFIRMED, Ticket.RAC])
+               .values_list('status', 'seat', 'from_stop', 'to_stop'))
+    return Occupancy(seat_map, inventory.travel_class,
+                     [(status, seat, (1 << to_stop) - (1 << from_stop))
+                      for status, seat, from_stop, to_stop in tickets])
+
+
+def availability(run, seat_map, boarding, alighting):
+    """
+    Bitmap (trains.seatmap) of the run's seats that are taken somewhere
+    between two of its stops, over every class of the train. Read without
+    locks, so it is a snapshot.
+    """
+    legs = (1 << alighting.stop_number) - (1 << boarding.stop_number)
+    tickets = defaultdict(list)
+    for travel_class, status, seat, from_stop, to_stop in (
+            Ticket.objects.filter(run=run, status__in=[Ticket.CONFIRMED, Ticket.RAC])
+            .values_list('travel_class', 'status', 'seat', 'from_stop', 'to_stop')):
+        tickets[travel_class].append((status, seat, (1 << to_stop) - (1 << from_stop)))
+    taken = empty_bitmap(seat_map.total_seats)
+    for travel_class in seat_map.class_seats():
+        occupancy = Occupancy(seat_map, travel_class, tickets[travel_class])
+        for seat in seat_map.class_range(travel_class):
+            if occupancy.is_taken(seat, legs):
+                set_bit(taken, seat)
+    return taken
+
+
+def lock_inventory(run, travel_class):
+    """
+    The Inventory row of `travel_class` on `run`, created on first use and
+    locked until the end of the caller's transaction.
+    """
+    Inventory.objects.get_or_create(run=run, travel_class=travel_class)
+    return Inventory.objects.select_for_update().get(run=run, travel_class=travel_class)
+
+
+def book(user, run, travel_class, boarding, alighting, passengers):
+    """
+    Book one ticket per passenger ({'name', 'age'}) on `run` between two of
+    its train's stops (TrainStation). Returns the created tickets.
+    """
+    seat_map = get_seat_map(run.train_id)
+    if travel_class not in seat_map.class_seats():
+        raise InvalidInput(BookingMessage.CLASS_NOT_AVAILABLE.format(travel_class=travel_class))
+    from_stop, to_stop = boarding.stop_number, alighting.stop_number
+    legs = (1 << to_stop) - (1 << from_stop)
+    fare = Decimal(settings.BOOKINGS['FARE_PER_LEG'][travel_class]) * (to_stop - from_stop)
+    with transaction.atomic():
+        inventory = lock_inventory(run, travel_class)
+        # A run cancellation job locks every inventory row after cancelling the run.
+        if TrainRun.objects.filter(pk=run.pk, status=TrainRun.CANCELLED).exists():
+            raise InvalidInput(BookingMessage.RUN_CANCELLED)
+        occupancy = _occupancy(inventory, seat_map)
+        rac_queue = get_queue(inventory, Ticket.RAC)
+        waitlist = get_queue(inventory, Ticket.WAITLISTED)
+        tickets = []
+        for passenger in passengers:
+            ticket = Ticket(user=user, run=run, travel_class=travel_class,
+                            passenger_name=passenger['name'], passenger_age=passenger['age'],
+                            from_station_id=boarding.station_id, to_station_id=alighting.station_id,
+                            from_stop=from_stop, to_stop=to_stop, fare=fare)
+            ticket.seat = occupancy.hold_seat(legs)
+            if ticket.seat is not None:
+                ticket.status = Ticket.CONFIRMED
+            else:
+                ticket.seat = occupancy.hold_rac(legs)
+                if ticket.seat is not None:
+                    ticket.status = Ticket.RAC
+                    inventory.rac_count += 1
+                else:
+                    if inventory.waitlist_count >= settings.BOOKINGS['WAITLIST_LIMIT']:
+                        raise InvalidInput(BookingMessage.WAITLIST_FULL)
+                    ticket.status = Ticket.WAITLISTED
+                    inventory.waitlist_count += 1
+                    ticket.queue_position = inventory.waitlist_count
+                ticket.priority = inventory.next_priority
+                inventory.next_priority += 1
+            tickets.append(ticket)
+        tickets = Ticket.objects.bulk_create(tickets)
+        pnr = encode(tickets[0].pk)
+        Ticket.objects.filter(pk__in=[ticket.pk for ticket in tickets]).update(pnr=pnr)
+        for ticket in tickets:
+            ticket.pnr = pnr
+        queued = [ticket for ticket in tickets if ticket.priority is not None]
+        for ticket in queued:
+            queue = rac_queue if ticket.status == Ticket.RAC else waitlist
+            queue.push(QueueEntry(ticket.priority, ticket.pk, legs, ticket.seat if queue is rac_queue else None))
+        if any(ticket.status == Ticket.RAC for ticket in tickets):
+            renumber(inventory, Ticket.RAC)
+            for ticket in tickets:
+                if ticket.status == Ticket.RAC:
+                    ticket.refresh_from_db(fields=['queue_position'])
+        if queued:
+            bump_version(inventory, rac_queue, waitlist)
+    logger.info(f"Booked {len(tickets)} tickets on run {run.pk} {travel_class}: "
+                f"{', '.join(ticket.status for ticket in tickets)}")
+    return tickets
+
+
+def promote(inventory, seat_map, limit=None):
+    """
+    Move RAC tickets to confirmed seats, then waitlisted tickets to seats or
+    RAC berths, in priority order, as far as the freed capacity allows.
+    At most `limit` candidates are examined per queue. The caller holds the
+    Inventory lock. Returns [(ticket_id, old status, new status)].
+    """
+    limit = limit or settings.BOOKINGS['PROMOTION_SCAN_LIMIT']
+    if TrainRun.objects.filter(pk=inventory.run_id, status=TrainRun.CANCELLED).exists():
+        return []
+    occupancy = _occupancy(inventory, seat_map)
+    rac_queue = get_queue(inventory, Ticket.RAC)
+    waitlist = get_queue(inventory, Ticket.WAITLISTED)
+
+    def confirm_rac(entry):
+        seat = occupancy.hold_seat(entry.legs)
+        if seat is not None:
+            occupancy.release_rac(entry.seat, entry.legs)
+        return seat
+
+    def place_waitlisted(entry):
+        seat = occupancy.hold_seat(entry.legs)
+        if seat is not None:
+            return Ticket.CONFIRMED, seat
+        seat = occupancy.hold_rac(entry.legs)
+        return None if seat is None else (Ticket.RAC, seat)
+
+    confirmed = rac_queue.take(confirm_rac, limit) if len(rac_queue) else []
+    placed = waitlist.take(place_waitlisted, limit) if len(waitlist) else []
+    if not confirmed and not placed:
+        return []
+
+    now = timezone.now()
+    vacated = dict(Ticket.objects.filter(pk__in=[entry.ticket_id for entry, _ in placed])
+                   .values_list('pk', 'queue_position'))
+    users, pnrs = {}, []
+    for pk, user_id, pnr in (Ticket.objects.filter(pk__in=[entry.ticket_id for entry, _ in confirmed + placed])
+                             .values_list('pk', 'user_id', 'pnr')):
+        users[pk] = user_id
+        pnrs.append(pnr)
+    updates, promoted = [], []
+    for entry, seat in confirmed:
+        updates.append(Ticket(pk=entry.ticket_id, status=Ticket.CONFIRMED, seat=seat, queue_position=None,
+                              updated_at=now))
+        promoted.append((entry.ticket_id, Ticket.RAC, Ticket.CONFIRMED))
+    for entry, (status, seat) in placed:
+        updates.append(Ticket(pk=entry.ticket_id, status=status, seat=seat, queue_position=None,
+                              updated_at=now))
+        promoted.append((entry.ticket_id, Ticket.WAITLISTED, status))
+        if status == Ticket.RAC:
+            rac_queue.push(entry._replace(seat=seat))
+    Ticket.objects.bulk_update(updates, ['status', 'seat', 'queue_position', 'updated_at'])
+    invalidate(pnrs)
+
+    to_rac = sum(1 for _, (status, _) in placed if status == Ticket.RAC)
+    inventory.rac_count += to_rac - len(confirmed)
+    inventory.waitlist_count -= len(placed)
+    close_gaps(inventory, Ticket.WAITLISTED, vacated.values())
+    if confirmed or to_rac:
+        renumber(inventory, Ticket.RAC)
+    queue(Notification.PROMOTED, [(users[ticket_id], ticket_id,
+                                   BookingMessage.PROMOTED.format(ticket_id=ticket_id, status=status))
+                                  for ticket_id, _, status in promoted])
+    bump_version(inventory, rac_queue, waitlist, reordered=True)
+    logger.info(f"Promoted {len(promoted)} tickets on run {inventory.run_id} {inventory.travel_class}")
+    return promoted
+
+
+def cancel(ticket):
+    """
+    Cancel `ticket` and promote the queues into whatever it frees.
+    Returns the promotions made, as promote() does. Tickets of a cancelled
+    run are left to its cancellation job, which refunds them.
+    """
+    with transaction.atomic():
+        inventory = lock_inventory(ticket.run, ticket.travel_class)
+        # Locking the run orders this against start_job(), which locks it to cancel it.
+        run = TrainRun.objects.select_for_update().get(pk=ticket.run_id)
+        if run.status == TrainRun.CANCELLED:
+            raise InvalidInput(BookingMessage.RUN_CANCELLED_REFUND)
+        ticket = Ticket.objects.select_for_update().select_related('run').get(pk=ticket.pk)
+        if ticket.status == Ticket.CANCELLED:
+            raise InvalidInput(BookingMessage.ALREADY_CANCELLED)
+        previous, position = ticket.status, ticket.queue_position
+        ticket.status, ticket.seat, ticket.queue_position = Ticket.CANCELLED, None, None
+        ticket.save(update_fields=['status', 'seat', 'queue_position', 'updated_at'])
+        invalidate([ticket.pnr])
+
+        rac_queue = get_queue(inventory, Ticket.RAC)
+        waitlist = get_queue(inventory, Ticket.WAITLISTED)
+        if previous == Ticket.RAC:
+            inventory.rac_count -= 1
+            rac_queue.remove(ticket.pk)
+            renumber(inventory, Ticket.RAC)
+        elif previous == Ticket.WAITLISTED:
+            inventory.waitlist_count -= 1
+            waitlist.remove(ticket.pk)
+            close_gaps(inventory, Ticket.WAITLISTED, [position])
+        promoted = []
+        if previous in (Ticket.CONFIRMED, Ticket.RAC):
+            promoted = promote(inventory, get_seat_map(ticket.run.train_id))
+        if not promoted and previous != Ticket.CONFIRMED:
+            bump_version(inventory, rac_queue, waitlist, reordered=True)
+    logger.info(f"Cancelled ticket {ticket.pk} ({previous}); {len(promoted)} promoted")
+    return ticket, promoted
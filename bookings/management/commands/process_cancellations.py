@@ -0,0 +1,42 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from bookings.cancellation import pending_jobs, process_job
+
+
+class Command(BaseCommand):
+    """
+    Process whole-run cancellation jobs: cancel, refund and notify their
+    tickets in chunks. Interrupted jobs resume from their checkpoint, and
+    failed ones too with --once or --job. Runs until interrupted unless --once is given.
+
+    Usage:
+        python manage.py process_cancellations
+        python manage.py process_cancellations --once --chunk-size 1000
+        python manage.py process_cancellations --job 42
+    """
+    help = 'Cancel, refund and notify the tickets of cancelled train runs in chunks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Process the jobs waiting now and exit.')
+        parser.add_argument('--job', type=int, help='Process (or resume) only this job.')
+        parser.add_argument('--chunk-size', type=int, default=settings.CANCELLATION['CHUNK_SIZE'])
+        parser.add_argument('--poll-seconds', type=float, default=settings.CANCELLATION['POLL_SECONDS'])
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                # Failed jobs are retried on explicit runs only, not on every poll.
+                jobs = pending_jobs(include_failed=options['once'] or bool(options['job']))
+                if options['job']:
+                    jobs = jobs.filter(pk=options['job'])
+                for job in jobs:
+                    job = process_job(job, options['chunk_size'])
+                    self.stdout.write(f"Job {job.pk} {job.status}: {job.processed}/{job.total_tickets} tickets, "
+                                      f"{job.refunded_amount} refunded.")
+                if options['once'] or options['job']:
+                    break
+                time.sleep(options['poll_seconds'])
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-19 20:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('trains', '0009_coach_composition'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Inventory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('travel_class', models.CharField(choices=[('SL', 'Sleeper'), ('3A', 'AC 3 Tier'), ('2A', 'AC 2 Tier'), ('1A', 'AC First Class'), ('CC', 'AC Chair Car'), ('2S', 'Second Sitting')], max_length=2)),
+                ('next_priority', models.PositiveIntegerField(default=1)),
+                ('rac_count', models.PositiveIntegerField(default=0)),
+                ('waitlist_count', models.PositiveIntegerField(default=0)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventories', to='trains.trainrun')),
+            ],
+            options={
+                'verbose_name': 'Inventory',
+                'verbose_name_plural': 'Inventories',
+                'db_table': 'booking_inventory',
+                'constraints': [models.UniqueConstraint(fields=('run', 'travel_class'), name='unique_run_class_inventory')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Ticket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('travel_class', models.CharField(choices=[('SL', 'Sleeper'), ('3A', 'AC 3 Tier'), ('2A', 'AC 2 Tier'), ('1A', 'AC First Class'), ('CC', 'AC Chair Car'), ('2S', 'Second Sitting')], max_length=2)),
+                ('passenger_name', models.CharField(max_length=50)),
+                ('passenger_age', models.PositiveSmallIntegerField()),
+                ('from_stop', models.PositiveIntegerField()),
+                ('to_stop', models.PositiveIntegerField()),
+                ('status', models.CharField(choices=[('CNF', 'Confirmed'), ('RAC', 'Reservation Against Cancellation'), ('WL', 'Waitlisted'), ('CAN', 'Cancelled')], max_length=3)),
+                ('seat', models.PositiveIntegerField(blank=True, null=True)),
+                ('priority', models.PositiveIntegerField(blank=True, null=True)),
+                ('queue_position', models.PositiveIntegerField(blank=True, null=True)),
+                ('booked_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('from_station', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='trains.station')),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tickets', to='trains.trainrun')),
+                ('to_station', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='trains.station')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tickets', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Ticket',
+                'verbose_name_plural': 'Tickets',
+                'db_table': 'ticket',
+                'ordering': ['-booked_at'],
+                'indexes': [models.Index(fields=['run', 'travel_class', 'status', 'queue_position'], name='ticket_queue_idx'), models.Index(fields=['user', '-booked_at'], name='ticket_user_idx')],
+            },
+        ),
+    ]
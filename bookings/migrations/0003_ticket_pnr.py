@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:45
+
+from django.db import migrations, models
+
+
+def assign_pnrs(apps, schema_editor):
+    # Tickets booked before PNRs existed each get their own code.
+    from bookings.pnr import encode
+    Ticket = apps.get_model('bookings', 'Ticket')
+    tickets = list(Ticket.objects.filter(pnr='').only('pk'))
+    for ticket in tickets:
+        ticket.pnr = encode(ticket.pk)
+    Ticket.objects.bulk_update(tickets, ['pnr'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0002_run_cancellation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventory',
+            name='positions_version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='pnr',
+            field=models.CharField(blank=True, db_index=True, max_length=10),
+        ),
+        migrations.RunPython(assign_pnrs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,209 @@
+from django.conf import settings
+from django.db import models
+from trains.models import CoachLayout, Station, TrainRun
+
+
+class Inventory(models.Model):
+    """
+    Booking state of one class on one train run. Bookings and cancellations
+    lock this row, so it serialises every change to the class's seats and
+    its RAC and waitlist queues.
+
+    Fields:
+        run (TrainRun): The dated run.
+        travel_class (str): Class of travel (CoachLayout.CLASS_CHOICES).
+        next_priority (int): Priority handed to the next RAC/waitlisted ticket.
+        rac_count (int): Tickets currently in the RAC queue.
+        waitlist_count (int): Tickets currently on the waitlist.
+        version (int): Bumped on every queue change; in-memory queue mirrors
+            built at another version are stale (see bookings.waitlist).
+        positions_version (int): Bumped when queued tickets change position
+            (not when tickets join the tail); cached PNR statuses built at
+            another value are stale (see bookings.pnr).
+    """
+    run = models.ForeignKey(TrainRun, on_delete=models.CASCADE, related_name='inventories')
+    travel_class = models.CharField(max_length=2, choices=CoachLayout.CLASS_CHOICES)
+    next_priority = models.PositiveIntegerField(default=1)
+    rac_count = models.PositiveIntegerField(default=0)
+    waitlist_count = models.PositiveIntegerField(default=0)
+    version = models.PositiveBigIntegerField(default=0)
+    positions_version = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'booking_inventory'
+        verbose_name = 'Inventory'
+        verbose_name_plural = 'Inventories'
+        constraints = [
+            models.UniqueConstraint(fields=['run', 'travel_class'], name='unique_run_class_inventory'),
+        ]
+
+    def __str__(self):
+        return f"{self.run_id} - {self.travel_class}"
+
+
+class Ticket(models.Model):
+    """
+    One passenger's journey between two stops of a train run.
+
+    Fields:
+        status (str): CNF (seat held), RAC (half of a side-lower berth held),
+            WL (waitlisted) or CAN (cancelled).
+        seat (int): Seat index in the train's seat map (trains.seatmap), for
+            CNF and RAC tickets.
+        from_stop / to_stop (int): Stop numbers of the boarding and alighting
+            stations; the ticket occupies the legs from_stop..to_stop-1.
+        priority (int): Order of entry into the RAC/waitlist queues; fixed
+            once assigned, so a waitlisted ticket keeps its place when it
+            moves up to RAC.
+        queue_position (int): Live 1-based position in the RAC queue or on
+            the waitlist, kept up to date on every promotion.
+        fare (Decimal): Amount paid, refunded in full if the run is cancelled.
+        pnr (str): Code shared by the tickets booked together (bookings.pnr).
+    """
+    CONFIRMED, RAC, WAITLISTED, CANCELLED = 'CNF', 'RAC', 'WL', 'CAN'
+    STATUS_CHOICES = [
+        (CONFIRMED, 'Confirmed'),
+        (RAC, 'Reservation Against Cancellation'),
+        (WAITLISTED, 'Waitlisted'),
+        (CANCELLED, 'Cancelled'),
+    ]
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='tickets')
+    run = models.ForeignKey(TrainRun, on_delete=models.CASCADE, related_name='tickets')
+    travel_class = models.CharField(max_length=2, choices=CoachLayout.CLASS_CHOICES)
+    passenger_name = models.CharField(max_length=50)
+    passenger_age = models.PositiveSmallIntegerField()
+    from_station = models.ForeignKey(Station, on_delete=models.PROTECT, related_name='+')
+    to_station = models.ForeignKey(Station, on_delete=models.PROTECT, related_name='+')
+    from_stop = models.PositiveIntegerField()
+    to_stop = models.PositiveIntegerField()
+    status = models.CharField(max_length=3, choices=STATUS_CHOICES)
+    seat = models.PositiveIntegerField(null=True, blank=True)
+    priority = models.PositiveIntegerField(null=True, blank=True)
+    queue_position = models.PositiveIntegerField(null=True, blank=True)
+    fare = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    pnr = models.CharField(max_length=10, db_index=True, blank=True)
+    booked_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-booked_at']
+        db_table = 'ticket'
+        verbose_name = 'Ticket'
+        verbose_name_plural = 'Tickets'
+        indexes = [
+            # Queue renumbering and "who holds seats on this run" both filter on these.
+            models.Index(fields=['run', 'travel_class', 'status', 'queue_position'],
+                         name='ticket_queue_idx'),
+            models.Index(fields=['user', '-booked_at'], name='ticket_user_idx'),
+        ]
+
+    @property
+    def legs(self):
+        """
+        Bitmask of the legs travelled: bit n is the leg from stop n to n+1.
+        """
+        return (1 << self.to_stop) - (1 << self.from_stop)
+
+    def __str__(self):
+        return f"{self.pk} - {self.passenger_name} ({self.status})"
+
+
+class CancellationJob(models.Model):
+    """
+    Cancellation of a whole train run, processed in chunks by
+    `python manage.py process_cancellations` (see bookings.cancellation).
+
+    Fields:
+        status (str): pending, running, completed or failed.
+        total_tickets (int): Tickets still active when the job started.
+        processed (int): Tickets cancelled so far.
+        refunded_amount (Decimal): Sum of the refunds created so far.
+        checkpoint (int): Highest ticket id processed; a resumed job
+            continues after it.
+        error (str): Last failure, if any.
+    """
+    PENDING, RUNNING, COMPLETED, FAILED = 'pending', 'running', 'completed', 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (COMPLETED, 'Completed'),
+        (FAILED, 'Failed'),
+    ]
+    run = models.OneToOneField(TrainRun, on_delete=models.CASCADE, related_name='cancellation_job')
+    reason = models.CharField(max_length=200)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    total_tickets = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    refunded_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    checkpoint = models.PositiveBigIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True,
+                                   related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        db_table = 'cancellation_job'
+        verbose_name = 'Cancellation Job'
+        verbose_name_plural = 'Cancellation Jobs'
+
+    def __str__(self):
+        return f"{self.run_id} ({self.status})"
+
+
+class Refund(models.Model):
+    """
+    Money owed back for a cancelled ticket, paid out by the payments side.
+    """
+    PENDING, PAID = 'pending', 'paid'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (PAID, 'Paid'),
+    ]
+    ticket = models.OneToOneField(Ticket, on_delete=models.CASCADE, related_name='refund')
+    job = models.ForeignKey(CancellationJob, on_delete=models.SET_NULL, null=True, blank=True,
+                            related_name='refunds')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'refund'
+        verbose_name = 'Refund'
+        verbose_name_plural = 'Refunds'
+
+    def __str__(self):
+        return f"{self.ticket_id} - {self.amount}"
+
+
+class Notification(models.Model):
+    """
+    A message queued for a passenger (SMS/e-mail delivery reads the
+    pending rows and sets sent_at).
+    """
+    RUN_CANCELLED, PROMOTED = 'run_cancelled', 'promoted'
+    KIND_CHOICES = [
+        (RUN_CANCELLED, 'Run cancelled'),
+        (PROMOTED, 'Ticket promoted'),
+    ]
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='notifications')
+    ticket = models.ForeignKey(Ticket, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    message = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'notification'
+        verbose_name = 'Notification'
+        verbose_name_plural = 'Notifications'
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(sent_at__isnull=True),
+                         name='notification_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.kind}"
@@ -0,0 +1,15 @@
+"""
+Passenger notifications, queued as Notification rows in the transaction
+that caused them. Delivery (SMS / e-mail) reads the pending rows, using
+notification_pending_idx, and sets sent_at.
+"""
+from .models import Notification
+
+
+def queue(kind, rows):
+    """
+    Queue one notification per (user_id, ticket_id, message) row.
+    """
+    return Notification.objects.bulk_create([Notification(user_id=user_id, ticket_id=ticket_id, kind=kind,
+                                                          message=message[:255])
+                                             for user_id, ticket_id, message in rows])
@@ -0,0 +1,190 @@
+"""
+PNR codes and the cached PNR status lookup.
+
+A PNR is 10 digits: 9 that encode the booking's first ticket id, then a
+Damm check digit. The encoding is a keyed Feistel permutation of
+[0, 10**9), so every id has exactly one code and no uniqueness check or
+retry loop is needed (unlike Train.generate_train_number). Consecutive
+bookings also get unrelated-looking codes. The Damm digit catches every
+single-digit typo and every swap of adjacent digits, so such a lookup is
+rejected before it reaches the cache or the database.
+
+Status lookups read through the cache. Each PNR has a generation token in
+the cache, and any change to one of its tickets moves it to a fresh token
+once the change commits. Entries record the generation that was current
+before their tickets were read and only count while it still is, so a
+lookup that read the tickets just before a cancellation committed cannot
+cache the old status after the cancellation invalidated it. RAC and
+waitlisted tickets also show their live queue position, which moves
+whenever someone ahead of them is promoted or cancels. Their entries
+therefore also record the Inventory.positions_version they were built at,
+and every change of queue positions sets that inventory's version in the
+cache. A lookup is then one or two cache round trips, and a queue shuffle
+costs one cache write instead of invalidating every PNR behind it.
+
+Tickets also change outside the web workers (`process_cancellations`), so
+these entries are only correct on a cache shared by every process; see
+settings.CACHES.
+"""
+import hashlib
+import hmac
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from accounts import metrics
+
+DIGITS = 9
+SPACE = 10 ** DIGITS
+HALF_BITS = 15  # 2**30 covers SPACE; cycle walking maps back into it
+HALF_MASK = (1 << HALF_BITS) - 1
+ROUNDS = 4
+
+PNR_KEY = 'pnr:{pnr}'
+GENERATION_KEY = 'pnr_generation:{pnr}'
+QUEUE_VERSION_KEY = 'pnr_queue:{inventory_id}'
+
+DAMM_TABLE = (
+    (0, 3, 1, 7, 5, 9, 8, 6, 4, 2),
+    (7, 0, 9, 2, 1, 5, 4, 8, 6, 3),
+    (4, 2, 0, 6, 8, 7, 1, 3, 5, 9),
+    (1, 7, 5, 0, 9, 8, 3, 4, 2, 6),
+    (6, 1, 2, 3, 0, 4, 5, 9, 7, 8),
+    (3, 6, 7, 4, 2, 0, 9, 5, 8, 1),
+    (5, 8, 6, 9, 7, 2, 0, 1, 3, 4),
+    (8, 9, 4, 5, 3, 6, 2, 0, 1, 7),
+    (9, 4, 3, 8, 6, 1, 7, 2, 0, 5),
+    (2, 5, 8, 1, 4, 3, 6, 7, 9, 0),
+)
+
+
+def damm(digits):
+    interim = 0
+    for digit in digits:
+        interim = DAMM_TABLE[interim][int(digit)]
+    return interim
+
+
+def _round(key, index, half):
+    digest = hmac.new(key, bytes((index,)) + half.to_bytes(2, 'big'), hashlib.sha256).digest()
+    return int.from_bytes(digest[:2], 'big') & HALF_MASK
+
+
+def _permute(value, key, rounds):
+    left, right = value >> HALF_BITS, value & HALF_MASK
+    for index in rounds:
+        left, right = right, left ^ _round(key, index, right)
+    return (left << HALF_BITS) | right
+
+
+def _unpermute(value, key, rounds):
+    left, right = value >> HALF_BITS, value & HALF_MASK
+    for index in reversed(rounds):
+        left, right = right ^ _round(key, index, left), left
+    return (left << HALF_BITS) | right
+
+
+def _key():
+    return hashlib.sha256(settings.PNR['KEY'].encode()).digest()
+
+
+def encode(sequence):
+    """
+    PNR for a sequence number in [0, 10**9).
+    """
+    if not 0 <= sequence < SPACE:
+        raise ValueError(f"PNR sequence {sequence} out of range")
+    key, value = _key(), sequence
+    while True:
+        value = _permute(value, key, range(ROUNDS))
+        if value < SPACE:
+            break
+    body = f"{value:0{DIGITS}d}"
+    return body + str(damm(body))
+
+
+def decode(pnr):
+    """
+    Sequence number of a PNR, or None if it is malformed or fails the check digit.
+    """
+    if len(pnr) != DIGITS + 1 or not pnr.isdigit() or damm(pnr) != 0:
+        return None
+    key, value = _key(), int(pnr[:DIGITS])
+    while True:
+        value = _unpermute(value, key, range(ROUNDS))
+        if value < SPACE:
+            return value
+
+
+def generation(pnr):
+    """
+    Current generation token of a PNR. Read it before reading the tickets
+    and pass it to prime().
+    """
+    key = GENERATION_KEY.format(pnr=pnr)
+    token = cache.get(key)
+    if token is None:
+        cache.add(key, time.time_ns(), timeout=settings.PNR['CACHE_SECONDS'])
+        token = cache.get(key)
+    return token
+
+
+def prime(pnr, status, inventory_id, version, generation):
+    """
+    Cache a PNR's status payload once the current transaction commits.
+    `version` is the Inventory.positions_version it reflects, or None when
+    none of its tickets are queued. `generation` is the token returned by
+    generation() before the tickets were read; the entry is ignored once an
+    invalidation has moved past it.
+    """
+    entry = {'data': status, 'inventory': inventory_id, 'version': version, 'generation': generation}
+    timeout = settings.PNR['CACHE_SECONDS']
+
+    def store():
+        cache.set(PNR_KEY.format(pnr=pnr), entry, timeout=timeout)
+        if version is not None:
+            # Seed the queue version if no queue change has recorded one yet.
+            cache.add(QUEUE_VERSION_KEY.format(inventory_id=inventory_id), version, timeout=timeout)
+    transaction.on_commit(store)
+
+
+def invalidate(pnrs):
+    """
+    Move PNRs to a fresh generation once the current transaction commits,
+    which retires their cached entries, including any a concurrent lookup
+    is about to store.
+    """
+    keys = [GENERATION_KEY.format(pnr=pnr) for pnr in set(pnrs) if pnr]
+    if keys:
+        transaction.on_commit(lambda: cache.set_many(dict.fromkeys(keys, time.time_ns()),
+                                                     timeout=settings.PNR['CACHE_SECONDS']))
+
+
+def queue_changed(inventory):
+    """
+    Record new queue positions for `inventory` once the transaction commits.
+    """
+    key, version = QUEUE_VERSION_KEY.format(inventory_id=inventory.pk), inventory.positions_version
+    transaction.on_commit(lambda: cache.set(key, version, timeout=settings.PNR['CACHE_SECONDS']))
+
+
+def cached(pnr):
+    """
+    The cached status payload of a PNR, or None if missing or stale.
+    """
+    data = _cached(pnr)
+    metrics.record_cache('pnr', data is not None)
+    return data
+
+
+def _cached(pnr):
+    entry_key, generation_key = PNR_KEY.format(pnr=pnr), GENERATION_KEY.format(pnr=pnr)
+    found = cache.get_many([entry_key, generation_key])
+    entry = found.get(entry_key)
+    if entry is None or entry.get('generation') != found.get(generation_key):
+        return None
+    if entry['version'] is not None:
+        current = cache.get(QUEUE_VERSION_KEY.format(inventory_id=entry['inventory']))
+        if current != entry['version']:
+            return None
+    return entry['data']
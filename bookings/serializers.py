@@ -0,0 +1,158 @@
+from django.conf import settings
+from rest_framework import serializers
+from trains.exceptions import InvalidInput, NotFound
+from trains.models import CoachLayout, TrainRun, TrainStation
+from trains.seatmap import get_seat_map
+from utils.constants import BookingMessage
+from .models import CancellationJob, Ticket
+
+
+class PassengerSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=50)
+    age = serializers.IntegerField(min_value=0, max_value=125)
+
+
+class JourneySerializer(serializers.Serializer):
+    """
+    A journey between two stations of a dated run. validate() resolves the
+    run and the two stops.
+    """
+    train_number = serializers.CharField(max_length=10)
+    run_date = serializers.DateField()
+    from_station = serializers.CharField(max_length=10)
+    to_station = serializers.CharField(max_length=10)
+
+    def validate(self, data):
+        try:
+            run = TrainRun.objects.select_related('train').get(
+                train__number=data['train_number'], run_date=data['run_date'])
+        except TrainRun.DoesNotExist:
+            raise NotFound(BookingMessage.RUN_NOT_FOUND.format(train_number=data['train_number'],
+                                                               run_date=data['run_date']))
+        if run.status == TrainRun.CANCELLED:
+            raise InvalidInput(BookingMessage.RUN_CANCELLED)
+        stops = {stop.station.code: stop for stop in TrainStation.objects.active()
+                 .filter(train_id=run.train_id,
+                         station__code__in=[data['from_station'].upper(), data['to_station'].upper()])
+                 .select_related('station')}
+        boarding = stops.get(data['from_station'].upper())
+        alighting = stops.get(data['to_station'].upper())
+        if boarding is None or alighting is None or boarding.stop_number >= alighting.stop_number:
+            raise InvalidInput(BookingMessage.SEGMENT_INVALID)
+        data.update(run=run, boarding=boarding, alighting=alighting)
+        return data
+
+
+class BookingSerializer(JourneySerializer):
+    """
+    A booking request: one ticket per passenger on a journey.
+    """
+    travel_class = serializers.ChoiceField(choices=CoachLayout.CLASS_CHOICES)
+    passengers = PassengerSerializer(many=True)
+
+    def validate_passengers(self, value):
+        if not value or len(value) > settings.BOOKINGS['MAX_PASSENGERS']:
+            raise InvalidInput(BookingMessage.PASSENGERS_INVALID.format(
+                max_passengers=settings.BOOKINGS['MAX_PASSENGERS']))
+        return value
+
+
+class TicketSerializer(serializers.ModelSerializer):
+    """
+    A ticket and its live status: coach, seat and berth when confirmed,
+    position in the RAC queue or on the waitlist otherwise.
+    """
+    train_number = serializers.CharField(source='run.train.number', read_only=True)
+    run_date = serializers.DateField(source='run.run_date', read_only=True)
+    from_station = serializers.CharField(source='from_station.code', read_only=True)
+    to_station = serializers.CharField(source='to_station.code', read_only=True)
+    berth = serializers.SerializerMethodField()
+    current_status = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Ticket
+        fields = ['id', 'pnr', 'passenger_name', 'passenger_age', 'train_number', 'run_date', 'from_station',
+                  'to_station', 'travel_class', 'status', 'queue_position', 'berth', 'current_status',
+                  'booked_at']
+
+    def get_berth(self, obj):
+        if obj.seat is None:
+            return None
+        coach, number, berth = get_seat_map(obj.run.train_id).seat(obj.seat)
+        return {'coach': coach, 'seat': number, 'type': CoachLayout.BERTH_TYPES[berth]}
+
+    def get_current_status(self, obj):
+        """
+        Status as printed on a ticket: 'CNF/S1/23', 'RAC 4' or 'WL 12'.
+        """
+        if obj.status == Ticket.CONFIRMED:
+            berth = self.get_berth(obj)
+            return f"CNF/{berth['coach']}/{berth['seat']}"
+        if obj.status in (Ticket.RAC, Ticket.WAITLISTED):
+            return f"{obj.status} {obj.queue_position}"
+        return obj.status
+
+
+class PnrStatusSerializer(serializers.BaseSerializer):
+    """
+    Public status of the tickets booked under one PNR. Passengers are
+    listed by number only; names and ages are not shown.
+    """
+
+    def to_representation(self, tickets):
+        ticket = tickets[0]
+        statuses = TicketSerializer()
+        return {
+            'pnr': ticket.pnr,
+            'train_number': ticket.run.train.number,
+            'train_name': ticket.run.train.name,
+            'run_date': ticket.run.run_date.isoformat(),
+            'run_status': ticket.run.status,
+            'from_station': ticket.from_station.code,
+            'to_station': ticket.to_station.code,
+            'travel_class': ticket.travel_class,
+            'passengers': [{'passenger': number, 'status': passenger.status,
+                            'current_status': statuses.get_current_status(passenger),
+                            'berth': statuses.get_berth(passenger)}
+                           for number, passenger in enumerate(tickets, start=1)],
+        }
+
+
+class CancellationRequestSerializer(serializers.Serializer):
+    """
+    Cancel a whole run: the train number, the date and the reason passengers are told.
+    """
+    train_number = serializers.CharField(max_length=10)
+    run_date = serializers.DateField()
+    reason = serializers.CharField(max_length=200)
+
+    def validate(self, data):
+        try:
+            data['run'] = TrainRun.objects.get(train__number=data['train_number'], run_date=data['run_date'])
+        except TrainRun.DoesNotExist:
+            raise NotFound(BookingMessage.RUN_NOT_FOUND.format(train_number=data['train_number'],
+                                                               run_date=data['run_date']))
+        return data
+
+
+class CancellationJobSerializer(serializers.ModelSerializer):
+    """
+    Progress of a run cancellation job.
+    """
+    train_number = serializers.CharField(source='run.train.number', read_only=True)
+    run_date = serializers.DateField(source='run.run_date', read_only=True)
+    progress = serializers.SerializerMethodField()
+
+    class Meta:
+        model = CancellationJob
+        fields = ['id', 'train_number', 'run_date', 'reason', 'status', 'total_tickets', 'processed',
+                  'progress', 'refunded_amount', 'checkpoint', 'error', 'created_at', 'started_at',
+                  'finished_at']
+
+    def get_progress(self, obj):
+        """
+        Percentage of the job's tickets processed.
+        """
+        if obj.status == CancellationJob.COMPLETED or not obj.total_tickets:
+            return 100.0 if obj.status == CancellationJob.COMPLETED else 0.0
+        return round(min(obj.processed, obj.total_tickets) * 100 / obj.total_tickets, 1)
@@ -0,0 +1,32 @@
+from django.dispatch import receiver
+from django.utils import timezone
+from trains.exceptions import InvalidInput
+from trains.models import TrainRun
+from trains.signals import renumbering, runs_dropped
+from utils.constants import BookingMessage, CancellationMessage
+from .cancellation import ACTIVE_STATUSES, start_job
+from .models import Ticket
+
+
+@receiver(runs_dropped)
+def cancel_dropped_runs(sender, run_ids, **kwargs):
+    """
+    A run dropped from its calendar may already be booked: queue a
+    cancellation job for it so its tickets are cancelled, refunded and
+    notified like any cancelled run.
+    """
+    booked = (Ticket.objects.filter(run_id__in=run_ids, status__in=ACTIVE_STATUSES)
+              .values_list('run_id', flat=True).distinct())
+    for run in TrainRun.objects.filter(pk__in=set(booked), cancellation_job__isnull=True):
+        start_job(run, CancellationMessage.CALENDAR_REASON)
+
+
+@receiver(renumbering)
+def refuse_renumbering_booked_trains(sender, train_ids, **kwargs):
+    """
+    Tickets hold seat indexes and stop numbers, so a train's seats and stops
+    cannot be renumbered while it has live tickets on a run from today on.
+    """
+    if Ticket.objects.filter(run__train_id__in=train_ids, run__run_date__gte=timezone.localdate(),
+                             status__in=ACTIVE_STATUSES).exists():
+        raise InvalidInput(BookingMessage.TRAIN_HAS_BOOKINGS)
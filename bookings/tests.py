@@ -0,0 +1,170 @@
+from datetime import date, time, timedelta
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from accounts.models import Role, User
+from trains.exceptions import InvalidInput
+from trains.models import CoachLayout, Station, Train, TrainRun, TrainStation
+from trains.seatmap import set_composition
+from .inventory import book, cancel
+from .models import Inventory, Ticket
+from .pnr import decode, encode, generation, invalidate, prime
+from .views import pnr_status
+
+
+class QueueTests(TestCase):
+    """
+    Booking into CNF, RAC and the waitlist, then cancelling and promoting,
+    on one sleeper coach with a single confirmable berth and one RAC berth.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        stations = [Station.objects.create(code=code, name=f"Station {code}") for code in ('QA', 'QB', 'QC')]
+        cls.train = Train.objects.create(name='Queue Express', from_station=stations[0], to_station=stations[-1])
+        cls.stops = [TrainStation.objects.create(train=cls.train, station=station, stop_number=number,
+                                                 arrival_time=time(number, 0), departure_time=time(number, 5))
+                     for number, station in enumerate(stations, start=1)]
+        layout = CoachLayout.objects.create(code='QT', name='Queue test', travel_class=CoachLayout.SLEEPER,
+                                            berths='LS')
+        set_composition(cls.train, [{'label': 'S1', 'layout': layout}])
+        cls.train_run = TrainRun.objects.create(train=cls.train, run_date=date.today() + timedelta(days=1),
+                                          from_station=stations[0])
+        role, _ = Role.objects.get_or_create(name=Role.PASSENGER)
+        cls.user = User.objects.create_user(username='queuer', email='queuer@example.com',
+                                            mobile_number='9876543210', first_name='Queue',
+                                            password='secret123', role=role)
+
+    def book(self, *names):
+        return book(self.user, self.train_run, CoachLayout.SLEEPER, self.stops[0], self.stops[-1],
+                    [{'name': name, 'age': 30} for name in names])
+
+    def state(self, *tickets):
+        return [(ticket.status, ticket.queue_position)
+                for ticket in Ticket.objects.filter(pk__in=[ticket.pk for ticket in tickets]).order_by('pk')]
+
+    def test_booking_fills_seat_then_rac_then_waitlist(self):
+        tickets = self.book('A', 'B', 'C', 'D', 'E')
+        self.assertEqual(self.state(*tickets), [(Ticket.CONFIRMED, None), (Ticket.RAC, 1), (Ticket.RAC, 2),
+                                                (Ticket.WAITLISTED, 1), (Ticket.WAITLISTED, 2)])
+        self.assertEqual(len({ticket.pnr for ticket in tickets}), 1)
+        inventory = Inventory.objects.get(run=self.train_run, travel_class=CoachLayout.SLEEPER)
+        self.assertEqual((inventory.rac_count, inventory.waitlist_count), (2, 2))
+
+    def test_cancelling_confirmed_promotes_each_queue_in_order(self):
+        confirmed, rac_first, rac_second, waitlisted_first, waitlisted_second = self.book('A', 'B', 'C', 'D', 'E')
+        _, promoted = cancel(confirmed)
+        self.assertEqual(promoted, [(rac_first.pk, Ticket.RAC, Ticket.CONFIRMED),
+                                    (waitlisted_first.pk, Ticket.WAITLISTED, Ticket.RAC)])
+        self.assertEqual(self.state(rac_first, rac_second, waitlisted_first, waitlisted_second),
+                         [(Ticket.CONFIRMED, None), (Ticket.RAC, 1), (Ticket.RAC, 2), (Ticket.WAITLISTED, 1)])
+        inventory = Inventory.objects.get(run=self.train_run, travel_class=CoachLayout.SLEEPER)
+        self.assertEqual((inventory.rac_count, inventory.waitlist_count), (2, 1))
+
+    def test_cancelling_waitlisted_closes_the_gap(self):
+        tickets = self.book('A', 'B', 'C', 'D', 'E', 'F')
+        _, promoted = cancel(tickets[3])
+        self.assertEqual(promoted, [])
+        self.assertEqual(self.state(*tickets[4:]), [(Ticket.WAITLISTED, 1), (Ticket.WAITLISTED, 2)])
+
+    def test_cancelling_rac_moves_waitlist_up(self):
+        tickets = self.book('A', 'B', 'C', 'D')
+        _, promoted = cancel(tickets[1])
+        self.assertEqual(promoted, [(tickets[3].pk, Ticket.WAITLISTED, Ticket.RAC)])
+        self.assertEqual(self.state(tickets[2], tickets[3]), [(Ticket.RAC, 1), (Ticket.RAC, 2)])
+
+    def test_cancelled_ticket_cannot_be_cancelled_again(self):
+        ticket, = self.book('A')
+        cancel(ticket)
+        with self.assertRaises(InvalidInput):
+            cancel(ticket)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class PnrStatusTests(TestCase):
+    """
+    The read-through PNR status cache behind `GET /api/bookings/pnr/<pnr>/`.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        stations = [Station.objects.create(code=code, name=f"Station {code}") for code in ('PA', 'PB')]
+        cls.train = Train.objects.create(name='Status Express', from_station=stations[0], to_station=stations[-1])
+        cls.stops = [TrainStation.objects.create(train=cls.train, station=station, stop_number=number,
+                                                 arrival_time=time(number, 0), departure_time=time(number, 5))
+                     for number, station in enumerate(stations, start=1)]
+        layout = CoachLayout.objects.create(code='PT', name='Status test', travel_class=CoachLayout.SLEEPER,
+                                            berths='LS')
+        set_composition(cls.train, [{'label': 'S1', 'layout': layout}])
+        cls.train_run = TrainRun.objects.create(train=cls.train, run_date=date.today() + timedelta(days=1),
+                                                from_station=stations[0])
+        role, _ = Role.objects.get_or_create(name=Role.PASSENGER)
+        cls.user = User.objects.create_user(username='status', email='status@example.com',
+                                            mobile_number='9876543211', first_name='Status',
+                                            password='secret123', role=role)
+
+    def setUp(self):
+        cache.clear()
+        self.ticket, = book(self.user, self.train_run, CoachLayout.SLEEPER, self.stops[0], self.stops[-1],
+                            [{'name': 'A', 'age': 30}])
+
+    def status(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return pnr_status(self.ticket.pnr)['passengers'][0]['status']
+
+    def test_cached_lookup_runs_no_queries(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(f'/api/bookings/pnr/{self.ticket.pnr}/')
+        with self.assertNumQueries(0):
+            response = self.client.get(f'/api/bookings/pnr/{self.ticket.pnr}/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_lookup_racing_an_invalidation_is_not_cached(self):
+        token = generation(self.ticket.pnr)
+        stale = pnr_status(self.ticket.pnr, refresh=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            cancel(self.ticket)
+        # The lookup read the tickets before the cancellation but stores after it.
+        with self.captureOnCommitCallbacks(execute=True):
+            prime(self.ticket.pnr, stale, None, None, token)
+        self.assertEqual(self.status(), Ticket.CANCELLED)
+
+    def test_invalidate_retires_entry(self):
+        self.status()
+        Ticket.objects.filter(pk=self.ticket.pk).update(status=Ticket.CANCELLED)
+        self.assertEqual(self.status(), Ticket.CONFIRMED)
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate([self.ticket.pnr])
+        self.assertEqual(self.status(), Ticket.CANCELLED)
+
+
+class PnrTests(TestCase):
+
+    def test_round_trip(self):
+        for sequence in (0, 1, 2, 12345, 10 ** 9 - 1):
+            pnr = encode(sequence)
+            self.assertEqual(len(pnr), 10)
+            self.assertTrue(pnr.isdigit())
+            self.assertEqual(decode(pnr), sequence)
+
+    def test_codes_are_distinct(self):
+        codes = {encode(sequence) for sequence in range(2000)}
+        self.assertEqual(len(codes), 2000)
+
+    def test_check_digit_rejects_typos(self):
+        pnr = encode(4242)
+        for index in range(len(pnr)):
+            for digit in '0123456789':
+                if digit != pnr[index]:
+                    self.assertIsNone(decode(pnr[:index] + digit + pnr[index + 1:]))
+        for index in range(len(pnr) - 1):
+            if pnr[index] != pnr[index + 1]:
+                swapped = pnr[:index] + pnr[index + 1] + pnr[index] + pnr[index + 2:]
+                self.assertIsNone(decode(swapped))
+
+    def test_malformed(self):
+        for value in ('', '123', 'abcdefghij', encode(7) + '0'):
+            self.assertIsNone(decode(value))
+
+    def test_out_of_range(self):
+        with self.assertRaises(ValueError):
+            encode(10 ** 9)
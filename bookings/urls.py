@@ -0,0 +1,17 @@
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter, SimpleRouter
+from .views import TicketViewSet, CancellationJobViewSet, PnrStatusView, SeatAvailabilityView
+
+router = DefaultRouter()
+router.register(r'tickets', TicketViewSet, basename='ticket')
+
+# SimpleRouter: trains.urls already serves the API root at admin/.
+admin_router = SimpleRouter()
+admin_router.register(r'cancellation-jobs', CancellationJobViewSet)
+
+urlpatterns = [
+    path('bookings/pnr/<str:pnr>/', PnrStatusView.as_view(), name='pnr-status'),
+    path('bookings/seat-map/', SeatAvailabilityView.as_view(), name='seat-availability'),
+    path('bookings/', include(router.urls)),
+    path('admin/', include(admin_router.urls)),
+]
@@ -0,0 +1,154 @@
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from accounts.idempotency import idempotent
+from accounts.throttling import IPTokenBucketThrottle
+from trains.exceptions import InvalidInput, NotFound
+from trains.permissions import IsAdminUser
+from trains.seatmap import get_seat_map
+from utils.constants import BookingMessage, CancellationMessage
+from . import pnr as pnr_codes
+from .cancellation import start_job
+from .inventory import availability, book, cancel
+from .models import CancellationJob, Inventory, Ticket
+from .serializers import (BookingSerializer, JourneySerializer, TicketSerializer,
+                          CancellationRequestSerializer, CancellationJobSerializer, PnrStatusSerializer)
+import logging
+
+logger = logging.getLogger('request_logger')
+
+
+def pnr_status(pnr, refresh=False):
+    """
+    Status payload of a PNR, read through the cache (see bookings.pnr).
+    Returns None for an unknown PNR.
+    """
+    data = None if refresh else pnr_codes.cached(pnr)
+    if data is not None:
+        return data
+    generation = pnr_codes.generation(pnr)
+    tickets = list(Ticket.objects.filter(pnr=pnr).select_related('run__train', 'from_station', 'to_station')
+                   .order_by('pk'))
+    if not tickets:
+        return None
+    inventory_id, version = Inventory.objects.filter(
+        run_id=tickets[0].run_id, travel_class=tickets[0].travel_class
+    ).values_list('pk', 'positions_version').first()
+    queued = any(ticket.status in (Ticket.RAC, Ticket.WAITLISTED) for ticket in tickets)
+    data = PnrStatusSerializer(tickets).data
+    pnr_codes.prime(pnr, data, inventory_id, version if queued else None, generation)
+    return data
+
+
+class TicketViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    The signed-in user's tickets.
+
+    Usage:
+        - `GET /api/bookings/tickets/` : the user's tickets, newest first.
+        - `GET /api/bookings/tickets/<id>/` : live status, including the
+          RAC/waitlist position.
+        - `POST /api/bookings/tickets/book/` : book tickets
+          ({"train_number", "run_date", "from_station", "to_station",
+          "travel_class", "passengers": [{"name", "age"}]}).
+        - `POST /api/bookings/tickets/<id>/cancel/` : cancel a ticket and
+          promote RAC/waitlisted tickets into the freed seat.
+    """
+    serializer_class = TicketSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return (Ticket.objects.filter(user=self.request.user)
+                .select_related('run__train', 'from_station', 'to_station'))
+
+    @action(detail=False, methods=['post'], url_path='book')
+    @idempotent
+    def book(self, request):
+        serializer = BookingSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        tickets = book(request.user, data['run'], data['travel_class'], data['boarding'],
+                       data['alighting'], data['passengers'])
+        for ticket in tickets:
+            ticket.run, ticket.from_station, ticket.to_station = (
+                data['run'], data['boarding'].station, data['alighting'].station)
+        pnr_status(tickets[0].pnr, refresh=True)
+        return Response({'success': True, 'message': BookingMessage.BOOKED,
+                         'data': TicketSerializer(tickets, many=True).data},
+                        status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'], url_path='cancel')
+    @idempotent
+    def cancel(self, request, pk=None):
+        ticket, promoted = cancel(self.get_object())
+        ticket = self.get_queryset().get(pk=ticket.pk)
+        return Response({'success': True, 'message': BookingMessage.CANCELLED,
+                         'data': TicketSerializer(ticket).data})
+
+
+class CancellationJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Whole-run cancellations.
+
+    Usage:
+        - `POST /api/admin/cancellation-jobs/` : cancel a run
+          ({"train_number", "run_date", "reason"}); its tickets are cancelled,
+          refunded and notified in the background by
+          `python manage.py process_cancellations`.
+        - `GET /api/admin/cancellation-jobs/<id>/` : progress of a job.
+    """
+    queryset = CancellationJob.objects.select_related('run__train')
+    serializer_class = CancellationJobSerializer
+    permission_classes = [IsAdminUser, IsAuthenticated]
+
+    @idempotent
+    def create(self, request):
+        serializer = CancellationRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job = start_job(serializer.validated_data['run'], serializer.validated_data['reason'], request.user)
+        return Response({'success': True, 'message': CancellationMessage.JOB_QUEUED,
+                         'data': CancellationJobSerializer(job).data},
+                        status=status.HTTP_202_ACCEPTED)
+
+
+class PnrStatusView(APIView):
+    """
+    Public PNR status, served from the cache in the common case.
+
+    Usage:
+        - `GET /api/bookings/pnr/<pnr>/`
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    throttle_classes = [IPTokenBucketThrottle]
+    throttle_scope = 'search'
+
+    def get(self, request, pnr):
+        if pnr_codes.decode(pnr) is None:
+            raise InvalidInput(BookingMessage.PNR_INVALID)
+        data = pnr_status(pnr)
+        if data is None:
+            raise NotFound(BookingMessage.PNR_NOT_FOUND.format(pnr=pnr))
+        return Response({'success': True, 'data': data})
+
+
+class SeatAvailabilityView(APIView):
+    """
+    Seat map of a dated run with the seats taken on a journey.
+
+    Usage:
+        - `GET /api/bookings/seat-map/?train_number=&run_date=&from_station=&to_station=`
+          : the train's seat map (see trains.seatmap) with `taken`, a base64
+          bitmap of the seats already sold somewhere between the two stations.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        serializer = JourneySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        seat_map = get_seat_map(data['run'].train_id)
+        taken = availability(data['run'], seat_map, data['boarding'], data['alighting'])
+        return Response({'success': True, 'data': seat_map.to_dict(taken)})
@@ -0,0 +1,148 @@
+"""
+RAC and waitlist queues of one Inventory (a class on a train run).
+
+The queues live in the Ticket table. `priority` fixes a ticket's place and
+`queue_position` is its live 1-based position. The status endpoint reads
+that column as is, so it is kept exact on every change:
+- the waitlist only grows at its tail, and promotions out of it close the
+  gaps with one range UPDATE per promoted ticket, using ticket_queue_idx;
+- the RAC queue is bounded by the class's side-lower berths (two tickets
+  each) and is renumbered whole when it changes.
+
+Promotion candidates come from a per-process heap mirror of each queue,
+ordered by priority. A cancellation pops candidates until one fits the
+freed seat instead of scanning the waitlist table. Mirrors are tagged with
+the Inventory.version they match. Every queue change happens with the
+Inventory row locked and bumps its version, and a mirror whose version
+differs from the locked row is rebuilt from the index. A mirror changed in
+a transaction that rolls back never gets the new version, so it is rebuilt
+too.
+"""
+import heapq
+from collections import OrderedDict, namedtuple
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from .models import Ticket
+from .pnr import queue_changed
+
+
+# seat is None on the waitlist.
+QueueEntry = namedtuple('QueueEntry', 'priority ticket_id legs seat', defaults=[None])
+
+
+class QueueMirror:
+    """
+    Heap of QueueEntry by priority. Cancelled tickets are dropped lazily.
+    """
+    __slots__ = ('version', 'heap', 'removed')
+
+    def __init__(self, version, entries):
+        self.version = version
+        self.heap = entries
+        heapq.heapify(self.heap)
+        self.removed = set()
+
+    def __len__(self):
+        return len(self.heap) - len(self.removed)
+
+    def push(self, entry):
+        heapq.heappush(self.heap, entry)
+
+    def remove(self, ticket_id):
+        self.removed.add(ticket_id)
+
+    def take(self, fits, limit):
+        """
+        Pop entries in priority order and return those for which
+        fits(entry) returned an allocation, as (entry, allocation) pairs.
+        Stops after examining `limit` entries; the rest stay queued.
+        """
+        taken, skipped = [], []
+        while self.heap and len(taken) + len(skipped) < limit:
+            entry = heapq.heappop(self.heap)
+            if entry.ticket_id in self.removed:
+                self.removed.discard(entry.ticket_id)
+                continue
+            allocation = fits(entry)
+            if allocation is None:
+                skipped.append(entry)
+            else:
+                taken.append((entry, allocation))
+        for entry in skipped:
+            heapq.heappush(self.heap, entry)
+        return taken
+
+
+_mirrors = OrderedDict()
+
+
+def get_queue(inventory, status):
+    """
+    The mirror of `inventory`'s RAC or waitlist queue. The caller must hold
+    the Inventory row lock.
+    """
+    key = (inventory.pk, status)
+    mirror = _mirrors.get(key)
+    if mirror is None or mirror.version != inventory.version:
+        rows = (Ticket.objects.filter(run_id=inventory.run_id, travel_class=inventory.travel_class,
+                                      status=status)
+                .values_list('priority', 'pk', 'from_stop', 'to_stop', 'seat'))
+        mirror = QueueMirror(inventory.version,
+                             [QueueEntry(priority, pk, (1 << to_stop) - (1 << from_stop),
+                                         seat if status == Ticket.RAC else None)
+                              for priority, pk, from_stop, to_stop, seat in rows])
+        _mirrors[key] = mirror
+    _mirrors.move_to_end(key)
+    while len(_mirrors) > settings.BOOKINGS['MAX_QUEUE_MIRRORS']:
+        _mirrors.popitem(last=False)
+    return mirror
+
+
+def bump_version(inventory, *mirrors, reordered=False):
+    """
+    Save `inventory` with a new version after its queues changed. The
+    mirrors edited in this transaction take the new version on commit.
+    `reordered` means queued tickets changed position, which also makes
+    cached PNR statuses of the class stale.
+    """
+    inventory.version += 1
+    if reordered:
+        inventory.positions_version += 1
+        queue_changed(inventory)
+    inventory.save(update_fields=['next_priority', 'rac_count', 'waitlist_count', 'version',
+                                  'positions_version'])
+    for mirror in mirrors:
+        mirror.version = None
+        transaction.on_commit(lambda mirror=mirror, version=inventory.version:
+                              setattr(mirror, 'version', version))
+
+
+def _queue(inventory, status):
+    return Ticket.objects.filter(run_id=inventory.run_id, travel_class=inventory.travel_class, status=status)
+
+
+def close_gaps(inventory, status, positions):
+    """
+    Shift queue positions down over vacated `positions`: every ticket
+    between the i-th and (i+1)-th vacated position moves up by i.
+    """
+    positions = sorted(position for position in positions if position is not None)
+    for shift, position in enumerate(positions, start=1):
+        following = _queue(inventory, status).filter(queue_position__gt=position)
+        if shift < len(positions):
+            following = following.filter(queue_position__lt=positions[shift])
+        following.update(queue_position=F('queue_position') - shift)
+
+
+def renumber(inventory, status):
+    """
+    Reassign positions 1..n in priority order.
+    """
+    tickets = list(_queue(inventory, status).order_by('priority').only('pk', 'queue_position'))
+    changed = []
+    for position, ticket in enumerate(tickets, start=1):
+        if ticket.queue_position != position:
+            ticket.queue_position = position
+            changed.append(ticket)
+    Ticket.objects.bulk_update(changed, ['queue_position'])
@@ -13,4 +13,10 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ticketbooking.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up; serves /api/events/stream/ (SSE) and
+# /api/events/ws/ (WebSocket) without going through the Django stack.
+from trains.push import with_push  # noqa: E402
+
+application = with_push(django_application)
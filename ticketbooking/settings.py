@@ -44,9 +44,11 @@ INSTALLED_APPS = [
     'rest_framework',
     'rest_framework_simplejwt',
     'trains',
+    'bookings',
 ]
 
 MIDDLEWARE = [
+    'accounts.middleware.MetricsMiddleware', # latency/DB metrics, see METRICS below
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -55,6 +57,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'accounts.middleware.LoggingMiddleware', # custom logging middleware
+    'accounts.middleware.ProfilingMiddleware', # opt-in, see PROFILING below
 ]
 
 ROOT_URLCONF = 'ticketbooking.urls'
@@ -92,6 +95,21 @@ DATABASES = {
 }
 
 
+# Shared in-memory cache. Required: the web workers, `relay_outbox` and
+# `process_cancellations` are separate processes, and cache invalidation
+# (boards, seat maps, route profiles, PNR status) and the idempotency locks
+# only work when they all see the same cache. Every request touches it
+# (throttle buckets, version counters), so it must be Redis or Memcached:
+# CACHE_LOCATION has no default, e.g. redis://127.0.0.1:6379/1.
+# `manage.py check` warns (trains.W001) about database or per-process caches.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.redis.RedisCache'),
+        'LOCATION': config('CACHE_LOCATION'),
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -140,9 +158,183 @@ REST_FRAMEWORK = {
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
     'DEFAULT_RENDERER_CLASSES': (
-        'rest_framework.renderers.JSONRenderer',
+        'utils.renderers.FastJSONRenderer',
     ),
     'EXCEPTION_HANDLER': 'accounts.exceptions.custom_exception_handler',
+    # Token-bucket limits, keyed '<throttle_scope>.<ip|username>' (see accounts/throttling.py)
+    'DEFAULT_THROTTLE_RATES': {
+        'login.ip': config('THROTTLE_LOGIN_IP', default='20/min'),
+        'login.username': config('THROTTLE_LOGIN_USERNAME', default='5/min'),
+        'register.ip': config('THROTTLE_REGISTER_IP', default='10/min'),
+        'search.ip': config('THROTTLE_SEARCH_IP', default='120/min'),
+        'events.ip': config('THROTTLE_EVENTS_IP', default='30/min'),  # push connections (trains/push.py)
+    },
+}
+
+# Where token buckets live: 'shared' (mmap file shared by all worker processes on
+# the host, updated atomically) or 'cache' (THROTTLE_CACHE_ALIAS, cluster-wide but
+# not atomic under concurrent requests).
+THROTTLE_BUCKET_BACKEND = config('THROTTLE_BUCKET_BACKEND', default='shared')
+THROTTLE_CACHE_ALIAS = 'default'
+THROTTLE_SHARED_MEMORY_PATH = config('THROTTLE_SHARED_MEMORY_PATH',
+                                     default=str(BASE_DIR / 'logs/throttle.buckets'))
+
+# Idempotency-Key handling (accounts/idempotency.py): stored responses live
+# for TTL seconds; concurrent duplicates wait up to WAIT_SECONDS for the first.
+IDEMPOTENCY = {
+    'HEADER': 'HTTP_IDEMPOTENCY_KEY',
+    'CACHE_ALIAS': 'default',
+    'TTL': config('IDEMPOTENCY_TTL', cast=int, default=24 * 3600),
+    'LOCK_TIMEOUT': 60,
+    'WAIT_SECONDS': config('IDEMPOTENCY_WAIT_SECONDS', cast=float, default=10),
+}
+
+# Bulk user onboarding (accounts/onboarding.py): API row limit, bulk_create
+# chunk size and password hashing processes (0 = one per CPU). The API hashes
+# inside the request (~100ms of CPU per row), so MAX_ROWS stays small; larger
+# files go through `manage.py onboard_users`.
+ONBOARDING = {
+    'MAX_ROWS': config('ONBOARDING_MAX_ROWS', cast=int, default=200),
+    'CHUNK_SIZE': 1000,
+    'HASH_WORKERS': config('ONBOARDING_HASH_WORKERS', cast=int, default=0),
+}
+
+# Streamed list responses (utils/renderers.py): rows serialized per chunk and
+# compression level for gzip when the client accepts it.
+STREAMING = {
+    'CHUNK_SIZE': config('STREAMING_CHUNK_SIZE', cast=int, default=1000),
+    'COMPRESS_LEVEL': 6,
+}
+
+# Transactional outbox (trains/outbox.py): `python manage.py relay_outbox`
+# delivers change records to HANDLERS in batches and compacts delivered rows.
+# A claimed batch whose handlers fail is retried after CLAIM_SECONDS.
+OUTBOX = {
+    'BATCH_SIZE': config('OUTBOX_BATCH_SIZE', cast=int, default=500),
+    'CLAIM_SECONDS': config('OUTBOX_CLAIM_SECONDS', cast=int, default=60),
+    'POLL_SECONDS': config('OUTBOX_POLL_SECONDS', cast=float, default=1.0),
+    'RETENTION_HOURS': config('OUTBOX_RETENTION_HOURS', cast=int, default=24),
+    'COMPACT_EVERY_SECONDS': 300,
+    'HANDLERS': [
+        'trains.outbox.invalidate_departure_boards',
+        'trains.segments.invalidate_route_profiles',
+    ],
+}
+
+# Read-only timetable image mapped by every worker (trains/timetable_image.py).
+# Workers look for a replaced file at most every CHECK_SECONDS. The outbox
+# relay rebuilds a stale image once changes have been quiet for
+# DEBOUNCE_SECONDS, and at least every REBUILD_SECONDS under continuous edits.
+TIMETABLE_IMAGE = {
+    'PATH': config('TIMETABLE_IMAGE_PATH', default=str(BASE_DIR / 'logs/timetable.img')),
+    'CHECK_SECONDS': config('TIMETABLE_IMAGE_CHECK_SECONDS', cast=float, default=2.0),
+    'DEBOUNCE_SECONDS': config('TIMETABLE_IMAGE_DEBOUNCE_SECONDS', cast=float, default=3.0),
+    'REBUILD_SECONDS': config('TIMETABLE_IMAGE_REBUILD_SECONDS', cast=int, default=120),
+}
+
+# Route profiles for segment queries (trains/segments.py) live in the shared
+# cache for at most CACHE_SECONDS; route changes drop them sooner.
+SEGMENTS = {
+    'CACHE_SECONDS': config('SEGMENT_CACHE_SECONDS', cast=int, default=3600),
+}
+
+# Login and registration hash passwords in a per-process pool
+# (accounts/hashing.py). WORKERS 0 = one per CPU; beyond MAX_PENDING queued
+# or running hashes requests get 503 with Retry-After.
+PASSWORD_HASHING = {
+    'ENABLED': config('PASSWORD_HASH_POOL', cast=bool, default=True),
+    'WORKERS': config('PASSWORD_HASH_WORKERS', cast=int, default=0),
+    'MAX_PENDING': config('PASSWORD_HASH_MAX_PENDING', cast=int, default=32),
+    'TIMEOUT_SECONDS': 10,
+}
+AUTHENTICATION_BACKENDS = ['accounts.backends.PooledHashingBackend']
+
+# Ticket booking (bookings/inventory.py). A cancellation examines at most
+# PROMOTION_SCAN_LIMIT queued tickets per queue for one that fits the freed
+# seat; each process mirrors the queues of MAX_QUEUE_MIRRORS class/run pairs.
+BOOKINGS = {
+    'MAX_PASSENGERS': 6,
+    'WAITLIST_LIMIT': config('BOOKING_WAITLIST_LIMIT', cast=int, default=400),
+    'PROMOTION_SCAN_LIMIT': config('BOOKING_PROMOTION_SCAN_LIMIT', cast=int, default=500),
+    'MAX_QUEUE_MIRRORS': 1024,
+    # Fare per leg (stop to next stop) by class, charged at booking.
+    'FARE_PER_LEG': {'SL': '120', '3A': '310', '2A': '450', '1A': '760', 'CC': '230', '2S': '60'},
+}
+
+# PNR codes and status cache (bookings/pnr.py). KEY seeds the code
+# permutation: changing it once PNRs are issued makes new codes collide
+# with old ones.
+PNR = {
+    'KEY': config('PNR_KEY', default=SECRET_KEY),
+    'CACHE_SECONDS': config('PNR_CACHE_SECONDS', cast=int, default=3600),
+}
+
+# Whole-run cancellations (bookings/cancellation.py), processed by
+# `python manage.py process_cancellations` CHUNK_SIZE tickets per transaction.
+CANCELLATION = {
+    'CHUNK_SIZE': config('CANCELLATION_CHUNK_SIZE', cast=int, default=500),
+    'POLL_SECONDS': config('CANCELLATION_POLL_SECONDS', cast=float, default=5.0),
+}
+
+# Upper bound on sub-requests in one POST /api/batch/ call.
+BATCH_MAX_REQUESTS = config('BATCH_MAX_REQUESTS', cast=int, default=100)
+
+# Soft-deleted rows older than this are moved to the *_history tables by
+# `python manage.py archive_inactive` (schedule it, e.g. nightly).
+ARCHIVE_RETENTION_DAYS = config('ARCHIVE_RETENTION_DAYS', cast=int, default=30)
+
+# How far ahead `python manage.py generate_runs` materialises dated train runs.
+TRAIN_RUN_HORIZON_DAYS = config('TRAIN_RUN_HORIZON_DAYS', cast=int, default=60)
+
+# Running-status delay propagation (trains/delays.py): halts of at least
+# LONG_HALT_MINUTES absorb delay down to MIN_DWELL_MINUTES.
+DELAY_PROPAGATION = {
+    'MIN_DWELL_MINUTES': config('DELAY_MIN_DWELL_MINUTES', cast=int, default=2),
+    'LONG_HALT_MINUTES': config('DELAY_LONG_HALT_MINUTES', cast=int, default=10),
+    'MAX_BATCH': 5000,
+}
+
+# Station departure boards (trains/departure_board.py). Responses are cached
+# for a few seconds since displays poll continuously.
+DEPARTURE_BOARD = {
+    'CACHE_SECONDS': config('DEPARTURE_BOARD_CACHE_SECONDS', cast=int, default=5),
+    'DEFAULT_LIMIT': 10,
+    'MAX_LIMIT': 50,
+}
+
+# Push of train/station/route changes over SSE and WebSocket (trains/push.py,
+# served by ticketbooking/asgi.py). BROKER is 'memory' (one process) or 'unix'
+# (datagram sockets in SOCKET_DIR, shared by every process on the host).
+EVENTS = {
+    'BROKER': config('EVENTS_BROKER', default='memory'),
+    'SOCKET_DIR': config('EVENTS_SOCKET_DIR', default=str(BASE_DIR / 'logs/events')),
+    'CLIENT_BUFFER': 64,  # events held per slow client before the oldest is dropped
+    'HEARTBEAT_SECONDS': 15,
+    'MAX_TOPICS': 20,
+    # Open push connections per client IP, per worker process.
+    'MAX_CONNECTIONS_PER_CLIENT': config('EVENTS_MAX_CONNECTIONS_PER_CLIENT', cast=int, default=8),
+}
+
+# Sampling profiler hooks (accounts.middleware.ProfilingMiddleware).
+# Aggregate the output with `python manage.py profile_report`.
+PROFILING = {
+    'ENABLED': config('PROFILING_ENABLED', cast=bool, default=False),
+    'SAMPLE_RATE': config('PROFILING_SAMPLE_RATE', cast=float, default=0.0),
+    'HEADER': 'HTTP_X_PROFILE',
+    # The header only counts with this value, or from a staff session; '' = staff only.
+    'HEADER_SECRET': config('PROFILING_HEADER_SECRET', default=''),
+    'ROUTES': [],  # regexes matched against resolved url names
+    'ENGINE': config('PROFILING_ENGINE', default='cprofile'),  # 'cprofile' or 'sampler'
+    'SAMPLER_INTERVAL': 0.005,
+    'OUTPUT_DIR': BASE_DIR / 'logs/profiles',
+}
+
+# In-process metrics registry (accounts/metrics.py), scraped at /api/metrics/.
+# With several workers point MULTIPROC_DIR at a directory shared by all of them.
+METRICS = {
+    'ENABLED': config('METRICS_ENABLED', cast=bool, default=True),
+    'MULTIPROC_DIR': config('METRICS_MULTIPROC_DIR', default=''),
+    'FLUSH_INTERVAL': 5,  # seconds between snapshot writes per worker
 }
 
 SIMPLE_JWT = {
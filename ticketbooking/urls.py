@@ -20,5 +20,6 @@ from django.urls import path, include
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('accounts.urls')),
-    path('api/', include('trains.urls'))
+    path('api/', include('trains.urls')),
+    path('api/', include('bookings.urls')),
 ]
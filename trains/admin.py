@@ -1,6 +1,14 @@
 from django.contrib import admin
-from .models import Station, Train, TrainStation
+from .models import (Station, Train, TrainStation, ServiceCalendar, ServiceException, TrainRun,
+                     TrainRunStop, OutboxEvent, CoachLayout, TrainCoach)
 
 admin.site.register(Station)
 admin.site.register(Train)
 admin.site.register(TrainStation)
+admin.site.register(ServiceCalendar)
+admin.site.register(ServiceException)
+admin.site.register(TrainRun)
+admin.site.register(TrainRunStop)
+admin.site.register(OutboxEvent)
+admin.site.register(CoachLayout)
+admin.site.register(TrainCoach)
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class TrainsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'trains'
+
+    def ready(self):
+        import trains.checks
+        import trains.signals
+        from trains.timetable_image import timetable
+        timetable.open()
@@ -0,0 +1,127 @@
+"""
+Batch archival of soft-deleted rows into the *_history tables, and restore.
+
+Rows are archived only when they have been inactive for longer than the
+retention window and nothing in the hot tables still references them (stops
+go first, then trains without stops, then stations without trains or stops).
+Each batch is copied and deleted in its own transaction, so the job can be
+interrupted and re-run safely.
+"""
+import logging
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from .models import (Station, Train, TrainStation, StationHistory, TrainHistory,
+                     TrainStationHistory)
+
+logger = logging.getLogger('request_logger')
+
+# hot model -> (history model, columns copied besides the primary key)
+ARCHIVE_SPECS = [
+    (TrainStation, TrainStationHistory, ['train_id', 'station_id', 'arrival_time', 'departure_time',
+                                         'arrival_day', 'departure_day', 'stop_number', 'created_at',
+                                         'updated_at', 'deleted_at']),
+    (Train, TrainHistory, ['number', 'name', 'from_station_id', 'to_station_id', 'compartments',
+                           'seats_per_compartment', 'created_at', 'updated_at', 'deleted_at']),
+    (Station, StationHistory, ['code', 'name', 'created_at', 'updated_at', 'deleted_at']),
+]
+
+
+def _unreferenced(model, queryset):
+    """
+    Exclude rows that any other model still points at through a foreign key.
+    """
+    for relation in model._meta.related_objects:
+        referencing = relation.related_model._base_manager.filter(**{relation.field.name: OuterRef('pk')})
+        queryset = queryset.filter(~Exists(referencing))
+    return queryset
+
+
+def archivable(model, cutoff):
+    return _unreferenced(model, model.objects.inactive().filter(deleted_at__lt=cutoff))
+
+
+def archive_inactive(retention_days, batch_size=1000, dry_run=False):
+    """
+    Move inactive rows deleted before now - retention_days into history tables.
+    Returns {db_table: rows archived (or archivable, for dry runs)}.
+    """
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    results = {}
+    for model, history_model, columns in ARCHIVE_SPECS:
+        table = model._meta.db_table
+        if dry_run:
+            results[table] = archivable(model, cutoff).count()
+            continue
+        total = 0
+        while True:
+            with transaction.atomic():
+                ids = list(archivable(model, cutoff).order_by('pk')
+                           .select_for_update(skip_locked=True).values_list('pk', flat=True)[:batch_size])
+                if not ids:
+                    break
+                rows = model.objects.filter(pk__in=ids).values('pk', *columns)
+                history_model.objects.bulk_create(
+                    [history_model(original_id=row.pop('pk'), **row) for row in rows])
+                model.objects.filter(pk__in=ids).delete()
+            total += len(ids)
+        results[table] = total
+        logger.info(f"Archived {total} rows from {table}")
+    return results
+
+
+def _restore_rows(model, history_model, columns, history_rows):
+    """
+    Recreate hot rows (still inactive) from history rows and drop the copies.
+    deleted_at restarts at now so the next archival run does not take them
+    straight back.
+    """
+    if not history_rows:
+        return 0
+    now = timezone.now()
+    model.objects.bulk_create([
+        model(pk=row.original_id, is_active=False,
+              **{column: getattr(row, column) for column in columns if column != 'deleted_at'},
+              deleted_at=now)
+        for row in history_rows
+    ])
+    history_model.objects.filter(pk__in=[row.pk for row in history_rows]).delete()
+    return len(history_rows)
+
+
+def restore_stations(station_ids):
+    """
+    Restore archived stations with the given original ids, if archived.
+    """
+    rows = list(StationHistory.objects.filter(original_id__in=set(station_ids)))
+    return _restore_rows(Station, StationHistory, ARCHIVE_SPECS[2][2], rows)
+
+
+def restore_train(number):
+    """
+    Restore an archived train and its archived stops (plus any archived
+    stations they need) back into the hot tables as inactive rows, ready to
+    be reactivated. Returns {db_table: rows restored}.
+    """
+    with transaction.atomic():
+        train_rows = list(TrainHistory.objects.filter(number=number))
+        train_ids = [row.original_id for row in train_rows]
+        stop_rows = list(TrainStationHistory.objects.filter(train_id__in=train_ids))
+        station_ids = {row.from_station_id for row in train_rows} | {row.to_station_id for row in train_rows}
+        station_ids |= {row.station_id for row in stop_rows}
+        return {
+            Station._meta.db_table: restore_stations(station_ids),
+            Train._meta.db_table: _restore_rows(Train, TrainHistory, ARCHIVE_SPECS[1][2], train_rows),
+            TrainStation._meta.db_table: _restore_rows(TrainStation, TrainStationHistory,
+                                                       ARCHIVE_SPECS[0][2], stop_rows),
+        }
+
+
+def restore_station(code):
+    """
+    Restore an archived station by code. Returns the number of rows restored.
+    """
+    with transaction.atomic():
+        ids = StationHistory.objects.filter(code__iexact=code).values_list('original_id', flat=True)
+        return restore_stations(list(ids))
@@ -0,0 +1,39 @@
+"""
+Deployment checks for settings the cross-process caches depend on.
+"""
+from django.conf import settings
+from django.core.checks import Warning, register
+
+PROCESS_LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+# Shared, but every get/incr is SQL or file I/O on the request path.
+SLOW_CACHES = {
+    'django.core.cache.backends.db.DatabaseCache',
+    'django.core.cache.backends.filebased.FileBasedCache',
+}
+
+
+@register()
+def shared_cache_check(app_configs, **kwargs):
+    """
+    The outbox relay and cancellation worker invalidate entries the web
+    workers read, so the default cache must be shared between processes. It
+    is also read on every request, so it must be an in-memory server.
+    """
+    backend = settings.CACHES['default']['BACKEND']
+    hint = "Set CACHE_BACKEND and CACHE_LOCATION to a Redis or Memcached server."
+    if backend in PROCESS_LOCAL_CACHES:
+        return [Warning(
+            "The default cache is local to each process, so cache invalidation from "
+            "relay_outbox and process_cancellations never reaches the web workers.",
+            hint=hint, id='trains.W001',
+        )]
+    if backend in SLOW_CACHES:
+        return [Warning(
+            "The default cache is not in memory, so throttle buckets, board versions, "
+            "PNR status and idempotency locks cost a query on every request.",
+            hint=hint, id='trains.W001',
+        )]
+    return []
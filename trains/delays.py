@@ -0,0 +1,177 @@
+"""
+Ingest of running-status reports ("train X is N minutes late at station Y")
+and their propagation to the downstream stops of the dated run.
+
+Each run's stops carry their current arrival/departure delay and expected
+times (TrainRunStop), so a report only walks forward from the reported stop:
+the arrival delay at a stop is the departure delay of the previous one, and
+a halt longer than LONG_HALT_MINUTES absorbs delay down to MIN_DWELL_MINUTES.
+Propagation stops at the first stop whose delays are already what they would
+become, since everything after it was derived from the same values.
+
+Reports for a stop before the furthest one already reported for the run are
+stale and ignored. A batch is applied under row locks on its runs and written
+back with one bulk_update per table.
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import Station, TrainRun, TrainRunStop, TrainStation
+
+logger = logging.getLogger('request_logger')
+
+ARRIVAL = 'arrival'
+DEPARTURE = 'departure'
+EVENTS = (ARRIVAL, DEPARTURE)
+
+STOP_FIELDS = ['arrival_delay', 'departure_delay', 'expected_arrival', 'expected_departure', 'updated_at']
+
+
+def _scheduled(day, value, offset):
+    return timezone.make_aware(datetime.combine(day + timedelta(days=offset), value))
+
+
+def build_run_stops(runs):
+    """
+    Create on-time TrainRunStop rows for the given runs from their trains'
+    active routes, dated by each stop's day offsets. Returns {run_id: [stops]}.
+    """
+    routes = defaultdict(list)
+    route_rows = (TrainStation.objects.active()
+                  .filter(train_id__in={run.train_id for run in runs})
+                  .order_by('train_id', 'stop_number')
+                  .values_list('train_id', 'station_id', 'stop_number', 'arrival_time', 'arrival_day',
+                               'departure_time', 'departure_day'))
+    for train_id, *stop in route_rows:
+        routes[train_id].append(stop)
+
+    stops_by_run = {}
+    rows = []
+    for run in runs:
+        run_stops = []
+        for station_id, stop_number, arrival, arrival_day, departure, departure_day in routes[run.train_id]:
+            scheduled_arrival = _scheduled(run.run_date, arrival, arrival_day)
+            scheduled_departure = _scheduled(run.run_date, departure, departure_day)
+            run_stops.append(TrainRunStop(run=run, station_id=station_id, stop_number=stop_number,
+                                          scheduled_arrival=scheduled_arrival,
+                                          scheduled_departure=scheduled_departure,
+                                          expected_arrival=scheduled_arrival,
+                                          expected_departure=scheduled_departure))
+        stops_by_run[run.id] = run_stops
+        rows.extend(run_stops)
+    TrainRunStop.objects.bulk_create(rows, batch_size=1000)
+    return stops_by_run
+
+
+def departure_delay(stop, arrival_delay, min_dwell, long_halt):
+    """
+    Delay carried out of a stop given the delay it was reached with. Long
+    halts recover everything above the minimum dwell; a train running early
+    still leaves on time.
+    """
+    if arrival_delay <= 0:
+        return 0
+    halt = (stop.scheduled_departure - stop.scheduled_arrival).total_seconds() // 60
+    slack = halt - min_dwell if halt >= long_halt else 0
+    return max(0, arrival_delay - int(slack))
+
+
+def propagate(stops, index, delay, event, min_dwell, long_halt):
+    """
+    Apply a delay reported at stops[index] and carry it downstream.
+    Returns the stops whose values changed.
+    """
+    changed = []
+    stop = stops[index]
+    if event == ARRIVAL:
+        arrival = delay
+        departure = departure_delay(stop, arrival, min_dwell, long_halt)
+    else:
+        arrival = stop.arrival_delay
+        departure = max(0, delay)
+    for position in range(index, len(stops)):
+        stop = stops[position]
+        if position > index:
+            arrival = departure
+            departure = departure_delay(stop, arrival, min_dwell, long_halt)
+            if stop.arrival_delay == arrival and stop.departure_delay == departure:
+                break
+        stop.arrival_delay = arrival
+        stop.departure_delay = departure
+        stop.expected_arrival = stop.scheduled_arrival + timedelta(minutes=arrival)
+        stop.expected_departure = stop.scheduled_departure + timedelta(minutes=departure)
+        changed.append(stop)
+    return changed
+
+
+def ingest_delays(updates):
+    """
+    Apply a batch of reports, each a dict with train_number, run_date
+    (date), station_code, delay_minutes and event ('arrival'/'departure').
+    Reports are applied in the order given.
+
+    Returns counts: applied, stale (behind the run's furthest report),
+    unknown (no such scheduled run or stop) and stops_updated.
+    """
+    options = settings.DELAY_PROPAGATION
+    min_dwell, long_halt = options['MIN_DWELL_MINUTES'], options['LONG_HALT_MINUTES']
+    result = {'applied': 0, 'stale': 0, 'unknown': 0, 'stops_updated': 0}
+    if not updates:
+        return result
+    keys = {(update['train_number'], update['run_date']) for update in updates}
+    station_ids = dict(Station.objects.filter(code__in={update['station_code'].upper() for update in updates})
+                       .values_list('code', 'id'))
+
+    with transaction.atomic():
+        runs = {
+            (run.train.number, run.run_date): run
+            for run in (TrainRun.objects.select_for_update(of=('self',))
+                        .select_related('train')
+                        .filter(status=TrainRun.SCHEDULED,
+                                run_date__in={run_date for _, run_date in keys},
+                                train__number__in={number for number, _ in keys})
+                        .order_by('pk'))
+            if (run.train.number, run.run_date) in keys
+        }
+        stops_by_run = defaultdict(list)
+        for stop in TrainRunStop.objects.filter(run__in=list(runs.values())).order_by('run_id', 'stop_number'):
+            stops_by_run[stop.run_id].append(stop)
+        missing = [run for run in runs.values() if run.id not in stops_by_run]
+        if missing:
+            stops_by_run.update(build_run_stops(missing))
+
+        positions = {run_id: {stop.station_id: i for i, stop in enumerate(stops)}
+                     for run_id, stops in stops_by_run.items()}
+        changed_stops = {}
+        reported_runs = {}
+        now = timezone.now()
+        for update in updates:
+            run = runs.get((update['train_number'], update['run_date']))
+            station_id = station_ids.get(update['station_code'].upper())
+            index = positions[run.id].get(station_id) if run else None
+            if index is None:
+                result['unknown'] += 1
+                continue
+            stops = stops_by_run[run.id]
+            stop_number = stops[index].stop_number
+            if run.reported_stop_number and stop_number < run.reported_stop_number:
+                result['stale'] += 1
+                continue
+            for stop in propagate(stops, index, update['delay_minutes'], update.get('event', ARRIVAL),
+                                  min_dwell, long_halt):
+                stop.updated_at = now
+                changed_stops[stop.pk] = stop
+            run.reported_stop_number = stop_number
+            run.reported_at = now
+            reported_runs[run.pk] = run
+            result['applied'] += 1
+
+        TrainRunStop.objects.bulk_update(list(changed_stops.values()), STOP_FIELDS, batch_size=1000)
+        TrainRun.objects.bulk_update(list(reported_runs.values()),
+                                     ['reported_stop_number', 'reported_at'], batch_size=1000)
+    result['stops_updated'] = len(changed_stops)
+    logger.info(f"Ingested {len(updates)} delay reports: {result}")
+    return result
@@ -0,0 +1,168 @@
+"""
+In-memory departure/arrival boards per station.
+
+Each station's board holds two arrays sorted by time of day (seconds since
+midnight) with the display rows alongside, so "next N after T" is a bisect
+plus a slice that wraps past midnight. Boards are built lazily for stations
+that are actually polled.
+
+Staleness is tracked with a per-station version token in the cache: signal
+handlers move the stations a change touches to a fresh token, and a process
+rebuilds only the boards whose token changed since it built them. With a
+shared cache every worker picks up the change on its next lookup.
+
+Boards load from the shared timetable image (trains.timetable_image) while
+it is current, and from the database while a rebuild is pending.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+from django.core.cache import cache
+from django.db.models import Max
+from accounts import metrics
+from .models import TrainStation
+from .timetable_image import timetable
+
+logger = logging.getLogger('request_logger')
+
+DEPARTURES = 'departures'
+ARRIVALS = 'arrivals'
+BOARD_TYPES = (DEPARTURES, ARRIVALS)
+
+VERSION_KEY = 'departure_board:version:{station_id}'
+
+
+def seconds_of_day(value):
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+def invalidate_stations(station_ids):
+    """
+    Move every given station to a fresh board version in one round trip.
+    Boards only compare versions for equality, so a new unique token does
+    what a per-station increment did.
+    """
+    station_ids = set(station_ids)
+    if station_ids:
+        token = time.time_ns()
+        cache.set_many({VERSION_KEY.format(station_id=station_id): token for station_id in station_ids},
+                       timeout=None)
+
+
+def invalidate_train(train_id):
+    """
+    Bump the boards of every station on the train's active route.
+    """
+    station_ids = TrainStation.objects.active().filter(train_id=train_id).values_list('station_id', flat=True)
+    invalidate_stations(list(station_ids))
+
+
+class StationBoard:
+    """
+    Sorted departures and arrivals for one station.
+    """
+    __slots__ = ('version', 'keys', 'rows')
+
+    def __init__(self, version, stops):
+        self.version = version
+        self.keys = {}
+        self.rows = {}
+        for board_type, entries in stops.items():
+            entries.sort(key=lambda entry: (entry[0], entry[1]['train_number']))
+            self.keys[board_type] = [key for key, _ in entries]
+            self.rows[board_type] = [row for _, row in entries]
+
+    def next(self, board_type, after, limit):
+        """
+        Return up to `limit` rows at or after `after` (seconds of day),
+        continuing from midnight when the day's list runs out. Rows taken
+        after the wrap are flagged next_day.
+        """
+        keys, rows = self.keys[board_type], self.rows[board_type]
+        start = bisect_left(keys, after)
+        result = [dict(row, next_day=False) for row in rows[start:start + limit]]
+        remaining = min(limit - len(result), start)
+        if remaining > 0:
+            result.extend(dict(row, next_day=True) for row in rows[:remaining])
+        return result
+
+
+class DepartureBoard:
+    """
+    Process-local cache of StationBoards, kept in step with the cache versions.
+    """
+
+    def __init__(self):
+        self._boards = {}
+        self._lock = threading.Lock()
+
+    def get(self, station_id):
+        version = cache.get(VERSION_KEY.format(station_id=station_id), 0)
+        board = self._boards.get(station_id)
+        if board is not None and board.version == version:
+            metrics.record_cache('departure_board', True)
+            return board
+        metrics.record_cache('departure_board', False)
+        with self._lock:
+            board = self._boards.get(station_id)
+            if board is None or board.version != version:
+                board = StationBoard(version, self._load(station_id))
+                self._boards[station_id] = board
+                logger.debug(f"Rebuilt departure board for station {station_id} (version {version})")
+        return board
+
+    def _load(self, station_id):
+        """
+        Read the station's active stops on active trains. The first stop only
+        departs and the last stop only arrives.
+        """
+        image = timetable.current()
+        calls = image.board_calls(station_id) if image is not None else None
+        if calls is not None:
+            return self._entries((call, call['stop_number'] > 1, not call['last']) for call in calls)
+        stops = list(TrainStation.objects.active()
+                     .filter(station_id=station_id, train__is_active=True)
+                     .select_related('train__from_station', 'train__to_station'))
+        last_stop = dict(TrainStation.objects.active()
+                         .filter(train_id__in={stop.train_id for stop in stops})
+                         .values('train_id').annotate(last=Max('stop_number'))
+                         .values_list('train_id', 'last'))
+        return self._entries(({'train_number': stop.train.number,
+                                'train_name': stop.train.name,
+                                'from_station': stop.train.from_station.code,
+                                'to_station': stop.train.to_station.code,
+                                'arrival_time': stop.arrival_time,
+                                'departure_time': stop.departure_time,
+                                'stop_number': stop.stop_number},
+                               stop.stop_number > 1, stop.stop_number < last_stop[stop.train_id])
+                              for stop in stops)
+
+    @staticmethod
+    def _entries(calls):
+        """
+        Board entries from (call, arrives, departs) triples.
+        """
+        entries = {DEPARTURES: [], ARRIVALS: []}
+        for call, arrives, departs in calls:
+            row = {
+                'train_number': call['train_number'],
+                'train_name': call['train_name'],
+                'from_station': call['from_station'],
+                'to_station': call['to_station'],
+                'arrival_time': call['arrival_time'].strftime('%H:%M'),
+                'departure_time': call['departure_time'].strftime('%H:%M'),
+                'stop_number': call['stop_number'],
+            }
+            if departs:
+                entries[DEPARTURES].append((seconds_of_day(call['departure_time']), row))
+            if arrives:
+                entries[ARRIVALS].append((seconds_of_day(call['arrival_time']), row))
+        return entries
+
+    def clear(self):
+        with self._lock:
+            self._boards.clear()
+
+
+board = DepartureBoard()
@@ -0,0 +1,300 @@
+"""
+Publish/subscribe of train, station and route change events for the push
+endpoints in trains/push.py.
+
+Model signals (trains/signals.py) publish small JSON-able events to topics
+named ``train:<number>`` and ``station:<code>``. Subscribers are ASGI
+connections; each holds a bounded buffer, and when a slow client's buffer is
+full its oldest event is dropped and the next delivery reports how many were
+lost so the client can refetch.
+
+The broker is selected by ``EVENTS['BROKER']``:
+    - ``memory``: fan-out inside this process only (single ASGI worker, or
+      when publishers and subscribers share a process).
+    - ``unix``: a local broker stand-in. Every subscribing process binds a
+      datagram socket in ``EVENTS['SOCKET_DIR']`` and publishers send each
+      event to all sockets there, so WSGI workers and several ASGI workers
+      on one host see the same stream. Live subscriber counts per process
+      are kept in a small mmap'ed table next to the sockets, so publishers
+      can skip building events while nobody on the host is listening.
+"""
+import asyncio
+import fcntl
+import glob
+import json
+import logging
+import mmap
+import os
+import socket
+import struct
+import threading
+import time
+from collections import defaultdict, deque
+from django.conf import settings
+
+logger = logging.getLogger('request_logger')
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def train_topic(number):
+    return f"train:{number}"
+
+
+def station_topic(code):
+    return f"station:{code.upper()}"
+
+
+class Subscription:
+    """
+    One client's view of the broker: its topics and a bounded event buffer.
+    Must be created and consumed on the event loop that serves the client;
+    an idle subscription is a deque and, while waiting, one future.
+    """
+    __slots__ = ('topics', 'buffer', 'dropped', 'closed', '_waiter')
+
+    def __init__(self, topics, buffer_size):
+        self.topics = frozenset(topics)
+        self.buffer = deque(maxlen=buffer_size)
+        self.dropped = 0
+        self.closed = False
+        self._waiter = None
+
+    def _wake(self):
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    def deliver(self, event):
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+        self.buffer.append(event)
+        self._wake()
+
+    def close(self):
+        self.closed = True
+        self._wake()
+
+    async def get(self, timeout):
+        """
+        Next event, or None after `timeout` seconds of silence or once closed.
+        When events were dropped an overflow event is returned first.
+        """
+        if not self.buffer and not self.closed:
+            loop = asyncio.get_running_loop()
+            self._waiter = loop.create_future()
+            timer = loop.call_later(timeout, self._wake)
+            try:
+                await self._waiter
+            finally:
+                timer.cancel()
+                self._waiter = None
+        if self.dropped:
+            dropped, self.dropped = self.dropped, 0
+            return {'type': 'overflow', 'dropped': dropped}
+        return self.buffer.popleft() if self.buffer else None
+
+
+class InProcessBroker:
+    """
+    Topic -> subscriptions map with fan-out on the subscribers' event loop.
+    Publishing from a worker thread (sync views under ASGI) hops onto the
+    loop once per event, not once per subscriber.
+    """
+
+    def __init__(self, buffer_size):
+        self.buffer_size = buffer_size
+        self._topics = defaultdict(set)
+        self._loop = None
+        self.subscribers = 0
+
+    def subscribe(self, topics):
+        self._loop = asyncio.get_running_loop()
+        subscription = Subscription(topics, self.buffer_size)
+        for topic in subscription.topics:
+            self._topics[topic].add(subscription)
+        self.subscribers += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.subscribers -= 1
+        for topic in subscription.topics:
+            subscribers = self._topics.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._topics[topic]
+
+    def has_subscribers(self):
+        return bool(self._topics)
+
+    def publish(self, topic, event):
+        if topic not in self._topics or self._loop is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._fanout(topic, event)
+        elif not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._fanout, topic, event)
+
+    def _fanout(self, topic, event):
+        for subscription in list(self._topics.get(topic, ())):
+            subscription.deliver(event)
+
+
+class SubscriberTable:
+    """
+    Fixed-size table of (pid, live subscriber count) slots in a memory-mapped
+    file shared by every process on the host. Writers hold a file lock;
+    readers scan the mapping without one.
+    """
+    SLOT = struct.Struct('<qq')
+
+    def __init__(self, path, slots=256):
+        self.slots = slots
+        size = self.SLOT.size * slots
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+        self._lock = threading.Lock()
+
+    def add(self, delta):
+        """
+        Adjust this process's count, claiming a free or dead process's slot.
+        """
+        pid = os.getpid()
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                free = None
+                for index, (slot_pid, count) in enumerate(self.SLOT.iter_unpack(self._map)):
+                    if slot_pid == pid:
+                        self.SLOT.pack_into(self._map, index * self.SLOT.size, pid, max(0, count + delta))
+                        return
+                    if free is None and (slot_pid == 0 or count == 0 or not _alive(slot_pid)):
+                        free = index
+                if free is None:
+                    logger.warning("Event subscriber table is full; publishers will not skip events")
+                    return
+                self.SLOT.pack_into(self._map, free * self.SLOT.size, pid, max(0, delta))
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def any(self):
+        """
+        Whether a live process on the host has a subscriber.
+        """
+        return any(count > 0 and _alive(pid) for pid, count in self.SLOT.iter_unpack(self._map))
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class UnixSocketBroker(InProcessBroker):
+    """
+    InProcessBroker whose publishes travel through per-process datagram
+    sockets, so every process on the host fans out every event.
+    """
+
+    def __init__(self, buffer_size, socket_dir):
+        super().__init__(buffer_size)
+        self.socket_dir = socket_dir
+        self._receiver = None
+        self._sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sender.setblocking(False)
+        self._table = SubscriberTable(os.path.join(socket_dir, 'subscribers'))
+
+    def subscribe(self, topics):
+        if self._receiver is None:
+            self._bind(asyncio.get_running_loop())
+        subscription = super().subscribe(topics)
+        self._table.add(1)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        super().unsubscribe(subscription)
+        self._table.add(-1)
+
+    def has_subscribers(self):
+        # Any live subscriber on the host; other processes' topics are not known here.
+        return self._table.any()
+
+    def _bind(self, loop):
+        os.makedirs(self.socket_dir, exist_ok=True)
+        path = os.path.join(self.socket_dir, f"{os.getpid()}.sock")
+        if os.path.exists(path):
+            os.unlink(path)
+        receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        receiver.bind(path)
+        receiver.setblocking(False)
+        loop.add_reader(receiver.fileno(), self._on_readable)
+        self._receiver = receiver
+        logger.info(f"Event broker listening on {path}")
+
+    def _on_readable(self):
+        while True:
+            try:
+                payload = self._receiver.recv(65536)
+            except BlockingIOError:
+                return
+            message = json.loads(payload)
+            self._fanout(message['topic'], message['event'])
+
+    def publish(self, topic, event):
+        payload = json.dumps({'topic': topic, 'event': event}, default=str).encode()
+        for path in glob.glob(os.path.join(self.socket_dir, '*.sock')):
+            try:
+                self._sender.sendto(payload, path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Process gone without cleaning up its socket.
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+            except BlockingIOError:
+                logger.warning(f"Event socket {path} is full; dropped {topic} event")
+
+
+def get_broker():
+    """
+    Return the process-wide broker configured in settings.
+    """
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                options = settings.EVENTS
+                if options['BROKER'] == 'unix':
+                    _broker = UnixSocketBroker(options['CLIENT_BUFFER'], options['SOCKET_DIR'])
+                else:
+                    _broker = InProcessBroker(options['CLIENT_BUFFER'])
+    return _broker
+
+
+def has_subscribers():
+    """
+    Whether any connection might receive a published event. Publishers can
+    skip building events when this is False.
+    """
+    return get_broker().has_subscribers()
+
+
+def publish(event_type, topics, data):
+    """
+    Publish one event to each topic.
+    """
+    broker = get_broker()
+    for topic in topics:
+        broker.publish(topic, {'type': event_type, 'topic': topic, 'data': data, 'ts': time.time()})
@@ -2,6 +2,30 @@ from rest_framework.exceptions import APIException
 from rest_framework import status
 from rest_framework.views import exception_handler
 from rest_framework.response import Response
+import re
+from contextlib import contextmanager
+from django.db import IntegrityError, transaction
+from utils.constants import StationMessage, TrainMessage, TrainStationMessage
+
+# Violated unique constraint -> conflict message. PostgreSQL reports the
+# constraint name (`<table>_<column>_key` for unique=True columns); SQLite
+# reports an index name or, for column constraints, the column list.
+INTEGRITY_ERROR_MESSAGES = {
+    'unique_active_train_station': TrainStationMessage.TRAIN_ROUTE_EXISTS,
+    'train_station.train_id, train_station.station_id': TrainStationMessage.TRAIN_ROUTE_EXISTS,
+    'unique_active_train_stop_number': TrainStationMessage.TRAIN_STATION_DUPLICATE_STOP,
+    'train_station.train_id, train_station.stop_number': TrainStationMessage.TRAIN_STATION_DUPLICATE_STOP,
+    'unique_station_code_ci': StationMessage.STATION_ALREADY_EXISTS,
+    'unique_station_name_ci': StationMessage.STATION_ALREADY_EXISTS,
+    'station_code_key': StationMessage.STATION_ALREADY_EXISTS,
+    'station_name_key': StationMessage.STATION_ALREADY_EXISTS,
+    'station.code': StationMessage.STATION_ALREADY_EXISTS,
+    'station.name': StationMessage.STATION_ALREADY_EXISTS,
+    'unique_train_name_ci': TrainMessage.TRAIN_ALREADY_EXISTS,
+    'train_name_key': TrainMessage.TRAIN_ALREADY_EXISTS,
+    'train.name': TrainMessage.TRAIN_ALREADY_EXISTS,
+}
+SQLITE_UNIQUE_FAILED = re.compile(r"UNIQUE constraint failed: (?:index '(?P<index>[^']+)'|(?P<columns>.+))$")
 
 def custom_exception_handler(exc, context):
     response = exception_handler(exc, context)
@@ -59,4 +83,42 @@ class AlreadyExists(APIException):
 
 class NotFound(APIException):
     status_code = status.HTTP_404_NOT_FOUND
-    default_detail = 'not_found'
\ No newline at end of file
+    default_detail = 'not_found'
+
+
+def violated_constraint(error):
+    """
+    Name of the constraint an IntegrityError violated, from the driver's
+    diagnostics (psycopg2) or SQLite's message, or None if unknown.
+    """
+    diag = getattr(error.__cause__, 'diag', None)
+    if diag is not None:
+        return diag.constraint_name
+    match = SQLITE_UNIQUE_FAILED.match(str(error))
+    if match is None:
+        return None
+    return match.group('index') or match.group('columns')
+
+
+def already_exists_message(error):
+    """
+    Return the conflict message for a unique-constraint IntegrityError, or
+    None if the error is not one of the known duplicate constraints.
+    """
+    return INTEGRITY_ERROR_MESSAGES.get(violated_constraint(error))
+
+
+@contextmanager
+def map_integrity_errors(exception_class=AlreadyExists):
+    """
+    Run the block in a savepoint and turn duplicate-key IntegrityErrors into
+    exception_class(message). Other integrity errors propagate unchanged.
+    """
+    try:
+        with transaction.atomic():
+            yield
+    except IntegrityError as e:
+        message = already_exists_message(e)
+        if message is None:
+            raise
+        raise exception_class(message) from e
@@ -0,0 +1,149 @@
+"""
+Sparse fieldsets for read endpoints: ``?fields=`` and ``?expand=``.
+
+``?fields=id,name`` limits each object to the listed fields and
+``?expand=station`` replaces a foreign-key id with the nested object.
+Serializers opt in with ``SparseFieldsetMixin``; viewsets add
+``SparseQuerysetMixin`` so the queryset follows the response: only the
+relations the remaining fields read are joined (select_related) and only the
+columns they read are loaded (only()).
+
+Columns are derived from each field's ``source``. Computed fields list what
+they read in ``Meta.field_requires``, and columns the serializer reads outside
+its fields (e.g. in to_representation) go in ``Meta.always_requires``. If a
+field's columns cannot be worked out the queryset is left untouched rather
+than risk a query per row on deferred columns.
+
+Unsafe methods (POST/PUT/...) are not affected: write responses always use
+the full representation.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.serializers import BaseSerializer, ListSerializer
+from utils.constants import FieldsetMessage
+from .exceptions import InvalidInput
+
+
+def _names(value):
+    if value is None:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def requested_fieldset(request):
+    """
+    Return (fields, expand) from the query string, each a set of names or
+    None, or None when the request asks for neither or is not a read.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    fields = _names(request.query_params.get('fields'))
+    expand = _names(request.query_params.get('expand'))
+    if fields is None and not expand:
+        return None
+    return fields, expand or set()
+
+
+class SparseFieldsetMixin:
+    """
+    ModelSerializer mixin applying ?fields= / ?expand= from the request in
+    the serializer context. Relations that can be expanded are declared as
+    ``Meta.expandable_fields = {'field': SerializerClass}``. Only the
+    top-level serializer reads the query string; expanded objects are
+    rendered in full.
+    """
+
+    def _is_top_level(self):
+        return self.parent is None or (isinstance(self.parent, ListSerializer) and self.parent.parent is None)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fieldset = requested_fieldset(self.context.get('request')) if self._is_top_level() else None
+        if fieldset is None:
+            return fields
+        wanted, expand = fieldset
+
+        expandable = getattr(self.Meta, 'expandable_fields', {})
+        unknown = expand - expandable.keys()
+        if unknown:
+            raise InvalidInput(FieldsetMessage.UNKNOWN_EXPAND.format(
+                fields=', '.join(sorted(unknown)), available=', '.join(sorted(expandable)) or '-'))
+        for name in expand:
+            fields[name] = expandable[name](read_only=True)
+
+        if wanted is not None:
+            available = {name for name, field in fields.items() if not field.write_only} | expandable.keys()
+            unknown = wanted - available
+            if unknown:
+                raise InvalidInput(FieldsetMessage.UNKNOWN_FIELDS.format(
+                    fields=', '.join(sorted(unknown)), available=', '.join(sorted(available))))
+            for name in list(fields):
+                if name not in wanted and name not in expand and not fields[name].write_only:
+                    del fields[name]
+        return fields
+
+
+def _requirements(serializer, prefix=''):
+    """
+    Return (relations, columns) the readable fields of `serializer` touch,
+    as ORM paths under `prefix`, or None if some field cannot be resolved.
+    """
+    meta = serializer.Meta
+    model = meta.model
+    field_requires = getattr(meta, 'field_requires', {})
+    relations, columns = set(), []
+    paths = list(getattr(meta, 'always_requires', []))
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, BaseSerializer):
+            relations.add(prefix + field.source)
+            nested = _requirements(field, f"{prefix}{field.source}__")
+            if nested is None:
+                return None
+            relations |= nested[0]
+            columns += nested[1]
+        elif name in field_requires:
+            paths += field_requires[name]
+        elif field.source == '*':
+            return None
+        else:
+            paths.append(field.source.replace('.', '__'))
+
+    for path in paths:
+        current, parts = model, path.split('__')
+        for depth, part in enumerate(parts):
+            try:
+                model_field = current._meta.get_field(part)
+            except FieldDoesNotExist:
+                return None
+            if depth < len(parts) - 1:
+                if not model_field.is_relation:
+                    return None
+                relations.add(prefix + '__'.join(parts[:depth + 1]))
+                current = model_field.related_model
+        columns.append(prefix + path)
+    return relations, columns
+
+
+class SparseQuerysetMixin:
+    """
+    Viewset mixin narrowing get_queryset() to the fields a read will render.
+    Custom actions building their own queryset can pass it through
+    ``apply_fieldset``.
+    """
+
+    def get_queryset(self):
+        return self.apply_fieldset(super().get_queryset())
+
+    def apply_fieldset(self, queryset):
+        if requested_fieldset(self.request) is None:
+            return queryset
+        plan = _requirements(self.get_serializer())
+        if plan is None:
+            return queryset
+        relations, columns = plan
+        queryset = queryset.select_related(None)
+        if relations:  # select_related() with no arguments would follow every FK
+            queryset = queryset.select_related(*sorted(relations))
+        return queryset.only(*columns)
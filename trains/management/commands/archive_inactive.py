@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from trains.archival import archive_inactive, restore_station, restore_train
+
+
+class Command(BaseCommand):
+    """
+    Move long-inactive stations, trains and stops into the history tables,
+    or restore archived rows.
+
+    Usage:
+        python manage.py archive_inactive --retention-days 30 --batch-size 1000
+        python manage.py archive_inactive --restore-train 12345
+        python manage.py archive_inactive --restore-station MAS
+    """
+    help = 'Archive soft-deleted rows older than the retention window, or restore archived rows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int, default=settings.ARCHIVE_RETENTION_DAYS)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Only count archivable rows.')
+        parser.add_argument('--restore-train', metavar='NUMBER',
+                            help='Restore an archived train with its stops and stations.')
+        parser.add_argument('--restore-station', metavar='CODE', help='Restore an archived station.')
+
+    def handle(self, *args, **options):
+        if options['restore_train']:
+            counts = restore_train(options['restore_train'])
+        elif options['restore_station']:
+            counts = {'station': restore_station(options['restore_station'])}
+        else:
+            counts = archive_inactive(options['retention_days'], options['batch_size'],
+                                      dry_run=options['dry_run'])
+        for table, count in counts.items():
+            self.stdout.write(f"{table}: {count}")
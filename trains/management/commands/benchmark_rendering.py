@@ -0,0 +1,66 @@
+import gc
+import time
+import tracemalloc
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from trains.models import TrainStation
+from trains.serializers import TrainStationSerialzer
+from utils.renderers import FastJSONRenderer, compress, orjson, stream_json_array
+
+
+class Command(BaseCommand):
+    """
+    Compare the stock JSONRenderer with FastJSONRenderer and the streamed
+    list path on real TrainStation rows: wall time and peak Python memory
+    (tracemalloc) for serializing and encoding --rows stops.
+
+    Needs at least --rows active stops (see generate_network).
+
+    Usage:
+        python manage.py benchmark_rendering --rows 100000 --gzip
+    """
+    help = 'Benchmark JSON rendering of large TrainStation lists.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000)
+        parser.add_argument('--chunk-size', type=int, default=settings.STREAMING['CHUNK_SIZE'])
+        parser.add_argument('--gzip', action='store_true', help='Also gzip the streamed output.')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        queryset = TrainStation.objects.active().select_related('train', 'station').order_by('pk')[:rows]
+        available = queryset.count()
+        if available < rows:
+            raise CommandError(f"Only {available} active stops; run generate_network first or lower --rows.")
+        chunk_size = options['chunk_size']
+
+        def buffered(renderer):
+            def run():
+                # .all() clones the queryset so every run pays for the query.
+                data = TrainStationSerialzer(queryset.all(), many=True).data
+                return len(renderer.render(data))
+            return run
+
+        def streamed():
+            body = stream_json_array(queryset.iterator(chunk_size=chunk_size),
+                                     lambda batch: TrainStationSerialzer(batch, many=True).data, chunk_size)
+            return sum(len(chunk) for chunk in compress(body, 'gzip' if options['gzip'] else None))
+
+        cases = [
+            ('JSONRenderer (stock)', buffered(JSONRenderer())),
+            (f"FastJSONRenderer ({'orjson' if orjson else 'stdlib fallback'})", buffered(FastJSONRenderer())),
+            (f"Streamed, chunk {chunk_size}{' + gzip' if options['gzip'] else ''}", streamed),
+        ]
+        self.stdout.write(f"{'case':<40} {'seconds':>8} {'peak MiB':>9} {'bytes':>12}")
+        for name, run in cases:
+            gc.collect()
+            started = time.perf_counter()
+            size = run()
+            elapsed = time.perf_counter() - started
+            gc.collect()
+            tracemalloc.start()
+            run()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            self.stdout.write(f"{name:<40} {elapsed:>8.2f} {peak / 2 ** 20:>9.1f} {size:>12}")
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from trains.timetable_image import build_image
+
+
+class Command(BaseCommand):
+    """
+    Write the mmap-shared timetable image of active stations, trains and
+    stops. Workers pick up the new file on their next check; afterwards the
+    outbox relay keeps it current.
+
+    Usage:
+        python manage.py build_timetable_image
+        python manage.py build_timetable_image --path /srv/ticketbooking/timetable.img
+    """
+    help = 'Build the binary timetable image shared by workers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default=settings.TIMETABLE_IMAGE['PATH'])
+
+    def handle(self, *args, **options):
+        counts = build_image(options['path'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {counts['stations']} stations, {counts['trains']} trains and "
+            f"{counts['stops']} stops to {options['path']}"))
@@ -0,0 +1,218 @@
+import random
+import time
+from datetime import time as dt_time
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+from accounts.models import Role
+from trains.departure_board import invalidate_stations
+from trains.models import MINUTES_PER_DAY, Station, Train, TrainStation
+from trains.segments import invalidate_profiles
+from trains.timetable_image import mark_changed
+
+PLACE_PREFIXES = ['North', 'South', 'East', 'West', 'New', 'Old', 'Upper', 'Lower', 'Port', 'Fort']
+PLACE_ROOTS = ['Salem', 'Erode', 'Madurai', 'Tiruppur', 'Karur', 'Vellore', 'Hosur', 'Arakkonam',
+               'Tambaram', 'Katpadi', 'Jolarpet', 'Dindigul', 'Trichy', 'Nagpur', 'Itarsi', 'Bhopal']
+PLACE_SUFFIXES = ['Junction', 'Central', 'Cantonment', 'Town', 'Halt', 'Road', 'Terminus', 'Nagar']
+TRAIN_KINDS = ['Express', 'Mail', 'Superfast', 'Passenger', 'Intercity', 'Shatabdi', 'Duronto']
+
+
+def alpha_code(index, width=4):
+    """
+    Encode index as fixed-width uppercase letters (0 -> 'AAAA').
+    """
+    letters = []
+    for _ in range(width):
+        index, remainder = divmod(index, 26)
+        letters.append(chr(ord('A') + remainder))
+    return ''.join(reversed(letters))
+
+
+def minutes_to_time(minutes):
+    return dt_time(minutes // 60, minutes % 60)
+
+
+class Command(BaseCommand):
+    """
+    Generate a synthetic, deterministic railway network for capacity testing.
+
+    Creates stations, trains (from_station/to_station set to the first and
+    last stop), ordered TrainStation stops with strictly increasing
+    arrival/departure times within the day, and passenger users. Stations,
+    trains and users are written with chunked bulk_create; stops, which
+    dominate row count, go through chunked executemany with values adapted
+    once up front, since per-field model preparation in bulk_create costs
+    more than the insert itself. That path skips the change outbox, so once
+    the stops are in, the timetable image is marked stale and the boards and
+    route profiles of the new stations and trains are invalidated directly.
+    The same --seed always yields the same network.
+
+    Usage:
+        python manage.py generate_network --stations 5000 --trains 25000 --min-stops 20 --max-stops 60
+    """
+    help = 'Generate a deterministic synthetic network (stations, trains, stops, users).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--stations', type=int, default=2000)
+        parser.add_argument('--trains', type=int, default=5000)
+        parser.add_argument('--min-stops', type=int, default=10)
+        parser.add_argument('--max-stops', type=int, default=40)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help='Rows per bulk_create call and per transaction.')
+
+    def handle(self, *args, **options):
+        if options['min_stops'] < 2 or options['max_stops'] < options['min_stops']:
+            raise CommandError('Need 2 <= --min-stops <= --max-stops.')
+        if options['max_stops'] > options['stations']:
+            raise CommandError('--max-stops cannot exceed --stations.')
+        if options['trains'] > 90000:
+            raise CommandError('At most 90000 trains fit in the 5-digit train number space.')
+        self.rng = random.Random(options['seed'])
+        self.chunk_size = options['chunk_size']
+        started = time.perf_counter()
+        try:
+            station_ids = self._create_stations(options['stations'])
+            stop_count = self._create_trains_and_stops(station_ids, options['trains'],
+                                                       options['min_stops'], options['max_stops'])
+            self._create_users(options['users'])
+        except IntegrityError as e:
+            raise CommandError(f"Generated rows collide with existing data ({e}); "
+                               f"run against an empty database or change --seed.")
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {len(station_ids)} stations, {options['trains']} trains, {stop_count} stops "
+            f"and {options['users']} users in {time.perf_counter() - started:.1f}s"))
+
+    def _bulk_create(self, model, rows):
+        """
+        Insert rows in chunk_size slices, one transaction per slice.
+        """
+        for start in range(0, len(rows), self.chunk_size):
+            with transaction.atomic():
+                model.objects.bulk_create(rows[start:start + self.chunk_size], batch_size=self.chunk_size)
+
+    def _create_stations(self, count):
+        rng = self.rng
+        stations = [
+            Station(code=f"X{alpha_code(i)}",
+                    name=f"{rng.choice(PLACE_PREFIXES)} {rng.choice(PLACE_ROOTS)} "
+                         f"{rng.choice(PLACE_SUFFIXES)} {alpha_code(i)}")
+            for i in range(count)
+        ]
+        self._bulk_create(Station, stations)
+        codes = [station.code for station in stations]
+        ids_by_code = dict(Station.objects.filter(code__in=codes).values_list('code', 'id'))
+        self.stdout.write(f"  stations: {count}")
+        return [ids_by_code[code] for code in codes]
+
+    def _plan_route(self, station_ids, stop_count):
+        """
+        Pick distinct stations and strictly increasing times that fit in one day.
+        """
+        rng = self.rng
+        stops = rng.sample(station_ids, stop_count)
+        legs = [rng.randint(10, 90) for _ in range(stop_count - 1)]
+        halts = [rng.randint(1, 10) for _ in range(stop_count)]
+        total = sum(legs) + sum(halts)
+        if total >= MINUTES_PER_DAY:
+            scale = (MINUTES_PER_DAY - 2 * stop_count) / total
+            legs = [max(1, int(leg * scale)) for leg in legs]
+            halts = [1] * stop_count
+            total = sum(legs) + sum(halts)
+        clock = rng.randint(0, MINUTES_PER_DAY - 1 - total)
+        route = []
+        for index, station_id in enumerate(stops):
+            arrival = clock
+            departure = arrival + halts[index]
+            route.append((station_id, arrival, departure))
+            if index < len(legs):
+                clock = departure + legs[index]
+        return route
+
+    def _create_trains_and_stops(self, station_ids, count, min_stops, max_stops):
+        rng = self.rng
+        numbers = rng.sample(range(10000, 100000), count)
+        routes = [self._plan_route(station_ids, rng.randint(min_stops, max_stops)) for _ in range(count)]
+        trains = [
+            Train(number=str(numbers[i]),
+                  name=f"{rng.choice(PLACE_ROOTS)} {rng.choice(TRAIN_KINDS)} {alpha_code(i)}",
+                  from_station_id=route[0][0],
+                  to_station_id=route[-1][0],
+                  compartments=rng.randint(5, 20),
+                  seats_per_compartment=rng.choice([64, 72, 80]))
+            for i, route in enumerate(routes)
+        ]
+        self._bulk_create(Train, trains)
+        ids_by_number = dict(Train.objects.filter(number__in=[str(n) for n in numbers])
+                             .values_list('number', 'id'))
+        self.stdout.write(f"  trains: {count}")
+
+        total = 0
+        pending = []
+        for number, route in zip(numbers, routes):
+            train_id = ids_by_number[str(number)]
+            for stop_number, (station_id, arrival, departure) in enumerate(route, start=1):
+                pending.append((train_id, station_id, arrival, departure, stop_number))
+            if len(pending) >= self.chunk_size:
+                self._insert_stops(pending)
+                total += len(pending)
+                pending = []
+        self._insert_stops(pending)
+        total += len(pending)
+        self._announce_stops(station_ids, ids_by_number.values())
+        self.stdout.write(f"  stops: {total}")
+        return total
+
+    def _announce_stops(self, station_ids, train_ids):
+        """
+        Do what the outbox relay would have done for the stops _insert_stops
+        wrote: mark the timetable image stale and drop cached boards and
+        route profiles.
+        """
+        mark_changed()
+        invalidate_stations(station_ids)
+        invalidate_profiles(train_ids)
+
+    def _insert_stops(self, rows):
+        """
+        Insert (train_id, station_id, arrival_min, departure_min, stop_number)
+        rows into TrainStation in one executemany per chunk.
+        """
+        if not rows:
+            return
+        if not hasattr(self, '_stop_insert_sql'):
+            meta = TrainStation._meta
+            fields = ['train', 'station', 'arrival_time', 'departure_time', 'arrival_day', 'departure_day',
+                      'stop_number', 'is_active', 'created_at', 'updated_at']
+            columns = ', '.join(connection.ops.quote_name(meta.get_field(f).column) for f in fields)
+            self._stop_insert_sql = (f"INSERT INTO {connection.ops.quote_name(meta.db_table)} "
+                                     f"({columns}) VALUES ({', '.join(['%s'] * len(fields))})")
+            self._time_values = [connection.ops.adapt_timefield_value(minutes_to_time(m))
+                                 for m in range(MINUTES_PER_DAY)]
+            self._now_value = connection.ops.adapt_datetimefield_value(timezone.now())
+            self._true_value = TrainStation._meta.get_field('is_active').get_db_prep_save(True, connection)
+        times, now, true = self._time_values, self._now_value, self._true_value
+        # Generated routes fit in one day, so every stop is on day 0.
+        params = [(train_id, station_id, times[arrival], times[departure], 0, 0, stop_number, true, now, now)
+                  for train_id, station_id, arrival, departure, stop_number in rows]
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(self._stop_insert_sql, params)
+
+    def _create_users(self, count):
+        if not count:
+            return
+        User = get_user_model()
+        role, _ = Role.objects.get_or_create(name=Role.PASSENGER)
+        # One hash shared by every generated user: hashing per row would dominate runtime.
+        password = make_password('loadtest123')
+        users = [
+            User(username=f"loaduser{i}", email=f"loaduser{i}@example.com",
+                 mobile_number=f"6{i:09d}", first_name='Load', last_name=f"User{i}",
+                 role=role, password=password)
+            for i in range(count)
+        ]
+        self._bulk_create(User, users)
+        self.stdout.write(f"  users: {count}")
@@ -0,0 +1,32 @@
+from datetime import date
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from trains.scheduling import materialize_runs
+
+
+class Command(BaseCommand):
+    """
+    Materialise dated train runs from service calendars. Safe to re-run;
+    schedule it daily so the horizon always extends TRAIN_RUN_HORIZON_DAYS ahead.
+
+    Usage:
+        python manage.py generate_runs --days 60
+        python manage.py generate_runs --start 2025-08-01 --days 7
+    """
+    help = 'Upsert TrainRun rows for the next N days from service calendars.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.TRAIN_RUN_HORIZON_DAYS)
+        parser.add_argument('--start', help='First date (YYYY-MM-DD). Defaults to today.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        start = None
+        if options['start']:
+            try:
+                start = date.fromisoformat(options['start'])
+            except ValueError:
+                raise CommandError('--start must be YYYY-MM-DD.')
+        result = materialize_runs(options['days'], start=start, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Upserted {result['upserted']} runs, cancelled {result['cancelled']}."))
@@ -0,0 +1,50 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from trains.outbox import compact, get_handlers, relay_batch
+from trains.timetable_image import refresh_image
+
+
+class Command(BaseCommand):
+    """
+    Deliver outbox change records to the configured handlers (cache
+    invalidation, derived indexes), rebuild the timetable image when it is
+    stale and compact delivered rows. Runs until interrupted; several
+    instances may run side by side. --once rebuilds a stale image right away.
+
+    Usage:
+        python manage.py relay_outbox
+        python manage.py relay_outbox --once
+    """
+    help = 'Relay transactional outbox events to cache/index handlers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Drain the outbox, compact it and exit.')
+        parser.add_argument('--batch-size', type=int, default=settings.OUTBOX['BATCH_SIZE'])
+        parser.add_argument('--poll-seconds', type=float, default=settings.OUTBOX['POLL_SECONDS'])
+
+    def handle(self, *args, **options):
+        handlers = get_handlers()
+        batch_size = options['batch_size']
+        compacted_at = time.monotonic()
+        delivered = 0
+        try:
+            while True:
+                processed = relay_batch(batch_size, handlers)
+                delivered += processed
+                if options['once'] and not processed:
+                    break
+                if not options['once']:
+                    refresh_image()
+                if time.monotonic() - compacted_at >= settings.OUTBOX['COMPACT_EVERY_SECONDS']:
+                    compact(batch_size=batch_size)
+                    compacted_at = time.monotonic()
+                if processed < batch_size and not options['once']:
+                    time.sleep(options['poll_seconds'])
+        except KeyboardInterrupt:
+            pass
+        if options['once']:
+            refresh_image(min_age=0)
+        removed = compact(batch_size=batch_size)
+        self.stdout.write(f"Delivered {delivered} events, compacted {removed}.")
@@ -0,0 +1,80 @@
+from django.apps import apps
+from django.db import models, transaction
+from django.utils import timezone
+
+
+def _record(model, rows):
+    apps.get_model('trains', 'OutboxEvent').record(model, rows)
+
+
+class SoftDeleteQuerySet(models.QuerySet):
+    """
+    QuerySet for models that are soft-deleted via `is_active` / `deleted_at`.
+
+    update(), delete() and bulk_create() write an outbox record for every
+    row they change, in the same transaction (see OutboxEvent), since none
+    of them go through Model.save() or signals. bulk_update() is recorded
+    by the update() it runs.
+    """
+
+    def active(self):
+        return self.filter(is_active=True)
+
+    def inactive(self):
+        return self.filter(is_active=False)
+
+    def soft_delete(self):
+        """
+        Mark every active row in the queryset deleted in one UPDATE.
+        Returns the number of rows affected.
+        """
+        now = timezone.now()
+        return self.filter(is_active=True).update(is_active=False, deleted_at=now, updated_at=now)
+
+    def restore(self):
+        """
+        Reactivate soft-deleted rows in one UPDATE.
+        """
+        return self.filter(is_active=False).update(is_active=True, deleted_at=None,
+                                                   updated_at=timezone.now())
+
+    def update(self, **kwargs):
+        if self.model.OUTBOX_ENTITY is None:
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db):
+            # Lock and read the matching rows first, then update exactly
+            # those, so the outbox covers every row the UPDATE touches.
+            rows = list(self.select_for_update(of=('self',)).values_list(*self.model.outbox_columns()))
+            if not rows:
+                return 0
+            changed = self.model._base_manager.using(self.db).filter(pk__in=[row[0] for row in rows])
+            count = changed.update(**kwargs)
+            if self._moves_rows(kwargs):
+                # A stop moved to another train or station changes both sides.
+                rows = set(rows) | set(changed.values_list(*self.model.outbox_columns()))
+            _record(self.model, rows)
+        return count
+
+    def _moves_rows(self, fields):
+        meta = self.model._meta
+        moved = {self.model.OUTBOX_TRAIN_FIELD, self.model.OUTBOX_STATION_FIELD} - {None, 'pk'}
+        return any(meta.get_field(name).attname in moved for name in fields)
+
+    def delete(self):
+        if self.model.OUTBOX_ENTITY is None:
+            return super().delete()
+        with transaction.atomic(using=self.db):
+            rows = list(self.values_list(*self.model.outbox_columns()))
+            result = super().delete()
+            _record(self.model, rows)
+        return result
+
+    def bulk_create(self, objs, *args, **kwargs):
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            _record(self.model, [row for obj in objs if obj.pk is not None for row in obj.outbox_rows()])
+        return objs
+
+
+
+SoftDeleteManager = models.Manager.from_queryset(SoftDeleteQuerySet)
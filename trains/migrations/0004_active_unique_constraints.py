@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:58
+
+import django.db.models.functions.text
+from collections import defaultdict
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def resolve_duplicates(apps, schema_editor):
+    # Stations and trains sharing a code or name up to case are referenced
+    # elsewhere and cannot be merged blindly: stop with the list instead of
+    # failing halfway through AddConstraint.
+    Station = apps.get_model('trains', 'Station')
+    Train = apps.get_model('trains', 'Train')
+    TrainStation = apps.get_model('trains', 'TrainStation')
+    conflicts = []
+    for model, field in ((Station, 'code'), (Station, 'name'), (Train, 'name')):
+        keys = sorted(model.objects.annotate(key=Lower(field)).values('key')
+                      .annotate(rows=Count('id')).filter(rows__gt=1).values_list('key', flat=True))
+        if keys:
+            conflicts.append(f"{model.__name__}.{field}: {', '.join(keys)}")
+    if conflicts:
+        raise RuntimeError("Rename these case-insensitive duplicates, then migrate again. "
+                           + '; '.join(conflicts))
+
+    # Active stops: keep the earliest stop per station on a train, deactivate
+    # the repeats and renumber the train's stops 1..n where numbers collide.
+    active = TrainStation.objects.filter(is_active=True)
+    trains = set(active.values('train_id', 'station_id').annotate(rows=Count('id'))
+                 .filter(rows__gt=1).values_list('train_id', flat=True))
+    trains |= set(active.values('train_id', 'stop_number').annotate(rows=Count('id'))
+                  .filter(rows__gt=1).values_list('train_id', flat=True))
+    stops_by_train = defaultdict(list)
+    for stop in active.filter(train_id__in=trains).order_by('train_id', 'stop_number', 'id'):
+        stops_by_train[stop.train_id].append(stop)
+    for stops in stops_by_train.values():
+        seen, number = set(), 0
+        for stop in stops:
+            if stop.station_id in seen:
+                stop.is_active = False
+            else:
+                seen.add(stop.station_id)
+                number += 1
+                stop.stop_number = number
+        TrainStation.objects.bulk_update(stops, ['is_active', 'stop_number'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trains', '0003_alter_trainstation_unique_together'),
+    ]
+
+    operations = [
+        migrations.RunPython(resolve_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='station',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('code'), name='unique_station_code_ci'),
+        ),
+        migrations.AddConstraint(
+            model_name='station',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('name'), name='unique_station_name_ci'),
+        ),
+        migrations.AddConstraint(
+            model_name='train',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('name'), name='unique_train_name_ci'),
+        ),
+        migrations.AddConstraint(
+            model_name='trainstation',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('train', 'station'), name='unique_active_train_station'),
+        ),
+        migrations.AddConstraint(
+            model_name='trainstation',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('train', 'stop_number'), name='unique_active_train_stop_number'),
+        ),
+    ]
@@ -0,0 +1,122 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:00
+
+from django.db import migrations, models
+
+
+def backfill_deleted_at(apps, schema_editor):
+    # Rows soft-deleted before deleted_at existed: their last update is the
+    # best record of when, and archival only picks rows with deleted_at set.
+    for model_name in ('Station', 'Train', 'TrainStation'):
+        model = apps.get_model('trains', model_name)
+        model.objects.filter(is_active=False, deleted_at__isnull=True).update(deleted_at=models.F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trains', '0004_active_unique_constraints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StationHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_id', models.BigIntegerField(unique=True)),
+                ('code', models.CharField(max_length=10)),
+                ('name', models.CharField(max_length=100)),
+                ('created_at', models.DateTimeField(null=True)),
+                ('updated_at', models.DateTimeField(null=True)),
+                ('deleted_at', models.DateTimeField(null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Station History',
+                'verbose_name_plural': 'Station History',
+                'db_table': 'station_history',
+            },
+        ),
+        migrations.CreateModel(
+            name='TrainHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_id', models.BigIntegerField(unique=True)),
+                ('number', models.CharField(db_index=True, max_length=10)),
+                ('name', models.CharField(max_length=100)),
+                ('from_station_id', models.BigIntegerField()),
+                ('to_station_id', models.BigIntegerField()),
+                ('compartments', models.PositiveIntegerField()),
+                ('seats_per_compartment', models.PositiveBigIntegerField()),
+                ('created_at', models.DateTimeField(null=True)),
+                ('updated_at', models.DateTimeField(null=True)),
+                ('deleted_at', models.DateTimeField(null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Train History',
+                'verbose_name_plural': 'Train History',
+                'db_table': 'train_history',
+            },
+        ),
+        migrations.CreateModel(
+            name='TrainStationHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_id', models.BigIntegerField(unique=True)),
+                ('train_id', models.BigIntegerField(db_index=True)),
+                ('station_id', models.BigIntegerField()),
+                ('arrival_time', models.TimeField()),
+                ('departure_time', models.TimeField()),
+                ('stop_number', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(null=True)),
+                ('updated_at', models.DateTimeField(null=True)),
+                ('deleted_at', models.DateTimeField(null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Train Station History',
+                'verbose_name_plural': 'Train Station History',
+                'db_table': 'train_station_history',
+            },
+        ),
+        migrations.AddField(
+            model_name='station',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='train',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='trainstation',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_deleted_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='station',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['name'], name='station_active_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='station',
+            index=models.Index(condition=models.Q(('is_active', False)), fields=['deleted_at'], name='station_archivable_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='train',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['from_station', 'to_station'], name='train_active_route_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='train',
+            index=models.Index(condition=models.Q(('is_active', False)), fields=['deleted_at'], name='train_archivable_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trainstation',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['station'], name='train_station_active_stn_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trainstation',
+            index=models.Index(condition=models.Q(('is_active', False)), fields=['deleted_at'], name='train_station_archivable_idx'),
+        ),
+    ]
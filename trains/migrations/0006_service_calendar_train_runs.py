@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trains', '0005_soft_delete_archival'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ServiceCalendar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekdays', models.PositiveSmallIntegerField(default=127)),
+                ('valid_from', models.DateField()),
+                ('valid_to', models.DateField(blank=True, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('train', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='calendars', to='trains.train')),
+            ],
+            options={
+                'verbose_name': 'Service Calendar',
+                'verbose_name_plural': 'Service Calendars',
+                'db_table': 'service_calendar',
+            },
+        ),
+        migrations.CreateModel(
+            name='ServiceException',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('exception_type', models.CharField(choices=[('added', 'Added'), ('removed', 'Removed')], max_length=10)),
+                ('calendar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exceptions', to='trains.servicecalendar')),
+            ],
+            options={
+                'verbose_name': 'Service Exception',
+                'verbose_name_plural': 'Service Exceptions',
+                'db_table': 'service_exception',
+                'constraints': [models.UniqueConstraint(fields=('calendar', 'date'), name='unique_calendar_exception_date')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TrainRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run_date', models.DateField()),
+                ('departure_time', models.TimeField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('scheduled', 'Scheduled'), ('cancelled', 'Cancelled')], default='scheduled', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('from_station', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='originating_runs', to='trains.station')),
+                ('train', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='runs', to='trains.train')),
+            ],
+            options={
+                'verbose_name': 'Train Run',
+                'verbose_name_plural': 'Train Runs',
+                'db_table': 'train_run',
+                'ordering': ['run_date', 'departure_time'],
+                'indexes': [models.Index(fields=['run_date', 'from_station', 'status', 'train', 'departure_time'], name='train_run_date_origin_idx')],
+                'constraints': [models.UniqueConstraint(fields=('run_date', 'train'), name='unique_train_run_date')],
+            },
+        ),
+    ]
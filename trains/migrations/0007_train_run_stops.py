@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trains', '0006_service_calendar_train_runs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trainrun',
+            name='reported_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='trainrun',
+            name='reported_stop_number',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='TrainRunStop',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stop_number', models.PositiveIntegerField()),
+                ('scheduled_arrival', models.DateTimeField()),
+                ('scheduled_departure', models.DateTimeField()),
+                ('arrival_delay', models.IntegerField(default=0)),
+                ('departure_delay', models.IntegerField(default=0)),
+                ('expected_arrival', models.DateTimeField()),
+                ('expected_departure', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stops', to='trains.trainrun')),
+                ('station', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='run_stops', to='trains.station')),
+            ],
+            options={
+                'verbose_name': 'Train Run Stop',
+                'verbose_name_plural': 'Train Run Stops',
+                'db_table': 'train_run_stop',
+                'ordering': ['run', 'stop_number'],
+                'constraints': [models.UniqueConstraint(fields=('run', 'stop_number'), name='unique_run_stop_number'), models.UniqueConstraint(fields=('run', 'station'), name='unique_run_station')],
+            },
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Standard layouts: one character per seat (see CoachLayout.BERTH_TYPES).
+DEFAULT_LAYOUTS = [
+    ('SL', 'Sleeper', 'SL', 'LMULMUST' * 9),
+    ('3A', 'AC 3 Tier', '3A', 'LMULMUST' * 9),
+    ('2A', 'AC 2 Tier', '2A', 'LULUST' * 8),
+    ('1A', 'AC First Class', '1A', 'LU' * 12),
+    ('CC', 'AC Chair Car', 'CC', 'WCAAW' * 15),
+    ('2S', 'Second Sitting', '2S', 'WCAACW' * 18),
+]
+
+
+def create_default_layouts(apps, schema_editor):
+    CoachLayout = apps.get_model('trains', 'CoachLayout')
+    for code, name, travel_class, berths in DEFAULT_LAYOUTS:
+        CoachLayout.objects.get_or_create(code=code, defaults={
+            'name': name, 'travel_class': travel_class, 'berths': berths})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trains', '0008_outbox_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoachLayout',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=10, unique=True)),
+                ('name', models.CharField(max_length=50)),
+                ('travel_class', models.CharField(choices=[('SL', 'Sleeper'), ('3A', 'AC 3 Tier'), ('2A', 'AC 2 Tier'), ('1A', 'AC First Class'), ('CC', 'AC Chair Car'), ('2S', 'Second Sitting')], max_length=2)),
+                ('berths', models.CharField(max_length=200)),
+            ],
+            options={
+                'verbose_name': 'Coach Layout',
+                'verbose_name_plural': 'Coach Layouts',
+                'db_table': 'coach_layout',
+            },
+        ),
+        migrations.AddField(
+            model_name='train',
+            name='seat_count',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='TrainCoach',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('label', models.CharField(max_length=5)),
+                ('layout', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='coaches', to='trains.coachlayout')),
+                ('train', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='coaches', to='trains.train')),
+            ],
+            options={
+                'verbose_name': 'Train Coach',
+                'verbose_name_plural': 'Train Coaches',
+                'db_table': 'train_coach',
+                'ordering': ['position'],
+                'constraints': [models.UniqueConstraint(fields=('train', 'position'), name='unique_train_coach_position'), models.UniqueConstraint(fields=('train', 'label'), name='unique_train_coach_label')],
+            },
+        ),
+        migrations.RunPython(create_default_layouts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:47
+
+from django.db import migrations, models
+
+
+def infer_day_offsets(apps, schema_editor):
+    # Existing routes rolled over midnight implicitly: a time earlier than
+    # the one before it started a new day (as delays.build_run_stops did).
+    TrainStation = apps.get_model('trains', 'TrainStation')
+    stops = (TrainStation.objects.filter(is_active=True).order_by('train_id', 'stop_number')
+             .only('pk', 'train_id', 'arrival_time', 'departure_time'))
+    changed, train_id, day, previous = [], None, 0, None
+    for stop in stops.iterator(chunk_size=2000):
+        if stop.train_id != train_id:
+            train_id, day, previous = stop.train_id, 0, None
+        if previous is not None and stop.arrival_time < previous:
+            day += 1
+        stop.arrival_day = day
+        if stop.departure_time < stop.arrival_time:
+            day += 1
+        stop.departure_day = day
+        previous = stop.departure_time
+        if stop.arrival_day or stop.departure_day:
+            changed.append(stop)
+    TrainStation.objects.bulk_update(changed, ['arrival_day', 'departure_day'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trains', '0009_coach_composition'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trainstation',
+            name='arrival_day',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='trainstation',
+            name='departure_day',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='trainstationhistory',
+            name='arrival_day',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='trainstationhistory',
+            name='departure_day',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(infer_day_offsets, migrations.RunPython.noop),
+    ]
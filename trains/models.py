@@ -1,7 +1,78 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+from .managers import SoftDeleteManager
 import random
 
-class Station(models.Model):
+# Added then subtracted when shifting stop numbers, so no intermediate row
+# collides with the active (train, stop_number) unique index.
+STOP_NUMBER_SHIFT_OFFSET = 1000000
+
+MINUTES_PER_DAY = 24 * 60
+# Longest journey accepted, in midnights after the origin's departure.
+MAX_JOURNEY_DAYS = 7
+
+class SoftDeleteModel(models.Model):
+    """
+    Abstract base for rows that are soft-deleted rather than removed.
+
+    Fields:
+        is_active (bool): False once the row has been deleted.
+        deleted_at (datetime): When the row was soft-deleted; drives archival
+            of old inactive rows into the *_history tables.
+    """
+    is_active = models.BooleanField(default=True)
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    objects = SoftDeleteManager()
+
+    # Models whose changes go to the outbox name the entity and the
+    # attributes holding the affected train and station ids.
+    OUTBOX_ENTITY = None
+    OUTBOX_TRAIN_FIELD = None
+    OUTBOX_STATION_FIELD = None
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def outbox_columns(cls):
+        """
+        values_list() arguments giving (id, train id, station id) per row.
+        """
+        null = models.Value(None, output_field=models.BigIntegerField())
+        return ['pk', cls.OUTBOX_TRAIN_FIELD or null, cls.OUTBOX_STATION_FIELD or null]
+
+    def outbox_rows(self):
+        """
+        (id, train id, station id) tuples describing a change to this row.
+        """
+        return [(self.pk,
+                 getattr(self, self.OUTBOX_TRAIN_FIELD) if self.OUTBOX_TRAIN_FIELD else None,
+                 getattr(self, self.OUTBOX_STATION_FIELD) if self.OUTBOX_STATION_FIELD else None)]
+
+    def save(self, *args, **kwargs):
+        # The row and its outbox record commit together.
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+            OutboxEvent.record(type(self), self.outbox_rows())
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            rows = self.outbox_rows()
+            result = super().delete(*args, **kwargs)
+            OutboxEvent.record(type(self), rows)
+        return result
+
+    def soft_delete(self):
+        """
+        Mark this row inactive and stamp deleted_at.
+        """
+        self.is_active = False
+        self.deleted_at = timezone.now()
+        self.save(update_fields=['is_active', 'deleted_at', 'updated_at'])
+
+class Station(SoftDeleteModel):
     """
     Represents a railway station with a unique code and name.
 
@@ -15,10 +86,12 @@ class Station(models.Model):
 
     code = models.CharField(max_length= 10, unique=True)
     name = models.CharField(max_length=100, unique=True)
-    is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    OUTBOX_ENTITY = 'station'
+    OUTBOX_STATION_FIELD = 'pk'
+
     def __str__(self):
         return f"{self.code} - {self.name}"
     
@@ -26,8 +99,18 @@ class Station(models.Model):
         db_table = 'station'
         verbose_name = 'Station'
         verbose_name_plural = 'Stations'
+        constraints = [
+            models.UniqueConstraint(Lower('code'), name='unique_station_code_ci'),
+            models.UniqueConstraint(Lower('name'), name='unique_station_name_ci'),
+        ]
+        indexes = [
+            models.Index(fields=['name'], condition=models.Q(is_active=True),
+                         name='station_active_name_idx'),
+            models.Index(fields=['deleted_at'], condition=models.Q(is_active=False),
+                         name='station_archivable_idx'),
+        ]
     
-class Train(models.Model):
+class Train(SoftDeleteModel):
     """
     Represents a train available for reservation.
 
@@ -41,7 +124,8 @@ class Train(models.Model):
         updated_at (datetime): Timestamp when the train was last updated.
 
     Properties:
-        total_seats (int): Total seats = compartments * seats_per_compartment.
+        total_seats (int): Seats in the coach composition, or
+            compartments * seats_per_compartment for trains without one.
     """
 
     number = models.CharField(max_length=10, unique=True)
@@ -50,18 +134,34 @@ class Train(models.Model):
     to_station = models.ForeignKey(Station, on_delete=models.CASCADE, related_name='arriving_trains')
     compartments = models.PositiveIntegerField(default=5)
     seats_per_compartment = models.PositiveBigIntegerField(default=5)
-    is_active = models.BooleanField(default=True)
+    # Seats in the coach composition (TrainCoach), kept by trains.seatmap;
+    # null while the train has no composition.
+    seat_count = models.PositiveIntegerField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    OUTBOX_ENTITY = 'train'
+    OUTBOX_TRAIN_FIELD = 'pk'
+
     @property
     def total_seats(self):
+        if self.seat_count is not None:
+            return self.seat_count
         return self.compartments * self.seats_per_compartment
     
     class Meta:
         db_table = 'train'
         verbose_name = 'Train'
         verbose_name_plural = 'Trains'
+        constraints = [
+            models.UniqueConstraint(Lower('name'), name='unique_train_name_ci'),
+        ]
+        indexes = [
+            models.Index(fields=['from_station', 'to_station'], condition=models.Q(is_active=True),
+                         name='train_active_route_idx'),
+            models.Index(fields=['deleted_at'], condition=models.Q(is_active=False),
+                         name='train_archivable_idx'),
+        ]
     
     def generate_train_number(self):
         while True:
@@ -77,23 +177,434 @@ class Train(models.Model):
     def __str__(self):
         return f"{self.number} - {self.name}"
     
-class TrainStation(models.Model):
+class TrainStation(SoftDeleteModel):
+    """
+    A stop on a train's route.
+
+    Among active rows a train visits each station once and each stop_number
+    is used once; both are enforced by partial unique indexes rather than
+    pre-queries.
+
+    arrival_day / departure_day count the midnights since the train left its
+    origin (0 on the first day), so a route may run over several days.
+    """
     train = models.ForeignKey(Train, on_delete=models.CASCADE, 
                               related_name='train_stations')
     station = models.ForeignKey(Station, on_delete=models.CASCADE)
     arrival_time = models.TimeField()
     departure_time = models.TimeField()
+    arrival_day = models.PositiveSmallIntegerField(default=0)
+    departure_day = models.PositiveSmallIntegerField(default=0)
     stop_number = models.PositiveIntegerField()
-    is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    OUTBOX_ENTITY = 'stop'
+    OUTBOX_TRAIN_FIELD = 'train_id'
+    OUTBOX_STATION_FIELD = 'station_id'
+
     class Meta:
         ordering = ['stop_number']
         db_table = 'train_station'
         verbose_name = 'Train Station'
         verbose_name_plural = 'Train Stations'
+        constraints = [
+            models.UniqueConstraint(fields=['train', 'station'], condition=models.Q(is_active=True),
+                                    name='unique_active_train_station'),
+            models.UniqueConstraint(fields=['train', 'stop_number'], condition=models.Q(is_active=True),
+                                    name='unique_active_train_stop_number'),
+        ]
+        indexes = [
+            models.Index(fields=['station'], condition=models.Q(is_active=True),
+                         name='train_station_active_stn_idx'),
+            models.Index(fields=['deleted_at'], condition=models.Q(is_active=False),
+                         name='train_station_archivable_idx'),
+        ]
 
     def __str__(self):
         return f"{self.train.number} - {self.station.code} - {self.stop_number}"
-    
\ No newline at end of file
+
+    @staticmethod
+    def journey_minutes(day, value):
+        """
+        Minutes from midnight of the origin's departure day to `value` on day `day`.
+        """
+        return day * MINUTES_PER_DAY + value.hour * 60 + value.minute
+
+    @property
+    def arrival_minutes(self):
+        return self.journey_minutes(self.arrival_day, self.arrival_time)
+
+    @property
+    def departure_minutes(self):
+        return self.journey_minutes(self.departure_day, self.departure_time)
+
+    def outbox_rows(self):
+        rows = super().outbox_rows()
+        # Set by the pre_save signal: a stop moved to another station changes both.
+        previous = getattr(self, '_previous_station_id', None)
+        if previous is not None and previous != self.station_id:
+            rows.append((self.pk, self.train_id, previous))
+        return rows
+
+    @classmethod
+    def shift_stop_numbers(cls, train, from_stop_number, delta):
+        """
+        Add delta to stop_number of every active stop at or after
+        from_stop_number. Done in two set-based updates via a large offset so
+        the unique (train, stop_number) index never sees a transient duplicate.
+        """
+        stops = cls.objects.filter(train=train, is_active=True, stop_number__gte=from_stop_number)
+        stops.update(stop_number=models.F('stop_number') + STOP_NUMBER_SHIFT_OFFSET)
+        cls.objects.filter(train=train, is_active=True, stop_number__gte=STOP_NUMBER_SHIFT_OFFSET).update(
+            stop_number=models.F('stop_number') - STOP_NUMBER_SHIFT_OFFSET + delta
+        )
+
+
+class CoachLayout(models.Model):
+    """
+    Seat layout template for a type of coach.
+
+    Fields:
+        code (str): Short code used in compositions (e.g. 'SL', '3A', 'CC').
+        travel_class (str): Class of travel sold in this coach.
+        berths (str): One character per seat, in seat-number order, giving
+            its berth or seat type (see BERTH_TYPES). The seat count is its length.
+    """
+    SLEEPER, AC_THREE_TIER, AC_TWO_TIER, AC_FIRST, CHAIR_CAR, SECOND_SITTING = 'SL', '3A', '2A', '1A', 'CC', '2S'
+    CLASS_CHOICES = [
+        (SLEEPER, 'Sleeper'),
+        (AC_THREE_TIER, 'AC 3 Tier'),
+        (AC_TWO_TIER, 'AC 2 Tier'),
+        (AC_FIRST, 'AC First Class'),
+        (CHAIR_CAR, 'AC Chair Car'),
+        (SECOND_SITTING, 'Second Sitting'),
+    ]
+    BERTH_TYPES = {
+        'L': 'lower', 'M': 'middle', 'U': 'upper', 'S': 'side_lower', 'T': 'side_upper',
+        'W': 'window', 'C': 'centre', 'A': 'aisle',
+    }
+    code = models.CharField(max_length=10, unique=True)
+    name = models.CharField(max_length=50)
+    travel_class = models.CharField(max_length=2, choices=CLASS_CHOICES)
+    berths = models.CharField(max_length=200)
+
+    class Meta:
+        db_table = 'coach_layout'
+        verbose_name = 'Coach Layout'
+        verbose_name_plural = 'Coach Layouts'
+
+    @property
+    def seats(self):
+        return len(self.berths)
+
+    def __str__(self):
+        return f"{self.code} ({self.seats} seats)"
+
+
+class TrainCoach(models.Model):
+    """
+    One coach in a train's composition, in rake order.
+    """
+    train = models.ForeignKey(Train, on_delete=models.CASCADE, related_name='coaches')
+    position = models.PositiveIntegerField()
+    label = models.CharField(max_length=5)
+    layout = models.ForeignKey(CoachLayout, on_delete=models.PROTECT, related_name='coaches')
+
+    class Meta:
+        ordering = ['position']
+        db_table = 'train_coach'
+        verbose_name = 'Train Coach'
+        verbose_name_plural = 'Train Coaches'
+        constraints = [
+            models.UniqueConstraint(fields=['train', 'position'], name='unique_train_coach_position'),
+            models.UniqueConstraint(fields=['train', 'label'], name='unique_train_coach_label'),
+        ]
+
+    def __str__(self):
+        return f"{self.train_id} - {self.label}"
+
+
+class ServiceCalendar(models.Model):
+    """
+    Which days a train runs: a weekday pattern over a validity range, adjusted
+    by dated ServiceException rows.
+
+    Fields:
+        train (Train): The train this calendar applies to (a train may have
+            several, e.g. one per season).
+        weekdays (int): Bitmask of running days, bit 0 = Monday .. bit 6 = Sunday.
+        valid_from (date): First date the pattern applies.
+        valid_to (date): Last date the pattern applies (open-ended if null).
+    """
+    WEEKDAY_NAMES = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+    ALL_DAYS = 0b1111111
+
+    train = models.ForeignKey(Train, on_delete=models.CASCADE, related_name='calendars')
+    weekdays = models.PositiveSmallIntegerField(default=ALL_DAYS)
+    valid_from = models.DateField()
+    valid_to = models.DateField(null=True, blank=True)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'service_calendar'
+        verbose_name = 'Service Calendar'
+        verbose_name_plural = 'Service Calendars'
+
+    def __str__(self):
+        return f"{self.train.number} - {self.weekdays:07b} from {self.valid_from}"
+
+    def runs_on(self, day, exceptions=None):
+        """
+        True if the train runs on `day`. `exceptions` maps date -> exception
+        type; pass it pre-fetched to avoid a query per day.
+        """
+        if exceptions is None:
+            exceptions = dict(self.exceptions.values_list('date', 'exception_type'))
+        override = exceptions.get(day)
+        if override is not None:
+            return override == ServiceException.ADDED
+        if day < self.valid_from or (self.valid_to and day > self.valid_to):
+            return False
+        return bool(self.weekdays & (1 << day.weekday()))
+
+
+class ServiceException(models.Model):
+    """
+    A one-off change to a ServiceCalendar: an extra running day (ADDED) or a
+    cancelled one (REMOVED).
+    """
+    ADDED = 'added'
+    REMOVED = 'removed'
+    EXCEPTION_CHOICES = [
+        (ADDED, 'Added'),
+        (REMOVED, 'Removed'),
+    ]
+    calendar = models.ForeignKey(ServiceCalendar, on_delete=models.CASCADE, related_name='exceptions')
+    date = models.DateField()
+    exception_type = models.CharField(max_length=10, choices=EXCEPTION_CHOICES)
+
+    class Meta:
+        db_table = 'service_exception'
+        verbose_name = 'Service Exception'
+        verbose_name_plural = 'Service Exceptions'
+        constraints = [
+            models.UniqueConstraint(fields=['calendar', 'date'], name='unique_calendar_exception_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.calendar_id} - {self.date} ({self.exception_type})"
+
+
+class TrainRun(models.Model):
+    """
+    A dated departure of a train, materialised ahead of time from its service
+    calendars so booking and inventory never expand calendars per request.
+
+    Fields:
+        train (Train): The train running.
+        run_date (date): Date the train leaves its origin.
+        from_station (Station): Origin at materialisation time (denormalised).
+        departure_time (time): Origin departure time (denormalised).
+        status (str): 'scheduled' or 'cancelled'.
+        reported_stop_number (int): Furthest stop a running-status report has
+            been received for; reports for earlier stops are stale.
+        reported_at (datetime): When that report was ingested.
+    """
+    SCHEDULED = 'scheduled'
+    CANCELLED = 'cancelled'
+    STATUS_CHOICES = [
+        (SCHEDULED, 'Scheduled'),
+        (CANCELLED, 'Cancelled'),
+    ]
+    train = models.ForeignKey(Train, on_delete=models.CASCADE, related_name='runs')
+    run_date = models.DateField()
+    from_station = models.ForeignKey(Station, on_delete=models.CASCADE, related_name='originating_runs')
+    departure_time = models.TimeField(null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=SCHEDULED)
+    reported_stop_number = models.PositiveIntegerField(null=True, blank=True)
+    reported_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['run_date', 'departure_time']
+        db_table = 'train_run'
+        verbose_name = 'Train Run'
+        verbose_name_plural = 'Train Runs'
+        constraints = [
+            # run_date first: also serves "runs on date D" lookups joined by train.
+            models.UniqueConstraint(fields=['run_date', 'train'], name='unique_train_run_date'),
+        ]
+        indexes = [
+            # Covers "runs on date D from origin S" without touching the table.
+            models.Index(fields=['run_date', 'from_station', 'status', 'train', 'departure_time'],
+                         name='train_run_date_origin_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.train.number} on {self.run_date} ({self.status})"
+
+
+class TrainRunStop(models.Model):
+    """
+    Running status of one stop of a dated run: the timetable projected onto
+    the run date plus the current delays and expected times, kept up to date
+    by trains/delays.py so reads need no recomputation.
+
+    Fields:
+        run (TrainRun): The dated run.
+        station (Station): Station of the stop.
+        stop_number (int): Position on the route when the run stops were created.
+        scheduled_arrival / scheduled_departure (datetime): Timetable times on
+            the run date, rolled over midnight where the route crosses it.
+        arrival_delay / departure_delay (int): Current delay in minutes
+            (negative arrival delay = running early).
+        expected_arrival / expected_departure (datetime): Scheduled time plus delay.
+    """
+    run = models.ForeignKey(TrainRun, on_delete=models.CASCADE, related_name='stops')
+    station = models.ForeignKey(Station, on_delete=models.CASCADE, related_name='run_stops')
+    stop_number = models.PositiveIntegerField()
+    scheduled_arrival = models.DateTimeField()
+    scheduled_departure = models.DateTimeField()
+    arrival_delay = models.IntegerField(default=0)
+    departure_delay = models.IntegerField(default=0)
+    expected_arrival = models.DateTimeField()
+    expected_departure = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['run', 'stop_number']
+        db_table = 'train_run_stop'
+        verbose_name = 'Train Run Stop'
+        verbose_name_plural = 'Train Run Stops'
+        constraints = [
+            models.UniqueConstraint(fields=['run', 'stop_number'], name='unique_run_stop_number'),
+            # Also the index behind "expected times of run R at station S".
+            models.UniqueConstraint(fields=['run', 'station'], name='unique_run_station'),
+        ]
+
+    def __str__(self):
+        return f"{self.run_id} - {self.station_id} (+{self.departure_delay}m)"
+
+
+class OutboxEvent(models.Model):
+    """
+    A change to a Station, Train or TrainStation row, written in the same
+    transaction as the change by every mutation path (model save/delete and
+    the SoftDeleteQuerySet update, bulk and delete paths) and consumed by the
+    outbox relay (trains.outbox).
+
+    Fields:
+        entity (str): 'station', 'train' or 'stop'.
+        object_id (int): Primary key of the changed row.
+        train_id (int): Train affected, for trains and stops.
+        station_id (int): Station affected, for stations and stops.
+        processed_at (datetime): When the relay delivered the change; processed
+            rows are deleted once older than OUTBOX['RETENTION_HOURS'].
+        claimed_until (datetime): Set when a relay takes the row; until then
+            other relays skip it, and after it the row is delivered again.
+    """
+    entity = models.CharField(max_length=10)
+    object_id = models.BigIntegerField()
+    train_id = models.BigIntegerField(null=True)
+    station_id = models.BigIntegerField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    claimed_until = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'outbox_event'
+        verbose_name = 'Outbox Event'
+        verbose_name_plural = 'Outbox Events'
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(processed_at__isnull=True),
+                         name='outbox_pending_idx'),
+            models.Index(fields=['processed_at'], condition=models.Q(processed_at__isnull=False),
+                         name='outbox_processed_idx'),
+        ]
+
+    @classmethod
+    def record(cls, model, rows):
+        """
+        Insert one event per (id, train id, station id) row changed in `model`.
+        Must run inside the transaction making the change; once it commits,
+        the timetable image is marked stale.
+        """
+        if model.OUTBOX_ENTITY is None:
+            return
+        cls.objects.bulk_create([cls(entity=model.OUTBOX_ENTITY, object_id=object_id,
+                                     train_id=train_id, station_id=station_id)
+                                 for object_id, train_id, station_id in rows])
+        from .timetable_image import mark_changed
+        transaction.on_commit(mark_changed)
+
+    def __str__(self):
+        return f"{self.entity} {self.object_id} ({'processed' if self.processed_at else 'pending'})"
+
+
+class StationHistory(models.Model):
+    """
+    Archived copy of a soft-deleted Station, moved out of the hot table by
+    trains.archival. `original_id` keeps the primary key for restores.
+    """
+    original_id = models.BigIntegerField(unique=True)
+    code = models.CharField(max_length=10)
+    name = models.CharField(max_length=100)
+    created_at = models.DateTimeField(null=True)
+    updated_at = models.DateTimeField(null=True)
+    deleted_at = models.DateTimeField(null=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'station_history'
+        verbose_name = 'Station History'
+        verbose_name_plural = 'Station History'
+
+
+class TrainHistory(models.Model):
+    """
+    Archived copy of a soft-deleted Train. Station references are kept as
+    plain ids because the stations may be archived too.
+    """
+    original_id = models.BigIntegerField(unique=True)
+    number = models.CharField(max_length=10, db_index=True)
+    name = models.CharField(max_length=100)
+    from_station_id = models.BigIntegerField()
+    to_station_id = models.BigIntegerField()
+    compartments = models.PositiveIntegerField()
+    seats_per_compartment = models.PositiveBigIntegerField()
+    created_at = models.DateTimeField(null=True)
+    updated_at = models.DateTimeField(null=True)
+    deleted_at = models.DateTimeField(null=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'train_history'
+        verbose_name = 'Train History'
+        verbose_name_plural = 'Train History'
+
+
+class TrainStationHistory(models.Model):
+    """
+    Archived copy of a soft-deleted TrainStation stop.
+    """
+    original_id = models.BigIntegerField(unique=True)
+    train_id = models.BigIntegerField(db_index=True)
+    station_id = models.BigIntegerField()
+    arrival_time = models.TimeField()
+    departure_time = models.TimeField()
+    arrival_day = models.PositiveSmallIntegerField(default=0)
+    departure_day = models.PositiveSmallIntegerField(default=0)
+    stop_number = models.PositiveIntegerField()
+    created_at = models.DateTimeField(null=True)
+    updated_at = models.DateTimeField(null=True)
+    deleted_at = models.DateTimeField(null=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'train_station_history'
+        verbose_name = 'Train Station History'
+        verbose_name_plural = 'Train Station History'
@@ -0,0 +1,126 @@
+"""
+Relay for the transactional outbox (OutboxEvent).
+
+Every mutation of Station, Train and TrainStation writes outbox rows in its
+own transaction, including queryset updates and bulk operations, which
+bypass the model signals. The relay reads pending rows in id order. It
+folds each batch into one set of changes and passes that to the handlers in
+OUTBOX['HANDLERS'], which invalidate caches and rebuild derived indexes.
+
+A batch is first claimed in a short transaction (claimed_until is set
+OUTBOX['CLAIM_SECONDS'] ahead), so the handlers run with no row locks or
+open transaction. The rows are marked processed only after the handlers
+succeed. A batch whose handlers fail, or whose relay dies, is delivered
+again once its claim expires, so delivery is at-least-once and handlers
+must be idempotent. Several relays can run at once: they skip rows that are
+locked or claimed by another relay.
+
+Handlers invalidate entries in the default cache, which the web workers
+read, so that cache must be shared between processes (see settings.CACHES).
+
+The signal handlers in trains.signals still refresh boards and push events
+immediately for the common save() path; the relay is what guarantees that
+every change is eventually seen.
+
+compact() deletes processed rows older than OUTBOX['RETENTION_HOURS'] in
+batches, keeping the table at roughly the size of the recent change stream.
+"""
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .departure_board import invalidate_stations, invalidate_train
+from .models import OutboxEvent, Train, TrainStation
+
+logger = logging.getLogger('request_logger')
+
+
+def coalesce(events):
+    """
+    Fold outbox rows into the set of changed entities:
+    {'stations', 'trains', 'stops'} hold ids of changed rows of each kind,
+    and 'route_trains' / 'route_stations' the trains and stations whose
+    stops changed.
+    """
+    changes = {'stations': set(), 'trains': set(), 'stops': set(),
+               'route_trains': set(), 'route_stations': set()}
+    for event in events:
+        if event.entity == Train.OUTBOX_ENTITY:
+            changes['trains'].add(event.object_id)
+        elif event.entity == TrainStation.OUTBOX_ENTITY:
+            changes['stops'].add(event.object_id)
+            changes['route_trains'].add(event.train_id)
+            changes['route_stations'].add(event.station_id)
+        else:
+            changes['stations'].add(event.object_id)
+    return changes
+
+
+def invalidate_departure_boards(changes):
+    """
+    Outbox handler: refresh every departure board a batch of changes can
+    show up on (see trains.signals for the per-save equivalent).
+    """
+    invalidate_stations(changes['route_stations'] | changes['stations'])
+    train_ids = changes['route_trains'] | changes['trains']
+    if changes['stations']:
+        # Station codes are shown as origin/destination along whole routes.
+        train_ids |= set(Train.objects.filter(Q(from_station__in=changes['stations']) |
+                                              Q(to_station__in=changes['stations']))
+                         .values_list('pk', flat=True))
+    for train_id in train_ids:
+        invalidate_train(train_id)
+
+
+def get_handlers():
+    return [import_string(path) for path in settings.OUTBOX['HANDLERS']]
+
+
+def relay_batch(batch_size=None, handlers=None):
+    """
+    Deliver up to batch_size pending outbox rows to the handlers.
+    Returns the number of rows processed (0 when the outbox is drained).
+    """
+    batch_size = batch_size or settings.OUTBOX['BATCH_SIZE']
+    handlers = get_handlers() if handlers is None else handlers
+    now = timezone.now()
+    with transaction.atomic():
+        events = list(OutboxEvent.objects.filter(processed_at__isnull=True)
+                      .filter(Q(claimed_until__isnull=True) | Q(claimed_until__lt=now))
+                      .order_by('pk').select_for_update(skip_locked=True)[:batch_size])
+        if not events:
+            return 0
+        ids = [event.pk for event in events]
+        OutboxEvent.objects.filter(pk__in=ids).update(
+            claimed_until=now + timedelta(seconds=settings.OUTBOX['CLAIM_SECONDS']))
+    changes = coalesce(events)
+    for handler in handlers:
+        handler(changes)
+    OutboxEvent.objects.filter(pk__in=ids).update(processed_at=timezone.now())
+    logger.info(f"Outbox relay delivered {len(events)} events "
+                f"({len(changes['stations'])} stations, {len(changes['trains'])} trains, "
+                f"{len(changes['stops'])} stops)")
+    return len(events)
+
+
+def compact(retention_hours=None, batch_size=None):
+    """
+    Delete processed outbox rows older than retention_hours, in batches.
+    Returns the number of rows deleted.
+    """
+    retention_hours = settings.OUTBOX['RETENTION_HOURS'] if retention_hours is None else retention_hours
+    batch_size = batch_size or settings.OUTBOX['BATCH_SIZE']
+    cutoff = timezone.now() - timedelta(hours=retention_hours)
+    total = 0
+    while True:
+        ids = list(OutboxEvent.objects.filter(processed_at__lt=cutoff).order_by('pk')
+                   .values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            break
+        total += OutboxEvent.objects.filter(pk__in=ids).delete()[0]
+    if total:
+        logger.info(f"Outbox compaction removed {total} processed events")
+    return total
@@ -0,0 +1,190 @@
+"""
+Raw ASGI endpoints that push train/station change events (trains/events.py).
+
+    - ``GET /api/events/stream/?train=12345&station=MAS`` : server-sent events.
+    - ``ws://.../api/events/ws/?train=12345&station=MAS``  : WebSocket, one JSON
+      text frame per event.
+
+Both take any number of ``train`` and ``station`` parameters (at most
+``EVENTS['MAX_TOPICS']`` in total). They are mounted ahead of Django in
+ticketbooking/asgi.py and never touch the ORM, so an idle subscriber costs a
+coroutine, a watcher task and a bounded deque (a few KB) rather than a
+thread.
+
+They are public, so each new connection takes a token from the client IP's
+``events.ip`` bucket (accounts/throttling.py), and a client may hold at most
+``EVENTS['MAX_CONNECTIONS_PER_CLIENT']`` open connections per worker.
+"""
+import asyncio
+import json
+from collections import Counter
+from urllib.parse import parse_qs
+from django.conf import settings
+from rest_framework.settings import api_settings
+from accounts.throttling import take_token
+from utils.constants import EventMessage
+from .events import get_broker, station_topic, train_topic
+
+STREAM_PATH = '/api/events/stream/'
+WEBSOCKET_PATH = '/api/events/ws/'
+THROTTLE_SCOPE = 'events'
+
+_connections = Counter()
+
+
+def _topics(scope):
+    params = parse_qs(scope.get('query_string', b'').decode())
+    topics = [train_topic(number) for number in params.get('train', []) if number]
+    topics += [station_topic(code) for code in params.get('station', []) if code]
+    return topics
+
+
+async def _reject(send, status, message):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'application/json')]})
+    await send({'type': 'http.response.body',
+                'body': json.dumps({'success': False, 'error': message}).encode()})
+
+
+def _client_ip(scope):
+    """
+    Client address, honouring REST_FRAMEWORK['NUM_PROXIES'] like DRF's throttles.
+    """
+    remote = (scope.get('client') or ('',))[0]
+    num_proxies = api_settings.NUM_PROXIES
+    forwarded = dict(scope.get('headers', ())).get(b'x-forwarded-for', b'').decode('latin-1')
+    if num_proxies is None or not forwarded:
+        return remote
+    if num_proxies == 0:
+        return ''.join(forwarded.split()) or remote
+    addresses = forwarded.split(',')
+    return addresses[-min(num_proxies, len(addresses))].strip()
+
+
+async def _admit(client):
+    """
+    Reserve a connection slot for `client`. Returns None when admitted (the
+    caller must _release() it), else (status, message).
+    """
+    if _connections[client] >= settings.EVENTS['MAX_CONNECTIONS_PER_CLIENT']:
+        return 429, EventMessage.TOO_MANY_CONNECTIONS
+    # Reserved before awaiting, so concurrent handshakes cannot overshoot the cap.
+    _connections[client] += 1
+    allowed, wait_seconds = await asyncio.to_thread(take_token, THROTTLE_SCOPE, 'ip', client)
+    if not allowed:
+        _release(client)
+        return 429, EventMessage.THROTTLED.format(wait=int(wait_seconds) + 1)
+    return None
+
+
+def _release(client):
+    _connections[client] -= 1
+    if _connections[client] <= 0:
+        del _connections[client]
+
+
+def _valid(topics):
+    if not topics:
+        return 'Subscribe to at least one train or station.'
+    if len(topics) > settings.EVENTS['MAX_TOPICS']:
+        return f"At most {settings.EVENTS['MAX_TOPICS']} trains/stations per connection."
+    return None
+
+
+async def _watch_disconnect(receive, subscription, disconnect_type):
+    while True:
+        message = await receive()
+        if message['type'] == disconnect_type:
+            subscription.close()
+            return
+
+
+async def _serve(client, subscription, receive, disconnect_type, emit):
+    """
+    Forward events to the client until it disconnects; `emit(None)` is a heartbeat.
+    """
+    heartbeat = settings.EVENTS['HEARTBEAT_SECONDS']
+    watcher = asyncio.ensure_future(_watch_disconnect(receive, subscription, disconnect_type))
+    try:
+        while True:
+            event = await subscription.get(timeout=heartbeat)
+            if subscription.closed:
+                break
+            await emit(event)
+    finally:
+        watcher.cancel()
+        get_broker().unsubscribe(subscription)
+        _release(client)
+
+
+async def event_stream(scope, receive, send):
+    """
+    Server-sent events: `event: <type>` / `data: <json>` per change, with a
+    comment line as heartbeat so proxies keep the connection open.
+    """
+    topics = _topics(scope)
+    error = _valid(topics)
+    if error:
+        await _reject(send, 400, error)
+        return
+    client = _client_ip(scope)
+    refusal = await _admit(client)
+    if refusal:
+        await _reject(send, *refusal)
+        return
+    subscription = get_broker().subscribe(topics)
+    await send({'type': 'http.response.start', 'status': 200,
+                'headers': [(b'content-type', b'text/event-stream'),
+                            (b'cache-control', b'no-cache'),
+                            (b'x-accel-buffering', b'no')]})
+
+    async def emit(event):
+        if event is None:
+            body = b': ping\n\n'
+        else:
+            body = f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n".encode()
+        await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+
+    await emit(None)
+    await _serve(client, subscription, receive, 'http.disconnect', emit)
+
+
+async def event_socket(scope, receive, send):
+    """
+    WebSocket variant of event_stream; client frames are ignored.
+    """
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+    topics = _topics(scope)
+    error = _valid(topics)
+    if error:
+        await send({'type': 'websocket.close', 'code': 4400, 'reason': error})
+        return
+    client = _client_ip(scope)
+    refusal = await _admit(client)
+    if refusal:
+        await send({'type': 'websocket.close', 'code': 4429, 'reason': refusal[1]})
+        return
+    subscription = get_broker().subscribe(topics)
+    await send({'type': 'websocket.accept'})
+
+    async def emit(event):
+        if event is not None:
+            await send({'type': 'websocket.send', 'text': json.dumps(event, default=str)})
+
+    await _serve(client, subscription, receive, 'websocket.disconnect', emit)
+
+
+def with_push(django_application):
+    """
+    Wrap the Django ASGI application so the push paths are served directly.
+    """
+    async def application(scope, receive, send):
+        path = scope.get('path')
+        if scope['type'] == 'http' and path == STREAM_PATH:
+            return await event_stream(scope, receive, send)
+        if scope['type'] == 'websocket' and path == WEBSOCKET_PATH:
+            return await event_socket(scope, receive, send)
+        return await django_application(scope, receive, send)
+    return application
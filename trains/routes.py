@@ -0,0 +1,113 @@
+"""
+Whole-route replacement applied as a minimal diff.
+
+The desired route (ordered stations with times) is compared in memory with
+the train's active TrainStation rows, matched by station. Stops that are
+unchanged are left alone, stops whose position or times changed are updated
+in place (keeping their id), stations no longer on the route are
+soft-deleted and new stations are inserted, each with one bulk statement,
+all in one transaction under a lock on the train row.
+
+Renumbered stops first move above STOP_NUMBER_SHIFT_OFFSET and then to their
+final numbers, so the unique (train, stop_number) index never sees a
+transient duplicate (see TrainStation.shift_stop_numbers).
+"""
+import logging
+from django.db import models, transaction
+from django.utils import timezone
+from .departure_board import invalidate_stations, invalidate_train
+from .events import publish, train_topic
+from .exceptions import InvalidInput, map_integrity_errors
+from .models import STOP_NUMBER_SHIFT_OFFSET, Train, TrainStation
+from .segments import invalidate_profiles
+from .signals import renumbering
+from utils.constants import TrainStationMessage
+
+logger = logging.getLogger('request_logger')
+
+TIME_FIELDS = ['arrival_time', 'departure_time', 'arrival_day', 'departure_day']
+
+
+def diff_route(current, desired):
+    """
+    Compare active stops with the desired route.
+
+    `current` is a list of TrainStation rows, `desired` an ordered list of
+    dicts with station and the TIME_FIELDS. Returns
+    (inserts, updates, removals, unchanged): unsaved TrainStation rows to
+    create, existing rows modified in memory, rows to deactivate, and the
+    number of rows left alone.
+    """
+    by_station = {stop.station_id: stop for stop in current}
+    inserts, updates, unchanged, seen = [], [], 0, set()
+    for stop_number, wanted in enumerate(desired, start=1):
+        station_id = wanted['station'].pk
+        if station_id in seen:
+            raise InvalidInput(TrainStationMessage.STATION_EXIST_IN_ROUTE)
+        seen.add(station_id)
+        stop = by_station.get(station_id)
+        times = {field: wanted[field] for field in TIME_FIELDS}
+        if stop is None:
+            inserts.append(TrainStation(station_id=station_id, stop_number=stop_number, **times))
+        elif stop.stop_number != stop_number or \
+                any(getattr(stop, field) != value for field, value in times.items()):
+            stop.stop_number = stop_number
+            for field, value in times.items():
+                setattr(stop, field, value)
+            updates.append(stop)
+        else:
+            unchanged += 1
+    removals = [stop for stop in current if stop.station_id not in seen]
+    return inserts, updates, removals, unchanged
+
+
+def replace_route(train, desired):
+    """
+    Make `train`'s active route equal to `desired` (see diff_route) touching
+    only the rows that differ. Returns a summary of the changes.
+    """
+    with map_integrity_errors():  # also the transaction
+        Train.objects.select_for_update().filter(pk=train.pk).first()
+        current = list(TrainStation.objects.filter(train=train, is_active=True))
+        previous_numbers = {stop.pk: stop.stop_number for stop in current}
+        inserts, updates, removals, unchanged = diff_route(current, desired)
+        moved = [stop.pk for stop in updates if stop.stop_number != previous_numbers[stop.pk]]
+        if removals or moved:
+            renumbering.send(sender=TrainStation, train_ids=[train.pk])
+
+        if removals:
+            TrainStation.objects.filter(pk__in=[stop.pk for stop in removals]).soft_delete()
+        if moved:
+            TrainStation.objects.filter(pk__in=moved).update(
+                stop_number=models.F('stop_number') + STOP_NUMBER_SHIFT_OFFSET)
+        if updates:
+            now = timezone.now()
+            for stop in updates:
+                stop.updated_at = now
+            TrainStation.objects.bulk_update(
+                updates, ['stop_number', *TIME_FIELDS, 'updated_at'])
+        if inserts:
+            for stop in inserts:
+                stop.train = train
+            TrainStation.objects.bulk_create(inserts)
+
+        summary = {
+            'inserted': len(inserts),
+            'updated': len(updates),
+            'deactivated': len(removals),
+            'unchanged': unchanged,
+        }
+        # Bulk statements bypass the model signals, so refresh boards and
+        # notify subscribers here.
+        removed_stations = {stop.station_id for stop in removals}
+
+        def announce():
+            invalidate_train(train.pk)
+            invalidate_stations(removed_stations)
+            invalidate_profiles([train.pk])
+            publish('route.updated', [train_topic(train.number)], {'train_number': train.number, **summary})
+        if inserts or updates or removals:
+            transaction.on_commit(announce)
+
+    logger.info(f"Route of train {train.number} replaced: {summary}")
+    return summary
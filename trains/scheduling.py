@@ -0,0 +1,100 @@
+"""
+Materialisation of dated TrainRun rows from service calendars.
+
+`materialize_runs` is meant to run on a schedule (see the generate_runs
+command). It is idempotent: runs are upserted on (run_date, train), and
+scheduled runs that fall out of the calendar inside the window are marked
+cancelled rather than deleted, so anything already booked against them keeps
+its reference. Such runs are announced with the runs_dropped signal, on
+which the bookings app queues a cancellation job to refund their tickets.
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+from .models import ServiceCalendar, ServiceException, Train, TrainRun, TrainStation
+from .signals import runs_dropped
+
+logger = logging.getLogger('request_logger')
+
+
+def _origins(train_ids):
+    """
+    Map train id -> (origin station id, departure time) from the first active stop.
+    """
+    origins = {}
+    stops = (TrainStation.objects.active()
+             .filter(train_id__in=train_ids)
+             .order_by('train_id', 'stop_number')
+             .values_list('train_id', 'station_id', 'departure_time'))
+    for train_id, station_id, departure_time in stops:
+        origins.setdefault(train_id, (station_id, departure_time))
+    return origins
+
+
+def running_dates(calendars, start, end):
+    """
+    Return the set of dates in [start, end] on which any of the calendars runs.
+    """
+    dates = set()
+    for calendar in calendars:
+        exceptions = {exception.date: exception.exception_type for exception in calendar.exceptions.all()}
+        day = start
+        while day <= end:
+            if calendar.runs_on(day, exceptions):
+                dates.add(day)
+            day += timedelta(days=1)
+    return dates
+
+
+def materialize_runs(days_ahead, start=None, batch_size=1000, train_ids=None):
+    """
+    Upsert TrainRun rows for [start, start + days_ahead) for every active
+    train with an active calendar. Returns {'upserted': n, 'cancelled': n}.
+    """
+    start = start or timezone.localdate()
+    end = start + timedelta(days=days_ahead - 1)
+    calendars = (ServiceCalendar.objects.filter(is_active=True, train__is_active=True,
+                                                valid_from__lte=end)
+                 .prefetch_related(Prefetch('exceptions',
+                                            queryset=ServiceException.objects.filter(date__range=(start, end)))))
+    if train_ids is not None:
+        calendars = calendars.filter(train_id__in=train_ids)
+    calendars_by_train = defaultdict(list)
+    for calendar in calendars:
+        calendars_by_train[calendar.train_id].append(calendar)
+
+    origins = _origins(list(calendars_by_train))
+    fallback = dict(Train.objects.filter(pk__in=calendars_by_train).values_list('pk', 'from_station_id'))
+    runs = []
+    wanted = set()
+    for train_id, train_calendars in calendars_by_train.items():
+        station_id, departure_time = origins.get(train_id, (fallback[train_id], None))
+        for day in running_dates(train_calendars, start, end):
+            wanted.add((train_id, day))
+            runs.append(TrainRun(train_id=train_id, run_date=day, from_station_id=station_id,
+                                 departure_time=departure_time, status=TrainRun.SCHEDULED))
+
+    with transaction.atomic():
+        for offset in range(0, len(runs), batch_size):
+            TrainRun.objects.bulk_create(
+                runs[offset:offset + batch_size],
+                update_conflicts=True,
+                unique_fields=['run_date', 'train'],
+                update_fields=['from_station', 'departure_time', 'status', 'updated_at'],
+            )
+        existing = TrainRun.objects.filter(run_date__range=(start, end), status=TrainRun.SCHEDULED)
+        if train_ids is not None:
+            existing = existing.filter(train_id__in=train_ids)
+        stale = [pk for pk, train_id, day in existing.values_list('pk', 'train_id', 'run_date')
+                 if (train_id, day) not in wanted]
+        for offset in range(0, len(stale), batch_size):
+            TrainRun.objects.filter(pk__in=stale[offset:offset + batch_size]).update(
+                status=TrainRun.CANCELLED, updated_at=timezone.now())
+        if stale:
+            runs_dropped.send(sender=TrainRun, run_ids=stale)
+
+    logger.info(f"Materialised {len(runs)} train runs from {start} to {end}; cancelled {len(stale)}")
+    return {'upserted': len(runs), 'cancelled': len(stale)}
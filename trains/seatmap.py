@@ -0,0 +1,176 @@
+"""
+Compact seat maps built from a train's coach composition.
+
+Seats are numbered 0..total_seats-1 across the coaches in rake order. A map
+is the list of coaches (label, class, layout, first seat, seat count) plus
+one string with a berth-type character per seat, the coaches' layout
+strings joined. Availability of a run (bookings.inventory.availability)
+travels as a bitmap with one bit per seat (1 = taken). A full rake of ~1500
+seats is a couple of kilobytes to build, cache and send, not one object per
+seat.
+
+Built maps are cached per train. Changing a composition or a layout drops
+the cached maps of the trains concerned and refreshes their
+Train.seat_count, which is where Train.total_seats comes from.
+"""
+import base64
+import logging
+from collections import Counter
+from django.core.cache import cache
+from django.db import transaction
+from accounts import metrics
+from .exceptions import InvalidInput
+from .models import CoachLayout, Train, TrainCoach
+from .signals import renumbering
+from utils.constants import CoachMessage
+
+logger = logging.getLogger('request_logger')
+
+SEAT_MAP_KEY = 'seat_map:{train_id}'
+
+
+def empty_bitmap(size):
+    return bytearray((size + 7) // 8)
+
+
+def set_bit(bitmap, index):
+    bitmap[index >> 3] |= 1 << (index & 7)
+
+
+def test_bit(bitmap, index):
+    return bool(bitmap[index >> 3] & (1 << (index & 7)))
+
+
+class SeatMap:
+    """
+    Seat map of one train. `coaches` holds (label, travel_class, layout code,
+    first seat, seats) tuples in rake order; `berths` one character per seat.
+    """
+    __slots__ = ('train_id', 'coaches', 'berths', '_by_label')
+
+    def __init__(self, train_id, coaches, berths):
+        self.train_id = train_id
+        self.coaches = coaches
+        self.berths = berths
+        self._by_label = {coach[0]: coach for coach in coaches}
+
+    @classmethod
+    def build(cls, train_id):
+        coaches, berths, first = [], [], 0
+        for label, travel_class, code, layout in (TrainCoach.objects.filter(train_id=train_id)
+                                                  .order_by('position')
+                                                  .values_list('label', 'layout__travel_class',
+                                                               'layout__code', 'layout__berths')):
+            coaches.append((label, travel_class, code, first, len(layout)))
+            berths.append(layout)
+            first += len(layout)
+        return cls(train_id, coaches, ''.join(berths))
+
+    @property
+    def total_seats(self):
+        return len(self.berths)
+
+    def class_seats(self):
+        counts = Counter()
+        for _, travel_class, _, _, seats in self.coaches:
+            counts[travel_class] += seats
+        return dict(counts)
+
+    def seat_index(self, label, seat_number):
+        """
+        Index of seat `seat_number` (1-based, as printed) in coach `label`,
+        or None if there is no such seat.
+        """
+        coach = self._by_label.get(label)
+        if coach is None or not 1 <= seat_number <= coach[4]:
+            return None
+        return coach[3] + seat_number - 1
+
+    def seat(self, index):
+        """
+        (coach label, seat number, berth type code) of a seat index.
+        """
+        for label, _, _, first, seats in self.coaches:
+            if first <= index < first + seats:
+                return label, index - first + 1, self.berths[index]
+        raise IndexError(index)
+
+    def class_range(self, travel_class):
+        """
+        Seat indexes of every coach of the given class.
+        """
+        for _, coach_class, _, first, seats in self.coaches:
+            if coach_class == travel_class:
+                yield from range(first, first + seats)
+
+    def to_dict(self, taken=None):
+        """
+        The map as sent to clients, with `taken` (a bitmap) when given.
+        """
+        data = {
+            'total_seats': self.total_seats,
+            'classes': self.class_seats(),
+            'coaches': [{'label': label, 'class': travel_class, 'layout': code,
+                         'first_seat': first, 'seats': seats}
+                        for label, travel_class, code, first, seats in self.coaches],
+            'berths': self.berths,
+            'berth_types': CoachLayout.BERTH_TYPES,
+        }
+        if taken is not None:
+            data['taken'] = base64.b64encode(bytes(taken)).decode()
+        return data
+
+
+def get_seat_map(train_id):
+    """
+    The train's seat map, from the cache when possible.
+    """
+    key = SEAT_MAP_KEY.format(train_id=train_id)
+    seat_map = cache.get(key)
+    metrics.record_cache('seat_map', seat_map is not None)
+    if seat_map is None:
+        seat_map = SeatMap.build(train_id)
+        cache.set(key, seat_map, timeout=None)
+    return seat_map
+
+
+def _refresh(train_ids):
+    """
+    Recompute seat_count and drop cached maps for the given trains, after commit.
+    """
+    train_ids = list(train_ids)
+    for train_id in train_ids:
+        seat_map = SeatMap.build(train_id)
+        Train.objects.filter(pk=train_id).update(seat_count=seat_map.total_seats if seat_map.coaches else None)
+    transaction.on_commit(lambda: cache.delete_many([SEAT_MAP_KEY.format(train_id=train_id)
+                                                     for train_id in train_ids]))
+
+
+def set_composition(train, coaches):
+    """
+    Replace the train's composition with `coaches`, a list of
+    {'label', 'layout': CoachLayout} in rake order. Returns the new seat map.
+    """
+    labels = [coach['label'] for coach in coaches]
+    if len(set(labels)) != len(labels):
+        raise InvalidInput(CoachMessage.DUPLICATE_LABEL)
+    renumbering.send(sender=Train, train_ids=[train.pk])
+    with transaction.atomic():
+        TrainCoach.objects.filter(train=train).delete()
+        TrainCoach.objects.bulk_create([TrainCoach(train=train, position=position, label=coach['label'],
+                                                   layout=coach['layout'])
+                                        for position, coach in enumerate(coaches, start=1)])
+        _refresh([train.pk])
+    logger.info(f"Composition of train {train.number} set to {len(coaches)} coaches")
+    return SeatMap.build(train.pk)
+
+
+def layout_changed(layout, seats_changed=True):
+    """
+    Refresh every train whose composition uses `layout`. `seats_changed`
+    means its berths or class changed, which renumbers those trains' seats.
+    """
+    train_ids = list(TrainCoach.objects.filter(layout=layout).values_list('train_id', flat=True).distinct())
+    if seats_changed:
+        renumbering.send(sender=CoachLayout, train_ids=train_ids)
+    _refresh(train_ids)
@@ -0,0 +1,134 @@
+"""
+Segment queries: the stops, running time and halts between two stations of
+one train, answered from a precomputed route profile.
+
+A profile holds a train's active stops as parallel arrays in stop order.
+Arrivals and departures are journey minutes (TrainStation.journey_minutes:
+minutes from midnight of the origin's departure day, so day offsets are
+already applied). `halts_before[k]` is the running total of halt minutes at
+the stops before stop k. With the station code -> position index, a query
+for stations at positions i < j is two dict lookups and array arithmetic:
+- running time = arrivals[j] - departures[i]
+- time spent halting on the way = halts_before[j] - halts_before[i + 1]
+- the intermediate stops are the slice i + 1 .. j - 1
+
+Profiles are cached per train in the shared cache for at most
+settings.SEGMENTS['CACHE_SECONDS'], and dropped sooner when its route or one
+of its stations changes: trains.signals for saves, the outbox handler below
+for every other write.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from accounts import metrics
+from .exceptions import InvalidInput, NotFound
+from .models import MINUTES_PER_DAY, TrainStation
+from utils.constants import SegmentMessage
+
+ROUTE_PROFILE_KEY = 'route_profile:{train_id}'
+
+
+def _clock(minutes):
+    return f"{minutes % MINUTES_PER_DAY // 60:02d}:{minutes % 60:02d}"
+
+
+class RouteProfile:
+    """
+    Active stops of one train as parallel arrays, in stop order.
+    """
+    __slots__ = ('train_id', 'codes', 'names', 'stop_numbers', 'arrivals', 'departures',
+                 'halts_before', 'index')
+
+    def __init__(self, train_id, stops):
+        self.train_id = train_id
+        self.codes, self.names, self.stop_numbers = [], [], []
+        self.arrivals, self.departures, self.halts_before = [], [], [0]
+        for code, name, stop_number, arrival, departure in stops:
+            self.codes.append(code)
+            self.names.append(name)
+            self.stop_numbers.append(stop_number)
+            self.arrivals.append(arrival)
+            self.departures.append(departure)
+            self.halts_before.append(self.halts_before[-1] + departure - arrival)
+        self.index = {code.upper(): position for position, code in enumerate(self.codes)}
+
+    @classmethod
+    def build(cls, train_id):
+        rows = (TrainStation.objects.active()
+                .filter(train_id=train_id, station__is_active=True)
+                .order_by('stop_number')
+                .values_list('station__code', 'station__name', 'stop_number',
+                             'arrival_day', 'arrival_time', 'departure_day', 'departure_time'))
+        return cls(train_id, [(code, name, stop_number,
+                               TrainStation.journey_minutes(arrival_day, arrival),
+                               TrainStation.journey_minutes(departure_day, departure))
+                              for code, name, stop_number, arrival_day, arrival, departure_day, departure in rows])
+
+    def position(self, code):
+        position = self.index.get(code.upper())
+        if position is None:
+            raise NotFound(SegmentMessage.STATION_NOT_ON_ROUTE.format(station_code=code))
+        return position
+
+    def _stop(self, position, start):
+        arrival, departure = self.arrivals[position], self.departures[position]
+        return {
+            'station_code': self.codes[position],
+            'station_name': self.names[position],
+            'stop_number': self.stop_numbers[position],
+            'arrival_time': _clock(arrival),
+            'arrival_day': arrival // MINUTES_PER_DAY,
+            'departure_time': _clock(departure),
+            'departure_day': departure // MINUTES_PER_DAY,
+            'halt_minutes': departure - arrival,
+            'minutes_from_boarding': arrival - start,
+        }
+
+    def segment(self, from_code, to_code):
+        """
+        Journey from station `from_code` to `to_code` (later on the route).
+        """
+        i, j = self.position(from_code), self.position(to_code)
+        if i >= j:
+            raise InvalidInput(SegmentMessage.WRONG_DIRECTION.format(from_code=from_code, to_code=to_code))
+        start, end = self.departures[i], self.arrivals[j]
+        return {
+            'from_station': self.codes[i],
+            'to_station': self.codes[j],
+            'departure_time': _clock(start),
+            'departure_day': start // MINUTES_PER_DAY,
+            'arrival_time': _clock(end),
+            'arrival_day': end // MINUTES_PER_DAY,
+            'duration_minutes': end - start,
+            'halt_minutes': self.halts_before[j] - self.halts_before[i + 1],
+            'stop_count': j - i - 1,
+            'stops': [self._stop(position, start) for position in range(i + 1, j)],
+        }
+
+
+def get_route_profile(train_id):
+    """
+    The train's route profile, from the cache when possible.
+    """
+    key = ROUTE_PROFILE_KEY.format(train_id=train_id)
+    profile = cache.get(key)
+    metrics.record_cache('route_profile', profile is not None)
+    if profile is None:
+        profile = RouteProfile.build(train_id)
+        cache.set(key, profile, timeout=settings.SEGMENTS['CACHE_SECONDS'])
+    return profile
+
+
+def invalidate_profiles(train_ids):
+    cache.delete_many([ROUTE_PROFILE_KEY.format(train_id=train_id) for train_id in set(train_ids)])
+
+
+def invalidate_route_profiles(changes):
+    """
+    Outbox handler: drop the profiles of trains whose stops changed or that
+    call at a changed station (codes and names are part of the profile).
+    """
+    train_ids = set(changes['route_trains'])
+    if changes['stations']:
+        train_ids |= set(TrainStation.objects.active().filter(station_id__in=changes['stations'])
+                         .values_list('train_id', flat=True))
+    invalidate_profiles(train_ids)
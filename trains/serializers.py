@@ -1,12 +1,17 @@
 from rest_framework import serializers
-from .models import Station, Train, TrainStation
+from rest_framework.validators import UniqueValidator
+from .models import (Station, Train, TrainStation, ServiceCalendar, ServiceException,
+                     TrainRun, TrainRunStop, CoachLayout, MAX_JOURNEY_DAYS)
 from django.utils import timezone
 from accounts.exceptions import InvalidInput, AlreadyExists, NotFound
-from utils.constants import TrainMessage, StationMessage, TrainStationMessage
+from .exceptions import map_integrity_errors
+from .fieldsets import SparseFieldsetMixin
+from utils.constants import (TrainMessage, StationMessage, TrainStationMessage,
+                             TrainRunMessage, CoachMessage)
 import re
 from django.db import models, transaction
 
-class StationSerializer(serializers.ModelSerializer):
+class StationSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Serializer for Station model esnsure updated time for field
     updated_at
@@ -19,24 +24,25 @@ class StationSerializer(serializers.ModelSerializer):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.fields['name'].validators = []
+        # ?fields= may have dropped them on reads, where validators do not matter.
+        if 'name' in self.fields:
+            self.fields['name'].validators = []
+        if 'code' in self.fields:
+            self.fields['code'].validators = [v for v in self.fields['code'].validators
+                                              if not isinstance(v, UniqueValidator)]
 
     def create(self, validated_data):
-        name = validated_data.get('name')
-        code = validated_data.get('code')        
-        # Check for case-insensitive duplicates
-        if Station.objects.filter(name__iexact=name).exists():
-            raise AlreadyExists(StationMessage.STATION_ALREADY_EXISTS)
-        if Station.objects.filter(code__iexact=code).exists():
-            raise AlreadyExists(StationMessage.STATION_ALREADY_EXISTS)
-        
-        return super().create(validated_data)
+        # Case-insensitive duplicates are rejected by the unique indexes on
+        # lower(name) / lower(code).
+        with map_integrity_errors(AlreadyExists):
+            return super().create(validated_data)
 
     def update(self, instance, validated_data):
         instance.name = validated_data.get('name', instance.name)
         instance.code = validated_data.get('code', instance.code)
         instance.updated_at = timezone.now()
-        instance.save()
+        with map_integrity_errors(AlreadyExists):
+            instance.save()
         return instance
     
     def validate_name(self, value):
@@ -47,8 +53,6 @@ class StationSerializer(serializers.ModelSerializer):
             raise InvalidInput(StationMessage.STATION_NAME_REQUIRED)
         if len(value.strip()) < 3:
             raise InvalidInput(StationMessage.STATION_NAME_TOO_SHORT)
-        if Station.objects.filter(name=value).exists():
-            raise AlreadyExists(StationMessage.STATION_ALREADY_EXISTS)
         return value.strip()
     
     def validate_code(self, value):
@@ -59,11 +63,9 @@ class StationSerializer(serializers.ModelSerializer):
             raise InvalidInput(StationMessage.STATION_CODE_REQUIRED)
         if len(value.strip()) < 2:
             raise InvalidInput(StationMessage.STATION_CODE_TOO_SHORT)
-        if Station.objects.filter(code=value).exists():
-            raise AlreadyExists(StationMessage.STATION_ALREADY_EXISTS)
         return value.strip().upper()
 
-class TrainSerializer(serializers.ModelSerializer):
+class TrainSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Serializer for Train model with custom validations on number and name.
     """
@@ -79,10 +81,13 @@ class TrainSerializer(serializers.ModelSerializer):
         model = Train
         fields = ['id', 'name', 'number', 'from_station_name', 'to_station_name',
                   'total_seats', 'from_station', 'to_station']
+        expandable_fields = {'from_station': StationSerializer, 'to_station': StationSerializer}
+        field_requires = {'total_seats': ['compartments', 'seats_per_compartment', 'seat_count']}
         
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.fields['name'].validators = []
+        if 'name' in self.fields:
+            self.fields['name'].validators = []
     
     def validate_name(self, value):
         """
@@ -94,16 +99,16 @@ class TrainSerializer(serializers.ModelSerializer):
             raise InvalidInput(TrainMessage.TRAIN_NAME_TOO_SHORT)
         if not re.match(r"[A-Za-z]", value):
             raise InvalidInput(TrainMessage.TRAIN_NAME_INVALID)
-        if Train.objects.filter(name=value).exists():
-            raise AlreadyExists(TrainMessage.TRAIN_ALREADY_EXISTS)
-        
         return value.title()
     
     def create(self, validated_data):
-        name = validated_data.get('name')
-        if Train.objects.filter(name__iexact=name).exists():
-            raise AlreadyExists(TrainMessage.TRAIN_ALREADY_EXISTS)
-        return super().create(validated_data)
+        # Duplicate names (any case) are rejected by the lower(name) unique index.
+        with map_integrity_errors(AlreadyExists):
+            return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        with map_integrity_errors(AlreadyExists):
+            return super().update(instance, validated_data)
     
     def validate(self, data):
         # from_station should not be same as to_station
@@ -113,24 +118,65 @@ class TrainSerializer(serializers.ModelSerializer):
             raise InvalidInput("From and To stations must be different.")
         return data
     
-class TrainStationStopSerializer(serializers.Serializer):
-    station = serializers.PrimaryKeyRelatedField(queryset=Station.objects.filter(is_active=True))
+def validate_halt(arrival_day, arrival_time, departure_day, departure_time):
+    """
+    A stop must be left after it is reached, counting day offsets, so
+    arriving 23:55 on day 0 and leaving 00:05 on day 1 is a 10 minute halt.
+    """
+    if TrainStation.journey_minutes(arrival_day, arrival_time) >= \
+            TrainStation.journey_minutes(departure_day, departure_time):
+        raise InvalidInput(TrainStationMessage.TRAIN_STATION_DEPARTURE_MUST_GREATER)
+
+
+class StopTimesSerializer(serializers.Serializer):
+    """
+    Arrival and departure of one stop, each a time of day plus the number of
+    midnights since the train left its origin.
+    """
     arrival_time = serializers.TimeField()
     departure_time = serializers.TimeField()
+    arrival_day = serializers.IntegerField(min_value=0, max_value=MAX_JOURNEY_DAYS, default=0)
+    departure_day = serializers.IntegerField(min_value=0, max_value=MAX_JOURNEY_DAYS, default=0)
 
     def validate(self, data):
-        if data['arrival_time'] >= data['departure_time']:
-            raise InvalidInput(TrainStationMessage.TRAIN_STATION_DEPARTURE_MUST_GREATER)
+        validate_halt(data['arrival_day'], data['arrival_time'], data['departure_day'], data['departure_time'])
         return data
 
-    def validate_station(self, value):
-        # Get train from context if available
-        train = self.context.get('train')
-        if train and TrainStation.objects.filter(train=train, station=value, is_active=True).exists():
-            raise AlreadyExists(TrainStationMessage.STATION_EXIST_IN_ROUTE)
-        return value
 
-class TrainStationSerialzer(serializers.ModelSerializer):
+class TrainStationStopSerializer(StopTimesSerializer):
+    station = serializers.PrimaryKeyRelatedField(queryset=Station.objects.filter(is_active=True))
+
+
+class RouteStopSerializer(StopTimesSerializer):
+    station = serializers.IntegerField(min_value=1)
+
+
+class RouteReplaceSerializer(serializers.Serializer):
+    """
+    The complete desired route of a train, in travel order. Stations are
+    resolved together in validate_stops rather than one query per stop.
+    """
+    stops = RouteStopSerializer(many=True, allow_empty=False)
+
+    def validate_stops(self, stops):
+        if len(stops) < 2:
+            raise InvalidInput(TrainStationMessage.ROUTE_TOO_SHORT)
+        stations = Station.objects.active().in_bulk({stop['station'] for stop in stops})
+        missing = sorted({stop['station'] for stop in stops} - stations.keys())
+        if missing:
+            raise InvalidInput(TrainStationMessage.ROUTE_STATIONS_NOT_FOUND.format(
+                station_ids=', '.join(map(str, missing))))
+        for stop in stops:
+            stop['station'] = stations[stop['station']]
+        # Times must run forward along the route once day offsets are applied.
+        for stop_number, (previous, stop) in enumerate(zip(stops, stops[1:]), start=2):
+            if TrainStation.journey_minutes(stop['arrival_day'], stop['arrival_time']) < \
+                    TrainStation.journey_minutes(previous['departure_day'], previous['departure_time']):
+                raise InvalidInput(TrainStationMessage.TRAIN_STATION_OUT_OF_ORDER.format(stop_number=stop_number))
+        return stops
+
+
+class TrainStationSerialzer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Serializer for creating train routes and viewing individual train stops.
 
@@ -147,8 +193,11 @@ class TrainStationSerialzer(serializers.ModelSerializer):
         model = TrainStation
         fields = [
             'id', 'train', 'train_name', 'station', 'station_name',
-            'arrival_time', 'departure_time', 'stop_number', 'stops'
+            'arrival_time', 'departure_time', 'arrival_day', 'departure_day', 'stop_number', 'stops'
         ]
+        expandable_fields = {'train': TrainSerializer, 'station': StationSerializer}
+        # Read by to_representation whatever the requested fields.
+        always_requires = ['is_active', 'station__is_active']
 
     def to_representation(self, instance):
         # Only show active stops and active stations
@@ -166,22 +215,145 @@ class TrainStationSerialzer(serializers.ModelSerializer):
         except Train.DoesNotExist:
             raise InvalidInput(f"Train with number '{train_number}' does not exist.")
         attrs['train'] = train
-        # If single add, check for active stop conflict
-        station = self.initial_data.get('station')
-        if station:
-            if TrainStation.objects.filter(train=train, station=station, is_active=True).exists():
-                raise AlreadyExists(TrainStationMessage.STATION_EXIST_IN_ROUTE)
+        # Partial updates are checked against the stop's stored times.
+        times = {field: attrs.get(field, getattr(self.instance, field, None))
+                 for field in ('arrival_day', 'arrival_time', 'departure_day', 'departure_time')}
+        if times['arrival_time'] is not None and times['departure_time'] is not None:
+            validate_halt(times['arrival_day'] or 0, times['arrival_time'],
+                          times['departure_day'] or 0, times['departure_time'])
         return attrs
 
-    def validate_station(self, value):
-        # Only check for single add (not bulk)
-        train_number = self.initial_data.get('train')
-        if train_number:
-            try:
-                train = Train.objects.get(number=train_number)
-            except Train.DoesNotExist:
-                raise InvalidInput(f"Train with number '{train_number}' does not exist.")
-            if TrainStation.objects.filter(train=train, station=value, is_active=True).exists():
-                raise AlreadyExists(TrainStationMessage.STATION_EXIST_IN_ROUTE)
-        return value
+    def create(self, validated_data):
+        # An active stop for the same station or stop number is rejected by
+        # the partial unique indexes on TrainStation.
+        with map_integrity_errors(AlreadyExists):
+            return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        with map_integrity_errors(AlreadyExists):
+            return super().update(instance, validated_data)
         
+
+
+class ServiceExceptionSerializer(serializers.ModelSerializer):
+    """
+    A dated override on a service calendar (extra or cancelled running day).
+    """
+
+    class Meta:
+        model = ServiceException
+        fields = ['id', 'date', 'exception_type']
+
+
+class ServiceCalendarSerializer(serializers.ModelSerializer):
+    """
+    Serializer for service calendars. Running days are exchanged as a list
+    of weekday names ('mon'..'sun') and stored as a bitmask.
+    """
+    days = serializers.ListField(child=serializers.ChoiceField(choices=ServiceCalendar.WEEKDAY_NAMES),
+                                 write_only=True, required=False)
+    running_days = serializers.SerializerMethodField()
+    exceptions = ServiceExceptionSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = ServiceCalendar
+        fields = ['id', 'train', 'days', 'running_days', 'valid_from', 'valid_to',
+                  'exceptions', 'is_active']
+
+    def get_running_days(self, obj):
+        return [name for bit, name in enumerate(ServiceCalendar.WEEKDAY_NAMES) if obj.weekdays & (1 << bit)]
+
+    def validate(self, attrs):
+        days = attrs.pop('days', None)
+        if days is not None:
+            if not days:
+                raise InvalidInput(TrainRunMessage.CALENDAR_DAYS_REQUIRED)
+            attrs['weekdays'] = sum(1 << ServiceCalendar.WEEKDAY_NAMES.index(day) for day in set(days))
+        valid_from = attrs.get('valid_from', getattr(self.instance, 'valid_from', None))
+        valid_to = attrs.get('valid_to', getattr(self.instance, 'valid_to', None))
+        if valid_from and valid_to and valid_to < valid_from:
+            raise InvalidInput(TrainRunMessage.CALENDAR_RANGE_INVALID)
+        return attrs
+
+
+class TrainRunSerializer(serializers.ModelSerializer):
+    """
+    Read-only view of a dated train run.
+    """
+    train_number = serializers.CharField(source='train.number', read_only=True)
+    train_name = serializers.CharField(source='train.name', read_only=True)
+    from_station_code = serializers.CharField(source='from_station.code', read_only=True)
+
+    class Meta:
+        model = TrainRun
+        fields = ['id', 'train_number', 'train_name', 'run_date', 'from_station_code',
+                  'departure_time', 'status']
+
+
+class DelayUpdateSerializer(serializers.Serializer):
+    """
+    One running-status report: the train is `delay_minutes` late (negative
+    = early) arriving at or departing from `station_code` on `run_date`.
+    """
+    train_number = serializers.CharField(max_length=10)
+    run_date = serializers.DateField()
+    station_code = serializers.CharField(max_length=10)
+    delay_minutes = serializers.IntegerField(min_value=-120, max_value=2880)
+    event = serializers.ChoiceField(choices=['arrival', 'departure'], default='arrival')
+
+
+class TrainRunStopSerializer(serializers.ModelSerializer):
+    """
+    Current running status of one stop of a dated run.
+    """
+    station_code = serializers.CharField(source='station.code', read_only=True)
+
+    class Meta:
+        model = TrainRunStop
+        fields = ['stop_number', 'station_code', 'scheduled_arrival', 'scheduled_departure',
+                  'arrival_delay', 'departure_delay', 'expected_arrival', 'expected_departure']
+
+
+class CoachLayoutSerializer(serializers.ModelSerializer):
+    """
+    Seat layout of a coach type; `berths` has one berth type code per seat.
+    """
+    seats = serializers.ReadOnlyField()
+
+    class Meta:
+        model = CoachLayout
+        fields = ['id', 'code', 'name', 'travel_class', 'berths', 'seats']
+
+    def validate_code(self, value):
+        return value.strip().upper()
+
+    def validate_berths(self, value):
+        value = value.strip().upper()
+        if not value:
+            raise InvalidInput(CoachMessage.BERTHS_REQUIRED)
+        if set(value) - set(CoachLayout.BERTH_TYPES):
+            raise InvalidInput(CoachMessage.BERTHS_INVALID.format(codes=''.join(CoachLayout.BERTH_TYPES)))
+        return value
+
+
+class TrainCoachSerializer(serializers.Serializer):
+    """
+    One coach of a composition: its label (e.g. 'S1') and layout code.
+    """
+    label = serializers.CharField(max_length=5)
+    layout = serializers.SlugRelatedField(slug_field='code', queryset=CoachLayout.objects.all())
+
+    def validate_label(self, value):
+        return value.strip().upper()
+
+
+class CompositionSerializer(serializers.Serializer):
+    """
+    A train's complete coach composition, in rake order.
+    """
+    coaches = TrainCoachSerializer(many=True)
+
+    def validate_coaches(self, value):
+        if not value:
+            raise InvalidInput(CoachMessage.COACHES_REQUIRED)
+        return value
@@ -0,0 +1,126 @@
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+from .departure_board import invalidate_stations, invalidate_train
+from .events import has_subscribers, publish, station_topic, train_topic
+from .models import Station, Train, TrainStation
+from .segments import invalidate_profiles
+
+# Sent by scheduling.materialize_runs, inside its transaction, with the ids
+# (`run_ids`) of scheduled runs it cancelled because they left their calendar.
+runs_dropped = Signal()
+
+# Sent before a change that renumbers a train's stops or seats (stops
+# inserted, moved or removed; a new composition; an edited layout) with the
+# `train_ids` concerned. Bookings refer to stops and seats by number, so a
+# receiver raises an APIException to refuse the change while they exist.
+renumbering = Signal()
+
+
+@receiver(pre_save, sender=TrainStation)
+def remember_previous_station(sender, instance, **kwargs):
+    """
+    Record the station a stop pointed at before this save, so moving a stop
+    refreshes the board it left as well as the one it joined.
+    """
+    instance._previous_station_id = None
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and update_fields.isdisjoint({'station', 'station_id'}):
+        return
+    if instance.pk and not kwargs.get('raw'):
+        instance._previous_station_id = (TrainStation.objects.filter(pk=instance.pk)
+                                         .values_list('station_id', flat=True).first())
+
+
+@receiver(post_save, sender=TrainStation)
+@receiver(post_delete, sender=TrainStation)
+def refresh_stop_boards(sender, instance, **kwargs):
+    """
+    Invalidate the departure boards touched by a stop, and the train's route
+    profile, once the change commits. Unless the save only touched other
+    fields, the whole route is refreshed because adding, removing or
+    renumbering a stop can move the train's first and last stop, which only
+    depart or only arrive.
+    """
+    station_ids = {instance.station_id, getattr(instance, '_previous_station_id', None)} - {None}
+    train_id = instance.train_id
+    update_fields = kwargs.get('update_fields')
+    whole_route = update_fields is None or not update_fields.isdisjoint({'is_active', 'stop_number'})
+
+    def invalidate():
+        if whole_route:
+            station_ids.update(TrainStation.objects.active().filter(train_id=train_id)
+                               .values_list('station_id', flat=True))
+        invalidate_stations(station_ids)
+        invalidate_profiles([train_id])
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_save, sender=Train)
+def refresh_train_boards(sender, instance, **kwargs):
+    """
+    Train name, number, terminus or active flag show on every board along its route.
+    """
+    transaction.on_commit(lambda: invalidate_train(instance.pk))
+
+
+@receiver(post_save, sender=Station)
+def refresh_station_boards(sender, instance, **kwargs):
+    """
+    A station's code is shown as origin/destination on the boards of every
+    station served by trains starting or ending there.
+    """
+    def invalidate():
+        trains = Train.objects.filter(Q(from_station=instance) | Q(to_station=instance))
+        station_ids = set(TrainStation.objects.active().filter(train__in=trains)
+                          .values_list('station_id', flat=True))
+        invalidate_stations(station_ids | {instance.pk})
+    transaction.on_commit(invalidate)
+
+
+def _stop_event(stop, deleted=False):
+    # Use the related rows only when already loaded; otherwise fetch just the column.
+    train_number = (stop.train.number if TrainStation.train.is_cached(stop) else
+                    Train.objects.filter(pk=stop.train_id).values_list('number', flat=True).first())
+    station_code = (stop.station.code if TrainStation.station.is_cached(stop) else
+                    Station.objects.filter(pk=stop.station_id).values_list('code', flat=True).first())
+    return {
+        'train_number': train_number,
+        'station_code': station_code,
+        'stop_number': stop.stop_number,
+        'arrival_time': stop.arrival_time,
+        'departure_time': stop.departure_time,
+        'arrival_day': stop.arrival_day,
+        'departure_day': stop.departure_day,
+        'is_active': stop.is_active and not deleted,
+    }
+
+
+@receiver(post_save, sender=TrainStation)
+@receiver(post_delete, sender=TrainStation)
+def push_route_change(sender, instance, **kwargs):
+    """
+    Tell subscribers of the train and of the station that a stop changed.
+    Skipped when nobody is subscribed.
+    """
+    if not has_subscribers():
+        return
+    data = _stop_event(instance, deleted=kwargs.get('signal') is post_delete)
+    topics = [train_topic(data['train_number']), station_topic(data['station_code'])]
+    transaction.on_commit(lambda: publish('route.updated', topics, data))
+
+
+@receiver(post_save, sender=Train)
+def push_train_change(sender, instance, created, **kwargs):
+    data = {'number': instance.number, 'name': instance.name, 'is_active': instance.is_active,
+            'from_station_id': instance.from_station_id, 'to_station_id': instance.to_station_id}
+    event_type = 'train.created' if created else 'train.updated' if instance.is_active else 'train.deleted'
+    transaction.on_commit(lambda: publish(event_type, [train_topic(instance.number)], data))
+
+
+@receiver(post_save, sender=Station)
+def push_station_change(sender, instance, created, **kwargs):
+    data = {'code': instance.code, 'name': instance.name, 'is_active': instance.is_active}
+    event_type = 'station.created' if created else 'station.updated' if instance.is_active else 'station.deleted'
+    transaction.on_commit(lambda: publish(event_type, [station_topic(instance.code)], data))
@@ -1,3 +1,125 @@
+from datetime import time
 from django.test import TestCase
+from rest_framework.test import APIClient
+from accounts.models import Role, User
+from .exceptions import InvalidInput
+from .models import Station, Train, TrainStation
+from .routes import diff_route
 
-# Create your tests here.
+
+def wanted(station, hour, minutes=5):
+    return {'station': station, 'arrival_time': time(hour, 0), 'departure_time': time(hour, minutes),
+            'arrival_day': 0, 'departure_day': 0}
+
+
+class DiffRouteTests(TestCase):
+    """
+    diff_route on in-memory rows: nothing here touches the database.
+    """
+
+    def setUp(self):
+        self.stations = [Station(pk=pk, code=f"D{pk}", name=f"Diff {pk}") for pk in range(1, 6)]
+        self.current = [TrainStation(pk=100 + number, station_id=station.pk, stop_number=number,
+                                     arrival_time=time(number, 0), departure_time=time(number, 5),
+                                     arrival_day=0, departure_day=0)
+                        for number, station in enumerate(self.stations[:3], start=1)]
+
+    def test_same_route_is_unchanged(self):
+        desired = [wanted(station, number) for number, station in enumerate(self.stations[:3], start=1)]
+        self.assertEqual(diff_route(self.current, desired), ([], [], [], 3))
+
+    def test_insert(self):
+        desired = [wanted(station, number) for number, station in enumerate(self.stations[:4], start=1)]
+        inserts, updates, removals, unchanged = diff_route(self.current, desired)
+        self.assertEqual([(stop.station_id, stop.stop_number) for stop in inserts], [(4, 4)])
+        self.assertEqual((updates, removals, unchanged), ([], [], 3))
+
+    def test_update_times_keeps_row(self):
+        desired = [wanted(self.stations[0], 1), wanted(self.stations[1], 2, minutes=20), wanted(self.stations[2], 3)]
+        inserts, updates, removals, unchanged = diff_route(self.current, desired)
+        self.assertEqual([(stop.pk, stop.departure_time) for stop in updates], [(102, time(2, 20))])
+        self.assertEqual((inserts, removals, unchanged), ([], [], 2))
+
+    def test_move(self):
+        first, second, third = self.stations[:3]
+        desired = [wanted(first, 1), wanted(third, 2), wanted(second, 3)]
+        inserts, updates, removals, unchanged = diff_route(self.current, desired)
+        self.assertEqual(sorted((stop.pk, stop.stop_number) for stop in updates), [(102, 3), (103, 2)])
+        self.assertEqual((inserts, removals, unchanged), ([], [], 1))
+
+    def test_deactivate(self):
+        first, _, third = self.stations[:3]
+        desired = [wanted(first, 1), wanted(third, 2)]
+        inserts, updates, removals, unchanged = diff_route(self.current, desired)
+        self.assertEqual([stop.pk for stop in removals], [102])
+        self.assertEqual([(stop.pk, stop.stop_number) for stop in updates], [(103, 2)])
+        self.assertEqual((inserts, unchanged), ([], 1))
+
+    def test_readding_soft_deleted_station_inserts_new_row(self):
+        # Station 2 was soft-deleted and station 3 moved up; only active rows are
+        # passed in, so re-adding station 2 inserts a fresh row.
+        self.current[2].stop_number = 2
+        active = [self.current[0], self.current[2]]
+        desired = [wanted(station, number) for number, station in enumerate(self.stations[:3], start=1)]
+        inserts, updates, removals, unchanged = diff_route(active, desired)
+        self.assertEqual([(stop.pk, stop.station_id, stop.stop_number) for stop in inserts], [(None, 2, 2)])
+        self.assertEqual([(stop.pk, stop.stop_number) for stop in updates], [(103, 3)])
+        self.assertEqual((removals, unchanged), ([], 1))
+
+    def test_duplicate_station_rejected(self):
+        with self.assertRaises(InvalidInput):
+            diff_route(self.current, [wanted(self.stations[0], 1), wanted(self.stations[0], 2)])
+
+
+class ReplaceRouteApiTests(TestCase):
+    """
+    PUT /api/admin/train-stations/train/<number>/route/
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.stations = [Station.objects.create(code=code, name=f"Station {code}") for code in ('RA', 'RB', 'RC', 'RD')]
+        cls.train = Train.objects.create(name='Route Express', from_station=cls.stations[0],
+                                         to_station=cls.stations[-1])
+        for number, station in enumerate(cls.stations, start=1):
+            TrainStation.objects.create(train=cls.train, station=station, stop_number=number,
+                                        arrival_time=time(number, 0), departure_time=time(number, 5))
+        role, _ = Role.objects.get_or_create(name=Role.ADMIN)
+        cls.admin = User.objects.create_user(username='router', email='router@example.com',
+                                             mobile_number='9876543212', first_name='Router',
+                                             password='secret123', role=role)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def put_route(self, *stops):
+        return self.client.put(f'/api/admin/train-stations/train/{self.train.number}/route/',
+                               {'stops': [{'station': station.pk, 'arrival_time': f'{hour:02d}:00',
+                                           'departure_time': f'{hour:02d}:05'} for station, hour in stops]},
+                               format='json')
+
+    def route(self):
+        return list(TrainStation.objects.filter(train=self.train, is_active=True)
+                    .order_by('stop_number').values_list('station__code', 'stop_number'))
+
+    def test_reorder_and_remove(self):
+        first, second, third, fourth = self.stations
+        ids_before = dict(TrainStation.objects.filter(train=self.train).values_list('station_id', 'pk'))
+        response = self.put_route((first, 1), (third, 2), (second, 3))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data'], {'inserted': 0, 'updated': 2, 'deactivated': 1, 'unchanged': 1})
+        self.assertEqual(self.route(), [('RA', 1), ('RC', 2), ('RB', 3)])
+        self.assertEqual(dict(TrainStation.objects.filter(train=self.train, is_active=True)
+                              .values_list('station_id', 'pk')),
+                         {station.pk: ids_before[station.pk] for station in (first, second, third)})
+        self.assertFalse(TrainStation.objects.get(pk=ids_before[fourth.pk]).is_active)
+
+        response = self.put_route((first, 1), (third, 2), (second, 3), (fourth, 4))
+        self.assertEqual(response.json()['data'], {'inserted': 1, 'updated': 0, 'deactivated': 0, 'unchanged': 3})
+        self.assertEqual(self.route(), [('RA', 1), ('RC', 2), ('RB', 3), ('RD', 4)])
+
+    def test_route_needs_two_stops(self):
+        response = self.put_route((self.stations[0], 1))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(self.route()), 4)
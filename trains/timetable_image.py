@@ -0,0 +1,409 @@
+"""
+Read-only timetable image shared by all workers through mmap.
+
+``build_image`` writes the active stations, trains and ordered stops to one
+binary file: a header, fixed-size struct arrays and a UTF-8 string table.
+Every worker maps that file read-only (``timetable.open()`` from
+``TrainsConfig.ready``), so the pages are shared by all processes on the host
+instead of each worker building its own copy from the database. Lookups
+bisect the sorted arrays in place; nothing is unpacked up front. The
+departure boards (trains.departure_board) load from the image when it is
+current and from the database otherwise.
+
+Layout (little-endian, see the *_RECORD structs):
+    header
+    stations   sorted by id, each pointing at its slice of `calls`
+    codes      station indexes sorted by code
+    trains     sorted by id, each pointing at its slice of `stops`
+    numbers    train indexes sorted by number
+    stops      grouped by train in stop order
+    calls      stop indexes grouped by station, in train order
+    strings
+
+A rebuild writes a temporary file next to the image and renames it over the
+old one, which is atomic. Readers check the file's identity at most every
+CHECK_SECONDS and remap when it changed; an old mapping stays valid for
+whoever still holds it.
+
+Every committed outbox record bumps a version counter in the shared cache
+(``mark_changed``) and records when it did. The image stores the version it
+was built at and counts as current only while the two match, so boards
+never show a timetable older than the last commit. The price is that after
+every change boards read the database until the next build. The outbox
+relay calls ``refresh_image`` on every poll, outside any transaction, and
+rebuilds a stale image once changes have been quiet for DEBOUNCE_SECONDS,
+so a burst of edits (a route replacement, a seeding run) costs one build
+and the database window is roughly the debounce plus the build time. Under
+continuous edits it still rebuilds every REBUILD_SECONDS, since a full
+build of a large network takes tens of seconds.
+"""
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import time as dt_time
+from django.conf import settings
+from django.core.cache import cache
+from .models import Station, Train, TrainStation
+
+logger = logging.getLogger('request_logger')
+
+MAGIC = b'TTIMG\x00\x00\x02'
+# magic, built_at, version, then counts: stations, trains, stops, string bytes
+HEADER = struct.Struct('<8sqqIIII')
+# id, code offset/length, name offset/length, first call, call count
+STATION_RECORD = struct.Struct('<qIHIHII')
+# id, number offset/length, name offset/length, from/to station index, first stop, stop count
+TRAIN_RECORD = struct.Struct('<qIHIHIIII')
+# train index, station index, stop number, arrival and departure in seconds of the
+# day, arrival and departure day
+STOP_RECORD = struct.Struct('<IIHIIHH')
+INDEX = struct.Struct('<I')
+
+VERSION_KEY = 'timetable_image:version'
+CHANGED_AT_KEY = 'timetable_image:changed_at'
+
+
+def current_version():
+    """
+    The timetable version. A missing counter (new or evicted cache) starts
+    from the clock, so no earlier image can match it.
+    """
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def mark_changed():
+    """
+    Bump the timetable version: images built before it are stale.
+    """
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        current_version()
+    cache.set(CHANGED_AT_KEY, time.time(), timeout=None)
+
+
+class _Strings:
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = {}
+
+    def add(self, value):
+        encoded = value.encode()
+        if encoded not in self.offsets:
+            self.offsets[encoded] = len(self.data)
+            self.data += encoded
+        return self.offsets[encoded], len(encoded)
+
+
+def build_image(path=None):
+    """
+    Write the current active timetable to `path` (default
+    TIMETABLE_IMAGE['PATH']) atomically. Returns the record counts.
+    """
+    path = path or settings.TIMETABLE_IMAGE['PATH']
+    # Read before the data: a change committed during the build leaves the image stale.
+    version = current_version()
+    stations = list(Station.objects.active().order_by('pk').values_list('pk', 'code', 'name'))
+    station_index = {pk: index for index, (pk, _, _) in enumerate(stations)}
+    trains = list(Train.objects.active().filter(from_station__in=station_index, to_station__in=station_index)
+                  .order_by('pk').values_list('pk', 'number', 'name', 'from_station_id', 'to_station_id'))
+    train_index = {train[0]: index for index, train in enumerate(trains)}
+    stops = list(TrainStation.objects.active().filter(train_id__in=train_index, station_id__in=station_index)
+                 .order_by('train_id', 'stop_number')
+                 .values_list('train_id', 'station_id', 'stop_number', 'arrival_day', 'arrival_time',
+                             'departure_day', 'departure_time'))
+
+    strings = _Strings()
+    stop_records, first_stop, stop_count = [], {}, defaultdict(int)
+    calls_by_station = defaultdict(list)
+    for position, (train_id, station_id, stop_number, arrival_day, arrival, departure_day, departure) \
+            in enumerate(stops):
+        first_stop.setdefault(train_id, position)
+        stop_count[train_id] += 1
+        calls_by_station[station_index[station_id]].append(position)
+        stop_records.append(STOP_RECORD.pack(train_index[train_id], station_index[station_id], stop_number,
+                                             _seconds(arrival), _seconds(departure),
+                                             arrival_day, departure_day))
+    calls, station_records = [], []
+    for index, (pk, code, name) in enumerate(stations):
+        station_calls = calls_by_station.get(index, [])
+        station_records.append(STATION_RECORD.pack(pk, *strings.add(code), *strings.add(name),
+                                                   len(calls), len(station_calls)))
+        calls.extend(station_calls)
+    train_records = [TRAIN_RECORD.pack(pk, *strings.add(number), *strings.add(name),
+                                       station_index[from_id], station_index[to_id],
+                                       first_stop.get(pk, 0), stop_count[pk])
+                     for pk, number, name, from_id, to_id in trains]
+    codes = sorted(range(len(stations)), key=lambda index: stations[index][1])
+    numbers = sorted(range(len(trains)), key=lambda index: trains[index][1])
+
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.timetable-')
+    try:
+        with os.fdopen(fd, 'wb') as image:
+            image.write(HEADER.pack(MAGIC, int(time.time()), version, len(stations), len(trains), len(stops),
+                                    len(strings.data)))
+            image.write(b''.join(station_records))
+            image.write(b''.join(INDEX.pack(index) for index in codes))
+            image.write(b''.join(train_records))
+            image.write(b''.join(INDEX.pack(index) for index in numbers))
+            image.write(b''.join(stop_records))
+            image.write(b''.join(INDEX.pack(position) for position in calls))
+            image.write(strings.data)
+            image.flush()
+            os.fsync(image.fileno())
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    counts = {'stations': len(stations), 'trains': len(trains), 'stops': len(stops)}
+    logger.info(f"Timetable image written to {path}: {counts}")
+    return counts
+
+
+def _seconds(value):
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+def _time(seconds):
+    return dt_time(seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+
+class TimetableImage:
+    """
+    One mapped image file. All lookups read straight from the mapping.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as image:
+            self.identity = os.fstat(image.fileno())
+            self._map = mmap.mmap(image.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.built_at, self.version, *counts = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a timetable image")
+        self.station_count, self.train_count, self.stop_count, _ = counts
+        offset = HEADER.size
+        self._stations, offset = offset, offset + STATION_RECORD.size * self.station_count
+        self._codes, offset = offset, offset + INDEX.size * self.station_count
+        self._trains, offset = offset, offset + TRAIN_RECORD.size * self.train_count
+        self._numbers, offset = offset, offset + INDEX.size * self.train_count
+        self._stops, offset = offset, offset + STOP_RECORD.size * self.stop_count
+        self._calls, offset = offset, offset + INDEX.size * self.stop_count
+        self._strings = offset
+
+    def _string(self, offset, length):
+        start = self._strings + offset
+        return self._map[start:start + length].decode()
+
+    def _station_record(self, index):
+        return STATION_RECORD.unpack_from(self._map, self._stations + index * STATION_RECORD.size)
+
+    def _train_record(self, index):
+        return TRAIN_RECORD.unpack_from(self._map, self._trains + index * TRAIN_RECORD.size)
+
+    def _search(self, count, key_at, key):
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            if key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low if low < count and key_at(low) == key else None
+
+    def _station_index(self, station_id):
+        return self._search(self.station_count, lambda index: self._station_record(index)[0], station_id)
+
+    def _train_index(self, train_id):
+        return self._search(self.train_count, lambda index: self._train_record(index)[0], train_id)
+
+    def _station(self, index):
+        pk, code_offset, code_length, name_offset, name_length, _, _ = self._station_record(index)
+        return {'id': pk, 'code': self._string(code_offset, code_length),
+                'name': self._string(name_offset, name_length)}
+
+    def _train(self, index):
+        pk, number_offset, number_length, name_offset, name_length, from_index, to_index, _, _ = \
+            self._train_record(index)
+        return {'id': pk, 'number': self._string(number_offset, number_length),
+                'name': self._string(name_offset, name_length),
+                'from_station_id': self._station_record(from_index)[0],
+                'to_station_id': self._station_record(to_index)[0]}
+
+    def _stop(self, position):
+        _, station_index, stop_number, arrival, departure, arrival_day, departure_day = \
+            STOP_RECORD.unpack_from(self._map, self._stops + position * STOP_RECORD.size)
+        return {'station_id': self._station_record(station_index)[0], 'stop_number': stop_number,
+                'arrival_time': _time(arrival), 'arrival_day': arrival_day,
+                'departure_time': _time(departure), 'departure_day': departure_day}
+
+    def station(self, station_id):
+        index = self._station_index(station_id)
+        return None if index is None else self._station(index)
+
+    def station_by_code(self, code):
+        code = code.upper()
+
+        def code_at(position):
+            index = INDEX.unpack_from(self._map, self._codes + position * INDEX.size)[0]
+            record = self._station_record(index)
+            return self._string(record[1], record[2])
+        position = self._search(self.station_count, code_at, code)
+        if position is None:
+            return None
+        return self._station(INDEX.unpack_from(self._map, self._codes + position * INDEX.size)[0])
+
+    def train(self, train_id):
+        index = self._train_index(train_id)
+        return None if index is None else self._train(index)
+
+    def train_by_number(self, number):
+        def number_at(position):
+            index = INDEX.unpack_from(self._map, self._numbers + position * INDEX.size)[0]
+            record = self._train_record(index)
+            return self._string(record[1], record[2])
+        position = self._search(self.train_count, number_at, number)
+        if position is None:
+            return None
+        return self._train(INDEX.unpack_from(self._map, self._numbers + position * INDEX.size)[0])
+
+    def stops(self, train_id):
+        """
+        The train's active stops in order, or None for an unknown train.
+        """
+        index = self._train_index(train_id)
+        if index is None:
+            return None
+        first, count = self._train_record(index)[7:]
+        return [self._stop(position) for position in range(first, first + count)]
+
+    def calls(self, station_id):
+        """
+        (train_id, stop) for every stop at the station, or None for an unknown station.
+        """
+        index = self._station_index(station_id)
+        if index is None:
+            return None
+        first, count = self._station_record(index)[5:]
+        result = []
+        for call in range(first, first + count):
+            position = INDEX.unpack_from(self._map, self._calls + call * INDEX.size)[0]
+            train_index = STOP_RECORD.unpack_from(self._map, self._stops + position * STOP_RECORD.size)[0]
+            result.append((self._train_record(train_index)[0], self._stop(position)))
+        return result
+
+    def board_calls(self, station_id):
+        """
+        Every stop at the station with the departure board's train columns:
+        dicts of train_number, train_name, from_station, to_station (codes),
+        the stop fields and `last` (the train's final stop). None for an
+        unknown station.
+        """
+        index = self._station_index(station_id)
+        if index is None:
+            return None
+        first, count = self._station_record(index)[5:]
+        codes, result = {}, []
+        for call in range(first, first + count):
+            position = INDEX.unpack_from(self._map, self._calls + call * INDEX.size)[0]
+            train_index = STOP_RECORD.unpack_from(self._map, self._stops + position * STOP_RECORD.size)[0]
+            _, number_offset, number_length, name_offset, name_length, from_index, to_index, \
+                first_stop, stop_count = self._train_record(train_index)
+            for station in (from_index, to_index):
+                if station not in codes:
+                    record = self._station_record(station)
+                    codes[station] = self._string(record[1], record[2])
+            result.append({'train_number': self._string(number_offset, number_length),
+                           'train_name': self._string(name_offset, name_length),
+                           'from_station': codes[from_index], 'to_station': codes[to_index],
+                           'last': position == first_stop + stop_count - 1,
+                           **self._stop(position)})
+        return result
+
+
+class SharedTimetable:
+    """
+    Process-wide handle on the current image. `image` returns the mapping,
+    remapping first if the file on disk was replaced, or None when no usable
+    image has been built.
+    """
+
+    def __init__(self):
+        self._image = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def open(self):
+        path = settings.TIMETABLE_IMAGE['PATH']
+        try:
+            identity = os.stat(path)
+        except FileNotFoundError:
+            logger.debug(f"No timetable image at {path}; run `python manage.py build_timetable_image`")
+            return None
+        with self._lock:
+            current = self._image
+            if current is None or (current.identity.st_ino, current.identity.st_mtime_ns) != \
+                    (identity.st_ino, identity.st_mtime_ns):
+                try:
+                    self._image = TimetableImage(path)
+                except ValueError as error:
+                    # e.g. written by an older release: ignored until rebuilt.
+                    logger.warning(f"Ignoring timetable image: {error}")
+                    self._image = None
+            self._checked_at = time.monotonic()
+        return self._image
+
+    @property
+    def image(self):
+        if time.monotonic() - self._checked_at >= settings.TIMETABLE_IMAGE['CHECK_SECONDS']:
+            self.open()
+        return self._image
+
+    def current(self):
+        """
+        The image if it reflects every committed change, else None.
+        """
+        image = self.image
+        if image is None or image.version != current_version():
+            return None
+        return image
+
+
+timetable = SharedTimetable()
+
+
+def refresh_image(min_age=None):
+    """
+    Rebuild the image if it is stale and either no change has been marked
+    for TIMETABLE_IMAGE['DEBOUNCE_SECONDS'] or it is at least
+    TIMETABLE_IMAGE['REBUILD_SECONDS'] old. An explicit `min_age` replaces
+    both: rebuild once the stale image is that many seconds old. Returns
+    whether it rebuilt.
+    """
+    options = settings.TIMETABLE_IMAGE
+    image = timetable.open()
+    if image is not None:
+        if image.version == current_version():
+            return False
+        now = time.time()
+        if min_age is not None:
+            due = now - image.built_at >= min_age
+        else:
+            due = (now - cache.get(CHANGED_AT_KEY, 0) >= options['DEBOUNCE_SECONDS']
+                   or now - image.built_at >= options['REBUILD_SECONDS'])
+        if not due:
+            return False
+    build_image()
+    timetable.open()
+    return True
@@ -1,18 +1,26 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import StationViewSet, TrainViewSet, TrainStationViewSet
+from .views import (StationViewSet, TrainViewSet, TrainStationViewSet, ServiceCalendarViewSet,
+                    TrainRunViewSet, StationBoardView, CoachLayoutViewSet, TrainSegmentView)
 
 router = DefaultRouter()
 router.register(r'stations', StationViewSet)
 router.register(r'trains', TrainViewSet)
 router.register(r'train-stations', TrainStationViewSet)
+router.register(r'service-calendars', ServiceCalendarViewSet)
+router.register(r'train-runs', TrainRunViewSet)
+router.register(r'coach-layouts', CoachLayoutViewSet)
 
 # Custom views for delete-all-stops and delete-stop
 trainstation_delete_all_stops = TrainStationViewSet.as_view({'delete': 'delete_all_stops'})
 trainstation_delete_stop = TrainStationViewSet.as_view({'delete': 'delete_stop'})
+trainstation_replace_route = TrainStationViewSet.as_view({'put': 'replace_route'})
 
 urlpatterns = [
     path('admin/', include(router.urls)),
+    path('stations/<str:code>/board/', StationBoardView.as_view(), name='station-board'),
+    path('trains/<str:number>/segment/', TrainSegmentView.as_view(), name='train-segment'),
     path('admin/train-stations/train/<str:pk>/delete-all-stops/', trainstation_delete_all_stops, name='trainstation-delete-all-stops'),
+    path('admin/train-stations/train/<str:pk>/route/', trainstation_replace_route, name='trainstation-replace-route'),
     path('admin/train-stations/train/<str:train_number>/station/<str:station_code>/delete-stop/', trainstation_delete_stop, name='trainstation-delete-stop'),
 ]
\ No newline at end of file
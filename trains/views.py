@@ -1,21 +1,45 @@
 from rest_framework import viewsets, filters, status
 from rest_framework.response import Response
-from django.db import models
-from .models import Station, Train, TrainStation
-from .serializers import StationSerializer, TrainSerializer, TrainStationSerialzer
+from .models import (Station, Train, TrainStation, ServiceCalendar, ServiceException, TrainRun,
+                     CoachLayout)
+from .serializers import (StationSerializer, TrainSerializer, TrainStationSerialzer,
+                          ServiceCalendarSerializer, ServiceExceptionSerializer, TrainRunSerializer,
+                          DelayUpdateSerializer, TrainRunStopSerializer, RouteReplaceSerializer,
+                          CoachLayoutSerializer, CompositionSerializer, StopTimesSerializer)
+from .scheduling import materialize_runs
+from .delays import ingest_delays
+from .routes import replace_route
+from .seatmap import get_seat_map, set_composition, layout_changed
+from .segments import get_route_profile
+from .events import publish, train_topic
+from .signals import renumbering
+from .fieldsets import SparseQuerysetMixin
+from .departure_board import board, BOARD_TYPES, DEPARTURES, invalidate_train, seconds_of_day
+from django.conf import settings
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_page
+from datetime import date, datetime
 from .permissions import IsAdminUser
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.views import APIView
 from rest_framework.decorators import action
 from .exceptions import (DoesNotExists, InvalidInput, QueryParameterMissing
-                         , AlreadyExists, NotFound)
+                         , AlreadyExists, NotFound, map_integrity_errors)
+from rest_framework.exceptions import APIException
 from utils.constants import (StationMessage, TrainMessage, GeneralMessage, 
-                             TrainStationMessage)
+                             TrainStationMessage, TrainRunMessage, DepartureBoardMessage, CoachMessage,
+                             SegmentMessage)
 from django.db import transaction
+from django.db.models import ProtectedError
+from accounts.throttling import IPTokenBucketThrottle
+from accounts.idempotency import idempotent
+from utils.renderers import StreamingListMixin
 import logging
 
 logger = logging.getLogger('request_logger')
 
-class StationViewSet(viewsets.ModelViewSet):
+class StationViewSet(SparseQuerysetMixin, StreamingListMixin, viewsets.ModelViewSet):
     """
     ViewSet to manage CRUD operations for stations.
 
@@ -27,14 +51,16 @@ class StationViewSet(viewsets.ModelViewSet):
             Retrieves station by exact code.
     """
      
-    queryset = Station.objects.filter(is_active=True)
+    queryset = Station.objects.active()
     serializer_class = StationSerializer
     permission_classes = [IsAuthenticated, IsAdminUser]
     filter_backends = [filters.SearchFilter] # Adding search filter
     serach_fields = ['name'] # Allows searching on name field
+    throttle_scope = 'search'
 
 
-    @action(detail=False,methods=['get'], url_path='by-name')
+    @action(detail=False,methods=['get'], url_path='by-name',
+            throttle_classes=[IPTokenBucketThrottle])
     def get_by_name(self, request):
         """
         Search for stations by name (case-insensitive, partial allowed).
@@ -55,7 +81,8 @@ class StationViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, status=status.HTTP_200_OK)
     
 
-    @action(detail=False, methods=['get'], url_path='by-code')
+    @action(detail=False, methods=['get'], url_path='by-code',
+            throttle_classes=[IPTokenBucketThrottle])
     def get_by_code(self, request):
         """
         Search for a station by exact code (case-insensitive).
@@ -81,15 +108,14 @@ class StationViewSet(viewsets.ModelViewSet):
         """
         instance = self.get_object()
         logger.info(f"Request to delete station: {instance.name} (ID: {instance.id})")
-        instance.is_active = False
-        instance.save()
+        instance.soft_delete()
         logger.info(f"Station deleted successfully: {instance.name} (ID: {instance.id})")
         return Response({'succes' : True,
                          'message' : StationMessage.STATION_DELETED_SUCCESSFULLY},
                          status=status.HTTP_204_NO_CONTENT)
     
 
-class TrainViewSet(viewsets.ModelViewSet):
+class TrainViewSet(SparseQuerysetMixin, StreamingListMixin, viewsets.ModelViewSet):
     """
     ViewSet to manage CRUD operations for trains.
 
@@ -98,12 +124,14 @@ class TrainViewSet(viewsets.ModelViewSet):
     - Returns only active trains by default.
     - Restricted to authenticated admin users only.
     """
-    queryset = Train.objects.filter(is_active=True)
+    queryset = Train.objects.active().select_related('from_station', 'to_station')
     serializer_class = TrainSerializer
     permission_classes = [IsAdminUser, IsAuthenticated]
+    throttle_scope = 'search'
 
 
-    @action(detail=False, methods=['get'], url_path='by-number')
+    @action(detail=False, methods=['get'], url_path='by-number',
+            throttle_classes=[IPTokenBucketThrottle])
     def search_by_number(self, request):
         """
         Search for a train using the train number.
@@ -126,13 +154,68 @@ class TrainViewSet(viewsets.ModelViewSet):
         Soft-delete a train by setting its is_active flag to False.
         """
         instance = self.get_object()
-        instance.is_active = False
-        instance.save()
+        instance.soft_delete()
         return Response({'succes' : True,
                          'message' : StationMessage.STATION_DELETED_SUCCESSFULLY},
                          status=status.HTTP_204_NO_CONTENT)
-    
-class TrainStationViewSet(viewsets.ModelViewSet):
+
+    @action(detail=True, methods=['get', 'put'], url_path='coaches')
+    def coaches(self, request, pk=None):
+        """
+        Read or replace the train's coach composition.
+        Example: PUT /api/admin/trains/<id>/coaches/
+            {"coaches": [{"label": "S1", "layout": "SL"}, {"label": "B1", "layout": "3A"}]}
+        """
+        train = self.get_object()
+        if request.method == 'PUT':
+            serializer = CompositionSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            seat_map = set_composition(train, serializer.validated_data['coaches'])
+            return Response({'success': True, 'message': CoachMessage.COMPOSITION_UPDATED,
+                             'data': seat_map.to_dict()})
+        return Response({'success': True, 'data': get_seat_map(train.pk).to_dict()})
+
+    @action(detail=True, methods=['get'], url_path='seat-map', permission_classes=[IsAuthenticated])
+    def seat_map(self, request, pk=None):
+        """
+        The train's seat map: coaches with their first seat index and one
+        berth type code per seat in `berths`. Seats taken on a run are served
+        by /api/bookings/seat-map/.
+        """
+        try:
+            train = Train.objects.active().only('pk').get(pk=pk)
+        except (Train.DoesNotExist, ValueError):
+            raise DoesNotExists(TrainMessage.TRAIN_NOT_FOUND)
+        return Response({'success': True, 'data': get_seat_map(train.pk).to_dict()})
+
+
+class CoachLayoutViewSet(viewsets.ModelViewSet):
+    """
+    ViewSet to manage coach layouts. Changing a layout refreshes the seat
+    count and seat map of every train whose composition uses it; layouts in
+    use cannot be deleted.
+    """
+    queryset = CoachLayout.objects.all().order_by('code')
+    serializer_class = CoachLayoutSerializer
+    permission_classes = [IsAdminUser, IsAuthenticated]
+
+    def perform_create(self, serializer):
+        with map_integrity_errors(AlreadyExists):
+            serializer.save()
+
+    def perform_update(self, serializer):
+        seats_changed = any(serializer.validated_data.get(field, getattr(serializer.instance, field))
+                            != getattr(serializer.instance, field) for field in ('berths', 'travel_class'))
+        with transaction.atomic(), map_integrity_errors(AlreadyExists):
+            layout_changed(serializer.save(), seats_changed=seats_changed)
+
+    def perform_destroy(self, instance):
+        try:
+            instance.delete()
+        except ProtectedError:
+            raise InvalidInput(CoachMessage.LAYOUT_IN_USE)
+
+class TrainStationViewSet(SparseQuerysetMixin, StreamingListMixin, viewsets.ModelViewSet):
     """
     ViewSet to manage train stops (stations) within a train route.
 
@@ -142,22 +225,24 @@ class TrainStationViewSet(viewsets.ModelViewSet):
     - Provides endpoints to fetch stops by train number.
     - Restricted to authenticated admin users only.
     """
-    queryset = TrainStation.objects.filter(is_active=True)
+    queryset = TrainStation.objects.active().select_related('train', 'station')
     serializer_class = TrainStationSerialzer
     permission_classes = [IsAdminUser, IsAuthenticated]
 
     @action(detail=False, methods=['post'], url_path='add-stop')
+    @idempotent
     def add_stop(self, request):
         """
         Add a station stop to a train's route, optionally specifying the stop number.
         """
 
         try:
-            train, station, arrival_time, departure_time, stop_number = self._validate_create_route_input(request.data)
-            self._validate_no_active_stop(train, station)
-            train_station = self._create_train_stop(train, station, arrival_time, departure_time, stop_number)
+            train, station, times, stop_number = self._validate_create_route_input(request.data)
+            train_station = self._create_train_stop(train, station, times, stop_number)
             serializer = self.get_serializer(train_station)
             return self._build_create_route_response(serializer)
+        except APIException as e:
+            return self._build_stop_error_response(e)
         except Exception as e:
             return self._build_create_route_error_response(e)
 
@@ -175,7 +260,7 @@ class TrainStationViewSet(viewsets.ModelViewSet):
         try:
             train = Train.objects.get(number=train_number)
         except Train.DoesNotExist:
-            raise NotFound(TrainMessage.TRAIN_WITH_NUMBER_NOT_EXIST.FORMAT(
+            raise NotFound(TrainMessage.TRAIN_WITH_NUMBER_NOT_EXIST.format(
                 train_number=train_number
             ))
         try:
@@ -184,36 +269,32 @@ class TrainStationViewSet(viewsets.ModelViewSet):
             raise NotFound(StationMessage.STATION_WITH_ID_NOT_EXISTS.format(
                 station_id=station_id
             ))
-        if arrival_time >= departure_time:
-            raise InvalidInput(TrainStationMessage.TRAIN_STATION_DEPARTURE_MUST_GREATER)
-        return train, station, arrival_time, departure_time, stop_number
-
-    def _validate_no_active_stop(self, train, station):
-        """
-        Ensure no existing active stop exists for the same train-station pair.
-        """
-        if TrainStation.objects.filter(train=train, station=station, is_active=True).exists():
-            raise AlreadyExists(TrainStationMessage.TRAIN_ROUTE_EXISTS)
+        # Parsed as times with day offsets; comparing the raw strings got
+        # "9:00" vs "10:00" and overnight halts wrong.
+        times = StopTimesSerializer(data=data)
+        times.is_valid(raise_exception=True)
+        return train, station, times.validated_data, stop_number
 
-    def _create_train_stop(self, train, station, arrival_time, departure_time, stop_number):
+    def _create_train_stop(self, train, station, times, stop_number):
         """
         Create a new train stop with proper stop_number sequencing using atomic transaction.
+        A duplicate active stop for the station is rejected by the
+        unique_active_train_station index and reported as AlreadyExists.
         """
-        with transaction.atomic():
+        with map_integrity_errors():
             if stop_number is None:
                 last_stop = TrainStation.objects.filter(train=train, is_active=True).order_by('-stop_number').first()
                 stop_number = 1 if last_stop is None else last_stop.stop_number + 1
             else:
                 stop_number = int(stop_number)
-                TrainStation.objects.filter(train=train, is_active=True, stop_number__gte=stop_number).update(
-                    stop_number=models.F('stop_number') + 1
-                )
+                if TrainStation.objects.filter(train=train, is_active=True, stop_number__gte=stop_number).exists():
+                    renumbering.send(sender=TrainStation, train_ids=[train.pk])
+                TrainStation.shift_stop_numbers(train, stop_number, 1)
             return TrainStation.objects.create(
                 train=train,
                 station=station,
-                arrival_time=arrival_time,
-                departure_time=departure_time,
-                stop_number=stop_number
+                stop_number=stop_number,
+                **times
             )
 
     def _build_create_route_response(self, serializer):
@@ -224,6 +305,20 @@ class TrainStationViewSet(viewsets.ModelViewSet):
                          'message': TrainStationMessage.TRAIN_STOP_ADDED, 
                          'data': serializer.data})
 
+    def _build_stop_error_response(self, error):
+        """
+        Return an APIException in the stop endpoints' {'success', 'error'} shape, keeping its status.
+        """
+        detail = error.detail
+        if isinstance(detail, dict) and 'error' in detail:
+            detail = detail['error']
+        elif isinstance(detail, dict):
+            detail = ' '.join(f"{field}: {' '.join(map(str, messages)) if isinstance(messages, list) else messages}"
+                              for field, messages in detail.items())
+        elif isinstance(detail, list):
+            detail = ' '.join(map(str, detail))
+        return Response({'success': False, 'error': str(detail)}, status=error.status_code)
+
     def _build_create_route_error_response(self, error):
         """
         Raise exception with error message for stop creation failure.
@@ -241,10 +336,16 @@ class TrainStationViewSet(viewsets.ModelViewSet):
             instance = self.get_object()
             serializer = self.get_serializer(instance, data=request.data, partial=True)
             serializer.is_valid(raise_exception=True)
+            data = serializer.validated_data
+            if data.get('stop_number', instance.stop_number) != instance.stop_number or \
+                    data.get('station', instance.station) != instance.station:
+                renumbering.send(sender=TrainStation, train_ids=[instance.train_id])
             serializer.save()
             return Response({'success': True, 
                              'message': TrainStationMessage.STOP_UPDATED_SUCCESSFULLY, 
                              'data': serializer.data})
+        except APIException as e:
+            return self._build_stop_error_response(e)
         except Exception as e:
             raise InvalidInput({'success': False, 
                              'error': str(e)})
@@ -255,8 +356,8 @@ class TrainStationViewSet(viewsets.ModelViewSet):
         Soft-delete a train stop by marking it inactive.
         """
         instance = self.get_object()
-        instance.is_active = False
-        instance.save()
+        renumbering.send(sender=TrainStation, train_ids=[instance.train_id])
+        instance.soft_delete()
         return Response({'succes' : True,
                          'message' : TrainStationMessage.TRAIN_STOP_DELETED},
                          status=status.HTTP_204_NO_CONTENT)
@@ -280,11 +381,10 @@ class TrainStationViewSet(viewsets.ModelViewSet):
                              format(
                                  train_number=train_number
                              )})
-        stops = TrainStation.objects.filter(train=train, is_active=True, station__is_active=True).order_by('stop_number')
-        serializer = self.get_serializer(stops, many=True)
-        return Response({'success': True, 
-                         'data': serializer.data},
-                         status=status.HTTP_200_OK)
+        stops = (TrainStation.objects.filter(train=train, is_active=True, station__is_active=True)
+                 .select_related('train', 'station').order_by('stop_number'))
+        stops = self.apply_fieldset(stops)
+        return self.streaming_response(stops, prefix=b'{"success":true,"data":[', suffix=b']}')
 
     @action(detail=False, methods=['delete'], url_path='train/(?P<train_number>[^/]+)/station/(?P<station_code>[^/]+)/delete-stop', url_name='delete-stop')
     def delete_stop(self, request, train_number=None, station_code=None):
@@ -320,15 +420,11 @@ class TrainStationViewSet(viewsets.ModelViewSet):
                                  train_number=train_number,
                                  station_code=station_code
                              )})
-        # Soft delete
-        stop.is_active = False
-        stop.save()
-        # Re-number remaining stops
-        active_stops = TrainStation.objects.filter(train=train, is_active=True).order_by('stop_number')
-        for idx, s in enumerate(active_stops, start=1):
-            if s.stop_number != idx:
-                s.stop_number = idx
-                s.save(update_fields=['stop_number'])
+        renumbering.send(sender=TrainStation, train_ids=[train.pk])
+        with transaction.atomic():
+            stop.soft_delete()
+            # Close the gap with one set-based shift of the later stops.
+            TrainStation.shift_stop_numbers(train, stop.stop_number + 1, -1)
         return Response({'success': True, 
                          'message': TrainStationMessage.TRAIN_STOP_DELETED.format(
                              station_code=station_code
@@ -351,12 +447,227 @@ class TrainStationViewSet(viewsets.ModelViewSet):
                              'error': TrainMessage.TRAIN_WITH_NUMBER_NOT_EXIST.format(
                                  train_number=train_number
                              )})
-        stops = TrainStation.objects.filter(train=train, is_active=True)
-        count = stops.count()
-        stops.update(is_active=False)
+        renumbering.send(sender=TrainStation, train_ids=[train.pk])
+        invalidate_train(train.id)
+        count = TrainStation.objects.filter(train=train).soft_delete()
+        # Queryset updates bypass the model signals, so announce the change here.
+        publish('route.updated', [train_topic(train.number)],
+                {'train_number': train.number, 'deleted_stops': count})
         return Response({'success': True, 
                          'message': TrainStationMessage.TRAIN_ROUTE_DELETED.format(
                              count=count,
                              train_number=train_number
                          )}, 
-                         status=204)
\ No newline at end of file
+                         status=204)
+
+    @action(detail=True, methods=['put'], url_path='route', url_name='replace-route')
+    def replace_route(self, request, pk=None):
+        """
+        Replace a train's whole route with the ordered list of stops given,
+        changing only the stops that differ.
+        Example: PUT /api/admin/train-stations/train/<train_number>/route/
+            {"stops": [{"station": 1, "arrival_time": "06:00", "departure_time": "06:05"}, ...]}
+        """
+        try:
+            train = Train.objects.active().get(number=pk)
+        except Train.DoesNotExist:
+            raise NotFound({'success': False,
+                             'error': TrainMessage.TRAIN_WITH_NUMBER_NOT_EXIST.format(
+                                 train_number=pk
+                             )})
+        serializer = RouteReplaceSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        summary = replace_route(train, serializer.validated_data['stops'])
+        return Response({'success': True,
+                         'message': TrainStationMessage.ROUTE_REPLACED.format(train_number=train.number),
+                         'data': summary})
+
+
+class ServiceCalendarViewSet(viewsets.ModelViewSet):
+    """
+    ViewSet to manage the days each train runs.
+
+    Creating or changing a calendar immediately re-materialises that train's
+    runs for the configured horizon.
+
+    Custom endpoints:
+        - `POST /api/admin/service-calendars/<id>/exceptions/`:
+            Add or replace a dated exception ({"date", "exception_type"}).
+    """
+    queryset = ServiceCalendar.objects.select_related('train').prefetch_related('exceptions')
+    serializer_class = ServiceCalendarSerializer
+    permission_classes = [IsAdminUser, IsAuthenticated]
+
+    def perform_create(self, serializer):
+        calendar = serializer.save()
+        self._refresh_runs(calendar)
+
+    def perform_update(self, serializer):
+        calendar = serializer.save()
+        self._refresh_runs(calendar)
+
+    def _refresh_runs(self, calendar):
+        """
+        Re-materialise runs for the calendar's train over the standard horizon.
+        """
+        result = materialize_runs(settings.TRAIN_RUN_HORIZON_DAYS, train_ids=[calendar.train_id])
+        logger.info(f"Calendar {calendar.id} saved for train {calendar.train_id}: "
+                    f"{TrainRunMessage.RUNS_GENERATED.format(**result)}")
+
+    @action(detail=True, methods=['post'], url_path='exceptions')
+    def add_exception(self, request, pk=None):
+        """
+        Add or replace a running-day exception for this calendar.
+        """
+        calendar = self.get_object()
+        serializer = ServiceExceptionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ServiceException.objects.update_or_create(
+            calendar=calendar, date=serializer.validated_data['date'],
+            defaults={'exception_type': serializer.validated_data['exception_type']})
+        self._refresh_runs(calendar)
+        return Response({'success': True,
+                         'message': TrainRunMessage.CALENDAR_EXCEPTION_SAVED},
+                        status=status.HTTP_200_OK)
+
+
+class TrainRunViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Read-only access to materialised train runs.
+
+    Usage:
+        - `GET /api/admin/train-runs/?date=2025-07-01` : all runs on a date.
+        - `&origin=MAS` : only runs originating at station MAS (covering index).
+        - `&station=SA` : runs whose route calls at station SA.
+        - `POST /api/admin/train-runs/delays/` : batch of running-status reports
+          ({"updates": [{"train_number", "run_date", "station_code",
+          "delay_minutes", "event"}]}), propagated downstream.
+        - `GET /api/admin/train-runs/<id>/running-status/` : expected times per stop.
+    """
+    queryset = TrainRun.objects.select_related('train', 'from_station')
+    serializer_class = TrainRunSerializer
+    permission_classes = [IsAdminUser, IsAuthenticated]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action != 'list':
+            return queryset
+        value = self.request.query_params.get('date')
+        if not value:
+            raise InvalidInput(TrainRunMessage.RUN_DATE_REQUIRED)
+        try:
+            run_date = date.fromisoformat(value)
+        except ValueError:
+            raise InvalidInput(TrainRunMessage.RUN_DATE_INVALID.format(value=value))
+        queryset = queryset.filter(run_date=run_date)
+        origin = self.request.query_params.get('origin')
+        if origin:
+            queryset = queryset.filter(from_station__code__iexact=origin)
+        station = self.request.query_params.get('station')
+        if station:
+            calling = TrainStation.objects.active().filter(station__code__iexact=station)
+            queryset = queryset.filter(train_id__in=calling.values('train_id'))
+        return queryset
+
+    @action(detail=False, methods=['post'], url_path='delays')
+    def report_delays(self, request):
+        """
+        Apply a batch of delay reports in order and return what was applied.
+        """
+        updates = request.data.get('updates') if isinstance(request.data, dict) else request.data
+        if not isinstance(updates, list) or not updates:
+            raise InvalidInput(TrainRunMessage.DELAY_UPDATES_REQUIRED)
+        max_batch = settings.DELAY_PROPAGATION['MAX_BATCH']
+        if len(updates) > max_batch:
+            raise InvalidInput(TrainRunMessage.DELAY_BATCH_TOO_LARGE.format(max_batch=max_batch))
+        serializer = DelayUpdateSerializer(data=updates, many=True)
+        serializer.is_valid(raise_exception=True)
+        result = ingest_delays(serializer.validated_data)
+        return Response({'success': True, **result}, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['get'], url_path='running-status')
+    def running_status(self, request, pk=None):
+        """
+        Current expected arrival/departure at every stop of the run.
+        """
+        run = self.get_object()
+        stops = run.stops.select_related('station')
+        if not stops:
+            raise NotFound(TrainRunMessage.RUN_NOT_STARTED)
+        return Response({'run': TrainRunSerializer(run).data,
+                         'reported_stop_number': run.reported_stop_number,
+                         'reported_at': run.reported_at,
+                         'stops': TrainRunStopSerializer(stops, many=True).data},
+                        status=status.HTTP_200_OK)
+
+
+class StationBoardView(APIView):
+    """
+    Public departure/arrival board for a station, served from in-memory
+    per-station arrays (see trains/departure_board.py).
+
+    Usage:
+        - `GET /api/stations/<code>/board/` : next departures from now.
+        - `?type=arrivals` : next arrivals instead.
+        - `?after=22:30&limit=20` : from a given time; the list wraps past
+          midnight and wrapped rows carry "next_day": true.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    @method_decorator(cache_page(settings.DEPARTURE_BOARD['CACHE_SECONDS']))
+    def get(self, request, code):
+        board_type = request.query_params.get('type', DEPARTURES)
+        if board_type not in BOARD_TYPES:
+            raise InvalidInput(DepartureBoardMessage.BOARD_TYPE_INVALID)
+        after = request.query_params.get('after')
+        if after:
+            try:
+                after = datetime.strptime(after, '%H:%M').time()
+            except ValueError:
+                raise InvalidInput(DepartureBoardMessage.BOARD_TIME_INVALID.format(value=after))
+        else:
+            after = timezone.localtime().time()
+        max_limit = settings.DEPARTURE_BOARD['MAX_LIMIT']
+        try:
+            limit = int(request.query_params.get('limit', settings.DEPARTURE_BOARD['DEFAULT_LIMIT']))
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= max_limit:
+            raise InvalidInput(DepartureBoardMessage.BOARD_LIMIT_INVALID.format(max_limit=max_limit))
+
+        station = Station.objects.active().filter(code__iexact=code).first()
+        if not station:
+            raise NotFound(StationMessage.STATION_WITH_CODE_NOT_EXISTS.format(station_code=code))
+        rows = board.get(station.id).next(board_type, seconds_of_day(after), limit)
+        return Response({'station_code': station.code,
+                         'station_name': station.name,
+                         'type': board_type,
+                         'after': after.strftime('%H:%M'),
+                         'results': rows},
+                        status=status.HTTP_200_OK)
+
+
+class TrainSegmentView(APIView):
+    """
+    Public segment query: stops, running time and halts between two
+    stations of a train, from its cached route profile (see
+    trains/segments.py).
+
+    Usage:
+        - `GET /api/trains/<number>/segment/?from=<code>&to=<code>`
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request, number):
+        from_code, to_code = request.query_params.get('from'), request.query_params.get('to')
+        if not from_code or not to_code:
+            raise InvalidInput(SegmentMessage.STATIONS_REQUIRED)
+        train = Train.objects.active().filter(number=number).values('pk', 'name').first()
+        if not train:
+            raise NotFound(TrainMessage.TRAIN_WITH_NUMBER_NOT_EXIST.format(train_number=number))
+        segment = get_route_profile(train['pk']).segment(from_code, to_code)
+        return Response({'success': True,
+                         'data': {'train_number': number, 'train_name': train['name'], **segment}},
+                        status=status.HTTP_200_OK)
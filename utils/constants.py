@@ -85,6 +85,101 @@ class TrainStationMessage:
     STOP_UPDATED_SUCCESSFULLY = 'Stop updated successfully.'
     ROUTE_VALIDATION_REQUIREMENTS = 'train, station, arrival_time, and departure_time are required.'
     TRAIN_ROUTE_EXISTS = "Active stop for station already exists in this train's route."
+    ROUTE_REPLACED = "Route for train '{train_number}' updated."
+    ROUTE_TOO_SHORT = "A route needs at least 2 stops."
+    ROUTE_STATIONS_NOT_FOUND = "Active stations not found: {station_ids}."
+    TRAIN_STATION_OUT_OF_ORDER = ("Stop {stop_number} arrives before the previous stop departs. "
+                                  "Set arrival_day/departure_day for stops after midnight.")
 
+# ----------- SERVICE CALENDAR / TRAIN RUN CONSTANTS ------------
+class TrainRunMessage:
+    RUN_DATE_REQUIRED = "date query parameter is required (YYYY-MM-DD)."
+    RUN_DATE_INVALID = "Invalid date '{value}'. Use YYYY-MM-DD."
+    CALENDAR_NOT_FOUND = "Service calendar not found."
+    CALENDAR_DAYS_REQUIRED = "At least one running day is required."
+    CALENDAR_RANGE_INVALID = "valid_to must not be before valid_from."
+    CALENDAR_EXCEPTION_SAVED = "Service exception saved."
+    RUNS_GENERATED = "Generated {upserted} runs, cancelled {cancelled}."
+    DELAY_UPDATES_REQUIRED = "updates must be a non-empty list of delay reports."
+    DELAY_BATCH_TOO_LARGE = "At most {max_batch} delay reports per request."
+    RUN_NOT_STARTED = "No running status has been reported for this run yet."
 
+# ----------- DEPARTURE BOARD CONSTANTS ------------
+class DepartureBoardMessage:
+    BOARD_TYPE_INVALID = "type must be 'departures' or 'arrivals'."
+    BOARD_TIME_INVALID = "Invalid time '{value}'. Use HH:MM."
+    BOARD_LIMIT_INVALID = "limit must be a whole number between 1 and {max_limit}."
 
+# ----------- ROUTE SEGMENT CONSTANTS ------------
+class SegmentMessage:
+    STATIONS_REQUIRED = "Both 'from' and 'to' station codes are required."
+    STATION_NOT_ON_ROUTE = "Station '{station_code}' is not on this train's route."
+    WRONG_DIRECTION = "Station '{to_code}' does not come after '{from_code}' on this train's route."
+
+# ----------- IDEMPOTENCY CONSTANTS ------------
+class IdempotencyMessage:
+    KEY_INVALID = "Idempotency-Key must be 1 to 255 printable characters."
+    KEY_IN_PROGRESS = "A request with this Idempotency-Key is still being processed; retry shortly."
+    KEY_REUSED = "This Idempotency-Key was already used for a different request."
+
+# ----------- BATCH CONSTANTS ------------
+class BatchMessage:
+    REQUESTS_REQUIRED = "requests must be a non-empty list of sub-request objects."
+    TOO_MANY_REQUESTS = "At most {max_requests} sub-requests per batch."
+
+# ----------- BULK ONBOARDING CONSTANTS ------------
+class OnboardingMessage:
+    USERS_REQUIRED = "users must be a non-empty list of user objects."
+    TOO_MANY_USERS = "At most {max_rows} users per request; use the onboard_users command for larger files."
+    ROLE_INVALID = "role must be 'passenger' or 'admin'."
+    USERNAME_TOO_LONG = "Username must not exceed 20 characters."
+    FIRST_NAME_REQUIRED = "First name is required."
+    ROW_CONFLICT = "A user with this username, email or mobile number was created concurrently."
+
+# ----------- SPARSE FIELDSET CONSTANTS ------------
+class FieldsetMessage:
+    UNKNOWN_FIELDS = "Unknown field(s) in ?fields=: {fields}. Available: {available}."
+    UNKNOWN_EXPAND = "Cannot expand {fields}. Expandable: {available}."
+
+# ----------- PASSWORD HASHING CONSTANTS ------------
+class PasswordHashingMessage:
+    POOL_SATURATED = "Too many sign-ins are being processed right now; please retry in a moment."
+
+# ----------- COACH & SEAT MAP CONSTANTS ------------
+class CoachMessage:
+    BERTHS_INVALID = "berths may only contain the berth type codes {codes}."
+    BERTHS_REQUIRED = "berths must describe at least one seat."
+    DUPLICATE_LABEL = "Coach labels must be unique within a composition."
+    COACHES_REQUIRED = "coaches must be a non-empty list of {label, layout} objects."
+    LAYOUT_IN_USE = "This layout is used by train compositions and cannot be deleted."
+    COMPOSITION_UPDATED = "Composition updated successfully."
+
+# ----------- BOOKING CONSTANTS ------------
+class BookingMessage:
+    BOOKED = "Booking successful."
+    CANCELLED = "Ticket cancelled successfully."
+    ALREADY_CANCELLED = "This ticket is already cancelled."
+    RUN_NOT_FOUND = "Train {train_number} does not run on {run_date}."
+    RUN_CANCELLED = "This train run is cancelled."
+    TRAIN_HAS_BOOKINGS = ("This train has tickets on upcoming runs, which refer to its stops and seats "
+                          "by number. Cancel those runs before changing its stops or coaches.")
+    RUN_CANCELLED_REFUND = "This train run is cancelled; its tickets are cancelled and refunded automatically."
+    SEGMENT_INVALID = "from_station and to_station must be stops of this train, in travel order."
+    CLASS_NOT_AVAILABLE = "Class {travel_class} is not available on this train."
+    PASSENGERS_INVALID = "passengers must list between 1 and {max_passengers} passengers."
+    WAITLIST_FULL = "The waitlist for this class is full."
+    PROMOTED = "Ticket {ticket_id} is now {status}."
+    PNR_INVALID = "Invalid PNR. A PNR is 10 digits; please check it and try again."
+    PNR_NOT_FOUND = "No booking found for PNR {pnr}."
+
+# ----------- RUN CANCELLATION CONSTANTS ------------
+class CancellationMessage:
+    JOB_EXISTS = "A cancellation job already exists for this run."
+    JOB_QUEUED = "Run cancelled; its tickets are being cancelled and refunded."
+    CALENDAR_REASON = "no longer in the timetable"
+    NOTIFICATION = "Train {train_number} on {run_date} is cancelled ({reason}). Your fare will be refunded in full."
+
+# ----------- EVENT PUSH CONSTANTS ------------
+class EventMessage:
+    TOO_MANY_CONNECTIONS = "Too many open event connections from this client."
+    THROTTLED = "Too many event connections; try again in {wait} seconds."
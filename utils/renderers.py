@@ -0,0 +1,184 @@
+"""
+Fast JSON rendering and streamed list responses.
+
+``FastJSONRenderer`` is a drop-in replacement for DRF's JSONRenderer that
+encodes with orjson when it is installed, falling back to the stock renderer
+otherwise. Types orjson does not handle natively (Decimal, lazy strings,
+datetimes, so that their formatting matches DRF exactly) go through DRF's
+encoder.
+
+``StreamingListMixin`` makes a viewset's ``list`` stream its JSON array:
+rows are read with ``QuerySet.iterator(chunk_size)``, serialized one chunk
+at a time and written out as they are produced, optionally gzip or brotli
+compressed, so peak memory follows the chunk size instead of the result size.
+Under ASGI the body is handed over as an async iterator whose steps run in
+the request's sync thread; Django would otherwise buffer a sync iterator
+whole. The first chunk is read before the response starts, so a failing
+query still gets a proper error response. A database error after that can
+only abort the stream: the body is then cut short of its closing bracket
+and the error is logged.
+"""
+import json
+import logging
+import zlib
+from itertools import chain, islice
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # optional: fall back to the stdlib encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional: only gzip is offered without it
+    brotli = None
+
+logger = logging.getLogger('request_logger')
+
+_encoder = JSONEncoder()
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def dumps(data):
+        return orjson.dumps(data, default=_encoder.default, option=ORJSON_OPTIONS)
+else:
+    def dumps(data):
+        return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer using orjson for compact output; indented output (browsable
+    API, ?indent) still goes through DRF's implementation.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+def negotiate_encoding(request):
+    """
+    Pick 'br' or 'gzip' from the client's Accept-Encoding, or None.
+    """
+    accepted = {token.split(';')[0].strip().lower()
+                for token in request.META.get('HTTP_ACCEPT_ENCODING', '').split(',')}
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress(chunks, encoding):
+    """
+    Compress a byte-chunk iterator incrementally, flushing after each chunk
+    so the client can start decoding before the response ends.
+    """
+    if encoding == 'gzip':
+        compressor = zlib.compressobj(settings.STREAMING['COMPRESS_LEVEL'], zlib.DEFLATED, 31)
+        for chunk in chunks:
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+    elif encoding == 'br':
+        compressor = brotli.Compressor()
+        for chunk in chunks:
+            yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+    else:
+        yield from chunks
+
+
+def stream_json_array(items, serialize, chunk_size, prefix=b'[', suffix=b']'):
+    """
+    Yield `prefix`, the JSON of every item separated by commas, then `suffix`.
+    `serialize` turns a list of up to chunk_size items into a list of
+    JSON-able objects.
+    """
+    yield prefix
+    first = True
+    chunk = []
+
+    def encode(batch):
+        return b','.join(dumps(row) for row in serialize(batch))
+
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield (b'' if first else b',') + encode(chunk)
+            first, chunk = False, []
+    if chunk:
+        yield (b'' if first else b',') + encode(chunk)
+    yield suffix
+
+
+def guard_stream(chunks, path):
+    """
+    Log an error raised after the response has started, then re-raise it so
+    the server aborts the connection instead of ending the body cleanly.
+    """
+    try:
+        yield from chunks
+    except Exception:
+        logger.exception(f"Streamed response for {path} aborted mid-body")
+        raise
+
+
+async def iterate_async(chunks):
+    """
+    Async iterator over a sync chunk iterator, stepping it in the request's
+    sync thread (where its database cursor lives).
+    """
+    step = sync_to_async(next, thread_sensitive=True)
+    try:
+        while (chunk := await step(chunks, None)) is not None:
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close, thread_sensitive=True)()
+
+
+class StreamingListMixin:
+    """
+    Viewset mixin that streams `list` (and any action calling
+    `streaming_response`) instead of building the whole body in memory.
+    Paginated viewsets keep the normal response.
+    """
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.paginator is not None:
+            return super().list(request, *args, **kwargs)
+        return self.streaming_response(queryset)
+
+    def streaming_response(self, queryset, prefix=b'[', suffix=b']'):
+        chunk_size = settings.STREAMING['CHUNK_SIZE']
+        context = self.get_serializer_context()
+        serializer_class = self.get_serializer_class()
+
+        def serialize(rows):
+            return serializer_class(rows, many=True, context=context).data
+
+        body = stream_json_array(queryset.iterator(chunk_size=chunk_size), serialize, chunk_size,
+                                 prefix=prefix, suffix=suffix)
+        # Prefix and first chunk (or suffix): errors here still reach the exception handler.
+        body = chain(list(islice(body, 2)), body)
+        encoding = negotiate_encoding(self.request)
+        chunks = guard_stream(compress(body, encoding), self.request.path)
+        if isinstance(self.request._request, ASGIRequest):
+            chunks = iterate_async(chunks)
+        response = StreamingHttpResponse(chunks, content_type='application/json')
+        if encoding:
+            response['Content-Encoding'] = encoding
+        patch_vary_headers(response, ['Accept-Encoding'])
+        return response